@@ -0,0 +1,615 @@
+"""
+    Description:
+        Benchmarks of the parsers.
+
+        The parsers suite times every parser, and the end-to-end
+        parse of a design with each tool, on a synthetic run from
+        report_generator. Each benchmark runs in a new process so
+        its peak RSS is its own, and reports the wall time (best of
+        the repeats), lines/s and MB/s of decompressed report, and
+        peak RSS. The path_arrays benchmark also checks that every
+        extracted path has its clock skew and logic depth. Results
+        are saved as a JSON baseline and compared with a previous
+        one; a benchmark slower than the threshold is a regression
+        and the exit status is 1.
+
+        The startup suite runs report_parser.py on a Cadence run with
+        only .summary reports, with python -X importtime. It fails
+        when the imports take longer than the budget over a bare
+        interpreter, or when a module the run does not need, like
+        the Synopsys parser or numpy, is imported.
+
+        The transpose suite compares the record/transpose code of
+        the parsers with the pandas based versions they replaced.
+        The old versions are kept here as the reference. Each
+        benchmark checks that both versions give the same values
+        before timing them. pandas is only needed for this suite.
+
+        Usage:
+            python benchmark.py --paths 50000 --save baseline.json
+            python benchmark.py --paths 50000 --compare baseline.json
+            python benchmark.py --suite startup --budget-ms 100
+            python benchmark.py --suite transpose --groups 5000 --repeat 5
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cadence_parser as cp
+import lazy_import
+import report_discovery
+import report_generator
+import report_io
+import report_parser as rp
+import synopsys_parser as sp
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BASELINE_VERSION = 3        # Increment when the baseline fields or the generated reports change.
+REGRESSION_THRESHOLD = 0.10     # Slowdown of the wall time counted as a regression.
+# Benchmarks of the parsers suite, with the reports they read.
+PARSER_BENCHMARKS = [("qor", [("apr", "qor")]),
+                     ("clock_qor", [("apr", "clock_qor")]),
+                     ("summary", [("apr", "summary")]),
+                     ("full_clock", [("apr", "full_clock")]),
+                     ("path_arrays", [("apr", "full_clock")]),
+                     ("synopsys", [("syn", "qor"), ("apr", "qor"), ("apr", "clock_qor")]),
+                     ("cadence", [("apr", "summary"), ("apr", "full_clock")])]
+STARTUP_BUDGET_MS = 100     # Import time of a Cadence summary-only run over the interpreter.
+# Modules a Cadence summary-only run must not import.
+STARTUP_EXCLUDED = ["synopsys_parser", "numpy", "pyarrow", "sqlite3", "multiprocessing",
+                    "pstats"]
+SOURCE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def legacy_format_qor_data_syn(qor_report, stage):
+    """
+        Original pandas version of synopsys_parser.format_qor_data_syn().
+    """
+    import pandas as pd
+
+    qor_report_temp = []
+    qor_report_temp.append(["Timing Path Group", sp.WNS_STR, sp.TOTAL_NEG_SLACK_STR,
+                            sp.NUM_VIO_PTH_STR, sp.HOLD_VIOLATION_STR,
+                            sp.TOTAL_HOLD_VIOLATION_STR, sp.NUM_HOLD_VIO_STR])
+    report_row = []
+    for line in qor_report:
+        line = line.strip("'")
+        if line.find("Timing Path Group") != -1:
+            report_row = []
+            report_row.append(line.split()[3])
+        if line.find(sp.WNS_STR) != -1:
+            report_row.append(line.split()[3])
+        if line.find(sp.TOTAL_NEG_SLACK_STR) != -1:
+            report_row.append(line.split()[3])
+        if line.find(sp.NUM_VIO_PTH_STR) != -1:
+            report_row.append(line.split()[4])
+        if line.find(sp.HOLD_VIOLATION_STR) != -1:
+            report_row.append(line.split()[3])
+        if line.find(sp.TOTAL_HOLD_VIOLATION_STR) != -1:
+            report_row.append(line.split()[3])
+        if line.find(sp.NUM_HOLD_VIO_STR) != -1:
+            report_row.append(line.split()[4])
+            report_row = pd.DataFrame(report_row)
+            report_row = report_row.transpose()
+            report_row = report_row.values.tolist()
+            qor_report_temp.append(report_row)
+    return qor_report_temp
+
+
+def legacy_parse_report(report):
+    """
+        Original version of cadence_parser.parse_report().
+    """
+    report_contents = []
+    for line in report:
+        line = line.replace('|', '')
+        line = line.replace(':', '')
+        if line.find(cp.WNS_STR) != -1 or line.find(cp.TNS_STR) != -1 \
+                or line.find(cp.VIO_PATH_STR) != -1:
+            report_contents.append(line.split()[3:7])
+    return report_contents
+
+
+def legacy_organize_data(report_contents):
+    """
+        Original pandas version of cadence_parser.organize_data().
+    """
+    import pandas as pd
+
+    report_contents = pd.DataFrame(report_contents)
+    report_contents = report_contents.transpose()
+    report_contents = report_contents.values.tolist()
+
+    stage_summary = []
+    for row in report_contents:
+        mode_sum = ""
+        for val in row:
+            mode_sum = mode_sum + str(val) + " "
+        mode_sum = mode_sum.replace(' ', '/')
+        stage_summary.append(mode_sum)
+    return stage_summary
+
+
+def make_syn_qor_lines(num_groups):
+    """
+        Function building the lines of a /syn .qor report.
+
+        input: num_groups: number of timing path groups.
+    """
+    lines = []
+    for group in range(num_groups):
+        lines.extend(["  Timing Path Group 'clk_{0}'\n".format(group),
+                      "  -----------------------------------\n",
+                      "  Levels of Logic:               {0}\n".format(group % 40),
+                      "  Critical Path Length:          1.{0:02d}\n".format(group % 100),
+                      "  Critical Path Slack:          -0.{0:02d}\n".format(group % 100),
+                      "  Critical Path Clk Period:      2.00\n",
+                      "  Total Negative Slack:         -{0}.25\n".format(group % 9),
+                      "  No. of Violating Paths:        {0}\n".format(group % 300),
+                      "  Worst Hold Violation:         -0.01\n",
+                      "  Total Hold Violation:         -0.{0:02d}\n".format(group % 50),
+                      "  No. of Hold Violations:        {0}\n".format(group % 20),
+                      "  -----------------------------------\n",
+                      "\n"])
+    return lines
+
+
+def make_summary_lines(num_tables):
+    """
+        Function building the lines of a Cadence .summary report
+        with num_tables setup/hold tables.
+    """
+    lines = []
+    for table in range(num_tables):
+        mode = "Setup" if table % 2 == 0 else "Hold"
+        lines.append("|     {0} mode     |   all   | reg2reg | in2reg  | reg2out | in2out  |\n".format(mode))
+        lines.append("|           WNS (ns):| -0.{0:03d}  | -0.{0:03d}  |  0.012  |  0.100  |   N/A   |\n".format(table % 1000))
+        lines.append("|           TNS (ns):| -1.{0:03d}  | -1.{0:03d}  |  0.000  |  0.000  |   N/A   |\n".format(table % 1000))
+        lines.append("|    Violating Paths:|   {0}    |   {0}    |    0    |    0    |   N/A   |\n".format(table % 500))
+        lines.append("|          All Paths:|  1000   |  900    |   50    |   50    |   N/A   |\n")
+    return lines
+
+
+def normalize(rows):
+    """
+        Function flattening rows to lists of cells and converting
+        number cells to floats, so output of the pandas versions and
+        of the typed records can be compared.
+    """
+    normalized = []
+    for row in rows:
+        if row and type(row[0]) is list:
+            row = row[0]
+        cells = []
+        for cell in row:
+            parts = []
+            for part in str(cell).split("/"):
+                try:
+                    parts.append(float(part))
+                except ValueError:
+                    parts.append(part)
+            cells.append(parts)
+        normalized.append(cells)
+    return normalized
+
+
+def time_call(function, args, repeat):
+    """
+        Function returning the best wall time of repeat calls.
+
+        input: function: function to time.
+        input: args: tuple of arguments.
+        input: repeat: number of calls.
+    """
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start_time
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def compare(name, new_function, legacy_function, args, repeat):
+    """
+        Function checking two implementations give the same output
+        and printing their timings.
+
+        output: speedup of new_function over legacy_function.
+    """
+    if normalize(new_function(*args)) != normalize(legacy_function(*args)):
+        raise AssertionError("{0}: output differs from the pandas version.".format(name))
+    new_time = time_call(new_function, args, repeat)
+    legacy_time = time_call(legacy_function, args, repeat)
+    speedup = legacy_time / new_time if new_time > 0 else float("inf")
+    print("{0:<30}{1:>12.4f} s{2:>12.4f} s{3:>10.1f}x".format(
+        name, legacy_time, new_time, speedup))
+    return speedup
+
+
+def run_transpose_benchmarks(num_groups, repeat):
+    """
+        Function running the record/transpose benchmarks.
+
+        input: num_groups: number of path groups in the synthetic data.
+        input: repeat: calls per timing.
+    """
+    print("{0:<30}{1:>14}{2:>14}{3:>11}".format("benchmark", "pandas", "records", "speedup"))
+    lines = make_syn_qor_lines(num_groups)
+    compare("format_qor_data_syn",
+            lambda report: sp.format_qor_data_syn(sp.get_qor_data(report, "dc", "syn")),
+            lambda report: legacy_format_qor_data_syn(report, "dc"),
+            (lines,), repeat)
+
+    # A summary report holds a few small tables.
+    lines = make_summary_lines(max(2, num_groups // 10))
+    compare("parse_report+organize_data",
+            lambda report: [cp.organize_data(cp.parse_report(report, "route"))],
+            lambda report: [legacy_organize_data(legacy_parse_report(report))],
+            (lines,), repeat)
+
+
+def report_stats(file_paths):
+    """
+        Function counting the lines and decompressed bytes of reports.
+
+        input: file_paths: list of report paths.
+        output: (lines, bytes).
+    """
+    num_lines = 0
+    num_bytes = 0
+    for file_path in file_paths:
+        with report_io.open_binary(file_path) as fp:
+            while True:
+                chunk = fp.read(report_io.STREAM_BUFFER_SIZE)
+                if not chunk:
+                    break
+                num_lines += chunk.count(b"\n")
+                num_bytes += len(chunk)
+    return num_lines, num_bytes
+
+
+def benchmark_reports(name, run_dir, design):
+    """
+        Function listing the reports read by a benchmark.
+
+        input: name: benchmark name of PARSER_BENCHMARKS.
+        input: run_dir: run directory.
+        input: design: design name.
+        output: list of (stage, report path).
+    """
+    folders = rp.get_folders(run_dir)
+    reports = report_discovery.discover_reports(folders["syn"], folders["apr"])
+    kinds = dict(PARSER_BENCHMARKS)[name]
+    return [(key[3], entry["path"]) for key, entry in sorted(reports.items())
+            if (key[0], key[1]) in kinds and key[2] == design]
+
+
+def parse_reports(name, run_dir, design, write_path):
+    """
+        Function running the parse timed by a benchmark once.
+
+        input: name: benchmark name of PARSER_BENCHMARKS.
+        input: run_dir: run directory.
+        input: design: design name.
+        input: write_path: folder of the outputs of the end-to-end
+            benchmarks.
+    """
+    if name in rp.ASIC_TOOLS:
+        rp.parse_design(name, design, run_dir, write_path)
+        return
+    folders = rp.get_folders(run_dir)
+    for stage, file_path in benchmark_reports(name, run_dir, design):
+        to_open = design + "." + stage + "." + name + ".rpt"
+        if name == "qor":
+            sp.get_qor_data(sp.read_file_mapped(to_open, folders["apr"], sp.QOR_ANCHOR_RE),
+                            stage, "apr")
+        elif name == "clock_qor":
+            sp.parse_clock_qor(sp.read_file_mapped(to_open, folders["apr"],
+                                                   sp.CLOCK_QOR_ANCHOR_RE), stage)
+        elif name == "summary":
+            cp.parse_report(cp.read_gz_file(file_path), stage)
+        elif name == "path_arrays":
+            check_path_arrays(file_path)
+        else:
+            cp.parse_clock_path_report(cp.stream_gz_file(file_path), stage)
+
+
+def check_path_arrays(file_path):
+    """
+        Function extracting the paths of a full_clock report into
+        arrays, checking that every path has its clock skew and
+        logic depth. numpy is only needed for this benchmark.
+
+        input: file_path: path of the report.
+    """
+    import path_arrays
+
+    paths = path_arrays.extract_paths(file_path)
+    if not path_arrays.np.isfinite(paths["skew"]).all():
+        raise AssertionError("{0}: paths without clock skew.".format(file_path))
+    if (paths["logic_depth"] < 0).any():
+        raise AssertionError("{0}: paths without logic depth.".format(file_path))
+
+
+def peak_rss_mb():
+    """
+        Function returning the peak resident memory of the process
+        in MB, None where the resource module is missing.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere.
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def run_benchmark(name, run_dir, design, repeat, write_path):
+    """
+        Function timing one benchmark. Runs in its own process; the
+        messages of the parsers are not printed.
+
+        input: name: benchmark name of PARSER_BENCHMARKS.
+        input: run_dir: run directory.
+        input: design: design name.
+        input: repeat: number of runs, the best one is kept.
+        input: write_path: folder of the outputs.
+        output: dict with "wall_s" and "peak_rss_mb".
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        wall_time = time_call(parse_reports, (name, run_dir, design, write_path), repeat)
+    return {"wall_s": wall_time, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_parser_benchmarks(run_dir, design, repeat, names=None):
+    """
+        Function running the parsers suite and printing the results.
+
+        input: run_dir: run directory.
+        input: design: design name.
+        input: repeat: runs per benchmark.
+        input: names: benchmarks to run, None for all.
+        output: dict of benchmark name to result.
+    """
+    write_path = tempfile.mkdtemp(prefix="benchmark_outputs_")
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    print("{0:<12}{1:>10}{2:>12}{3:>14}{4:>10}{5:>10}".format(
+        "benchmark", "wall (s)", "lines", "lines/s", "MB/s", "RSS (MB)"))
+    try:
+        for name, _ in PARSER_BENCHMARKS:
+            if names and name not in names:
+                continue
+            if name == "path_arrays" and lazy_import.optional_module("numpy") is None:
+                print("{0:<12}skipped, numpy is not installed.".format(name))
+                continue
+            num_lines, num_bytes = report_stats(
+                [file_path for _, file_path in benchmark_reports(name, run_dir, design)])
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_benchmark, name, run_dir, design, repeat,
+                                     os.path.join(write_path, "")).result()
+            wall_time = result["wall_s"] if result["wall_s"] > 0 else 1e-9
+            result.update({"lines": num_lines, "bytes": num_bytes,
+                           "lines_per_s": num_lines / wall_time,
+                           "mb_per_s": num_bytes / wall_time / 1e6})
+            results[name] = result
+            print("{0:<12}{1:>10.3f}{2:>12}{3:>14.0f}{4:>10.1f}{5:>10}".format(
+                name, result["wall_s"], num_lines, result["lines_per_s"], result["mb_per_s"],
+                "N/A" if result["peak_rss_mb"] is None else "{0:.1f}".format(result["peak_rss_mb"])))
+    finally:
+        shutil.rmtree(write_path, ignore_errors=True)
+    return results
+
+
+def save_baseline(file_path, results, scale, seed):
+    """
+        Function saving benchmark results as a JSON baseline.
+
+        input: file_path: path of the JSON file.
+        input: results: dict from run_parser_benchmarks().
+        input: scale: scale of the synthetic run.
+        input: seed: seed of the synthetic run.
+    """
+    baseline = {"version": BASELINE_VERSION,
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.node(),
+                "scale": scale,
+                "seed": seed,
+                "results": results}
+    with open(file_path, 'w') as fp:
+        json.dump(baseline, fp, indent=2, sort_keys=True)
+    print("Baseline saved at path: " + file_path)
+
+
+def compare_baseline(file_path, results, scale, threshold=REGRESSION_THRESHOLD):
+    """
+        Function comparing benchmark results with a JSON baseline.
+
+        input: file_path: path of the JSON file.
+        input: results: dict from run_parser_benchmarks().
+        input: scale: scale of the synthetic run.
+        input: threshold: relative slowdown counted as a regression.
+        output: number of regressions.
+    """
+    with open(file_path) as fp:
+        baseline = json.load(fp)
+    if baseline.get("version") != BASELINE_VERSION:
+        print("Baseline {0} has version {1}, expected {2}.".format(
+            file_path, baseline.get("version"), BASELINE_VERSION))
+        return 0
+    if baseline.get("scale") != scale:
+        print("Warning: baseline scale {0} differs from {1}.".format(baseline.get("scale"), scale))
+
+    num_regressions = 0
+    print("{0:<12}{1:>12}{2:>12}{3:>10}".format("benchmark", "baseline (s)", "now (s)", "change"))
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None or old["wall_s"] <= 0:
+            continue
+        change = result["wall_s"] / old["wall_s"] - 1.0
+        regression = change > threshold
+        num_regressions += regression
+        print("{0:<12}{1:>12.3f}{2:>12.3f}{3:>+9.1f}%{4}".format(
+            name, old["wall_s"], result["wall_s"], change * 100,
+            "  REGRESSION" if regression else ""))
+    return num_regressions
+
+
+def import_times(argv, repeat):
+    """
+        Function running Python with -X importtime.
+
+        input: argv: arguments of the interpreter.
+        input: repeat: number of runs, the fastest one is kept.
+        output: (wall time in seconds, dict of module name to its
+            own import time in ms) of the fastest run.
+    """
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime"] + argv,
+                                   cwd=SOURCE_FOLDER, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, universal_newlines=True, check=True)
+        wall_time = time.perf_counter() - start_time
+        modules = {}
+        for line in completed.stderr.splitlines():
+            fields = line[len("import time:"):].split("|")
+            if not line.startswith("import time:") or len(fields) != 3 or "self" in fields[0]:
+                continue
+            modules[fields[2].strip()] = int(fields[0]) / 1000.0
+        if best is None or wall_time < best[0]:
+            best = (wall_time, modules)
+    return best
+
+
+def run_startup_benchmark(design, repeat, budget_ms=STARTUP_BUDGET_MS):
+    """
+        Function measuring the start up of a Cadence summary-only
+        run and printing the results.
+
+        input: design: design name of the synthetic run.
+        input: repeat: runs, the fastest one is kept.
+        input: budget_ms: import time allowed over the interpreter.
+        output: (dict of benchmark name to result, list of failures).
+    """
+    run_dir = tempfile.mkdtemp(prefix="benchmark_startup_")
+    try:
+        folder = os.path.join(run_dir, "apr", rp.FOLDER_READ_PATH, design + ".innovus")
+        os.makedirs(folder)
+        for i, stage in enumerate(cp.STAGES):
+            report_generator.write_report(os.path.join(folder, stage + ".summary.gz"),
+                                          report_generator.summary_lines(random.Random(i)))
+        argv = [os.path.join(SOURCE_FOLDER, "report_parser.py"), "--tool", "cadence",
+                "--design", design, "--run-dir", run_dir,
+                "--output-dir", os.path.join(run_dir, "outputs")]
+        import_times(argv, 1)       # Compiles the modules.
+        interpreter_time, interpreter_modules = import_times(["-c", "pass"], repeat)
+        wall_time, modules = import_times(argv, repeat)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    added = dict((name, elapsed) for name, elapsed in modules.items()
+                 if name not in interpreter_modules)
+    import_ms = sum(added.values())
+    print("Cadence summary-only run: {0:.1f} ms wall ({1:.1f} ms bare interpreter), "
+          "{2:.1f} ms importing {3} modules (budget {4:.0f} ms).".format(
+              wall_time * 1000, interpreter_time * 1000, import_ms, len(added), budget_ms))
+    print("Slowest imports:")
+    for name, elapsed in sorted(added.items(), key=lambda item: item[1], reverse=True)[:10]:
+        print("    {0:>8.2f} ms  {1}".format(elapsed, name))
+
+    failures = []
+    if import_ms > budget_ms:
+        failures.append("Imports take {0:.1f} ms, over the budget of {1:.0f} ms.".format(
+            import_ms, budget_ms))
+    for name in STARTUP_EXCLUDED:
+        if name in added:
+            failures.append("Module {0} is imported by a Cadence summary-only run.".format(name))
+    results = {"startup": {"wall_s": wall_time, "interpreter_s": interpreter_time,
+                           "import_ms": import_ms, "modules": len(added)}}
+    return results, failures
+
+
+def main(argv):
+    """
+        Command line entry point of the benchmark.
+
+        input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the report parsers.")
+    parser.add_argument("--suite", choices=["parsers", "startup", "transpose"],
+                        default="parsers", help="benchmarks run")
+    parser.add_argument("--groups", type=int, default=None,
+                        help="number of timing path groups in the synthetic reports")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="calls per timing, the best one is kept")
+    parser.add_argument("--run-dir", default=None,
+                        help="synthetic run directory, generated when it doesn't exist; "
+                             "a temporary one by default")
+    parser.add_argument("--design", default="blk", help="design name of the synthetic run")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic run")
+    for name, value in sorted(report_generator.DEFAULT_SCALE.items()):
+        if name != "groups":
+            parser.add_argument("--" + name, type=int, default=value)
+    parser.add_argument("--only", nargs="+", default=None,
+                        choices=[name for name, _ in PARSER_BENCHMARKS],
+                        help="benchmarks of the parsers suite to run")
+    parser.add_argument("--save", default=None, help="save the results as a JSON baseline")
+    parser.add_argument("--compare", default=None, help="compare the results with a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative slowdown counted as a regression")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="import time allowed by the startup suite")
+    args = parser.parse_args(argv)
+
+    if args.suite == "transpose":
+        run_transpose_benchmarks(args.groups or 2000, args.repeat)
+        return 0
+
+    scale = dict(report_generator.DEFAULT_SCALE)
+    for name in scale:
+        if getattr(args, name) is not None:
+            scale[name] = getattr(args, name)
+    failures = []
+    if args.suite == "startup":
+        results, failures = run_startup_benchmark(args.design, args.repeat, args.budget_ms)
+    else:
+        run_dir = args.run_dir or tempfile.mkdtemp(prefix="benchmark_run_")
+        try:
+            if not os.path.isdir(os.path.join(run_dir, "apr")):
+                start_time = time.time()
+                reports = report_generator.generate_run(run_dir, args.design, scale, args.seed)
+                print("Generated {0} reports in {1} in {2:.1f} s.".format(
+                    len(reports), run_dir, time.time() - start_time))
+            results = run_parser_benchmarks(run_dir, args.design, args.repeat, args.only)
+        finally:
+            if args.run_dir is None:
+                shutil.rmtree(run_dir, ignore_errors=True)
+
+    if args.save:
+        save_baseline(args.save, results, scale, args.seed)
+    for failure in failures:
+        print(failure)
+    if args.compare and compare_baseline(args.compare, results, scale, args.threshold):
+        return 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -6,14 +6,22 @@
         report of Cadence tools. Creates a CSV list of all the important
         data to be printed.
 """
-import csv
-import gzip as gz
-import pandas as pd
+import heapq
+import re
+import time
+
+import qor_export
+import report_io
+import report_writer
+from qor_records import StageTable
 
 
 # Modify this parameter to increase 
 # number of paths displayed for full_clock timing files.
 NUM_PATHS_FULL_CLK = 5
+# Report option telling that the paths are sorted by slack, worst
+# first, across all path groups.
+SORT_BY_SLACK_RE = re.compile(r"-sort_by\s+slack\b")
 
 ALIGN_LENGTH = 25  # Used for aligning words in text file.
 FOLDER_READ_PATH = "../syn/reports/"       # Location of reports to be parsed.
@@ -27,166 +35,293 @@ SUMMARY_COLUMNS = ['Stage', 'reg2reg_WNS/TNS/Vio', 'in2reg_WNS/TNS/Vio',
 WNS_STR = "WNS"
 TNS_STR = "TNS"
 VIO_PATH_STR = "Violating Paths"
+# Title of a summary table, e.g. "Setup mode" or "Hold mode".
+SUMMARY_MODE_RE = re.compile(r"\s*(\w+)\s+mode\b")
+# Path group columns of a summary table, after the "all" column.
+SUMMARY_PATH_GROUPS = ['reg2reg', 'in2reg', 'reg2out', 'in2out']
+# Name of the columnar export of each kind of table.
+COLUMNAR_FILE_NAMES = {'summary': '_stages_summary',
+                       'full_clock': '.full_clock_worst_slack_times'}
 
 
 def read_gz_file(file_path):
     """
         Function to read file and return the whole file.
-        input: file_path - file path to qor files.
+        The report may be plain text or compressed, see report_io.
+        input: file_path - file path to qor files, without compression extension.
         output: report - file contents returned.
     """
-    try:
-        with gz.open(file_path + ".gz", 'r') as gp:
-            report_temp = gp.readlines()
-    except:
+    report_path = report_io.find_report(file_path)
+    if report_path is None:
         print("File path {0} not found.".format(file_path))
         return ""
 
-    # Converts bytes object to string. 
-    report = []
-    for row in report_temp:
-        row = row.decode('utf-8')
-        report.append(row)
+    return report_io.read_lines(report_path)
+
+
+def stream_gz_file(file_path):
+    """
+        Generator that decompresses a report and yields it
+        one decoded line at a time. Only one buffer of the file is
+        held in memory, so this is used for the large full_clock
+        timing reports instead of read_gz_file().
+
+        input: file_path - file path to report, without compression extension.
+        output: yields each line of the report as a string.
+    """
+    report_path = report_io.find_report(file_path)
+    if report_path is None:
+        print("File path {0} not found.".format(file_path))
+        return
 
-    return report
+    with report_io.open_report(report_path) as text:
+        for line in text:
+            yield line
 
 
-def organize_data(report_contents):
+def organize_data(summary_table):
     """
            Function to organize the contents of the report
            into a single list so that it can be displayed in a
            CSV file.
 
-           input: report_contents: list of lists containing information
-           parsed from timing reports.
+           input: summary_table: StageTable from parse_report().
 
            output: stage_summary: list containing timing information
-           for current stage.
+           for current stage, one "WNS/TNS/Vio/" entry per path group.
     """
-    # Convert to pandas array, transpose, and convert back to list.
-    report_contents = pd.DataFrame(report_contents)
-    report_contents = report_contents.transpose()
-    report_contents = report_contents.values.tolist()
+    # Concatenate the metrics of each path group, for every
+    # mode (setup, hold) that reported it.
+    groups = []
+    values = {}
+    for mode, path_group, wns, tns, num_vio_paths in summary_table.text_rows():
+        if path_group not in values:
+            groups.append(path_group)
+            values[path_group] = []
+        values[path_group].extend([wns, tns, num_vio_paths])
 
     stage_summary = []
-    # Iterate through report and concatenate relevant data.
-    for row in report_contents:
-        mode_sum = ""
-        for val in row:
-            mode_sum = mode_sum + str(val) + " "
-        mode_sum = mode_sum.replace(' ', '/')
-        stage_summary.append(mode_sum)
+    for path_group in groups:
+        stage_summary.append("/".join(values[path_group]) + "/")
 
     return stage_summary
 
 
-def parse_report(report):
+def parse_report(report, stage=""):
     """
         Function to parse a QOR report. Essentially finds useful
         string and removes unneeded characters.
 
-        input: qor_report: list containing contents of report.
-        output: report_contents: list containing parsed data.
+        input: report: list containing contents of report.
+        input: stage: stage of the report.
+        output: summary_table: StageTable with one record per mode
+            and path group.
     """
+    summary_table = StageTable('apr', stage, 'summary')
     # Check if the input parameter is empty.
     if not report:
-	return 
-    report_contents = []
+        return summary_table
+
+    mode = "Setup"
+    block = {}      # Metric values of the table being read.
     for line in report:
         line = line.replace('|', '')
         line = line.replace(':', '')
-        rtn = line.find(WNS_STR)
-        rtn_2 = line.find(TNS_STR)
-        rtn_3 = line.find(VIO_PATH_STR)
-        if rtn != -1 or rtn_2 != -1 \
-        or rtn_3 != -1:
-            line = line.split()
-            line = line[3:7]
-            report_contents.append(line)
+        match = SUMMARY_MODE_RE.match(line)
+        if match is not None:
+            add_summary_block(summary_table, mode, block)
+            block = {}
+            mode = match.group(1)
+            continue
+        if line.find(VIO_PATH_STR) != -1:
+            metric = 'num_vio_paths'
+        elif line.find(TNS_STR) != -1:
+            metric = 'tns'
+        elif line.find(WNS_STR) != -1:
+            metric = 'wns'
+        else:
             continue
+        # A metric seen twice means a new table started.
+        if metric in block:
+            add_summary_block(summary_table, mode, block)
+            block = {}
+        block[metric] = line.split()[3:7]
 
-    return report_contents
+    add_summary_block(summary_table, mode, block)
 
-def parse_clock_path_report(report, stage):
-   """
-	Function to extract data from timing report
-	containing the full clock paths.
+    return summary_table
 
-	input: report: List. Contains the full report.
-	input: stage: current stage in APR flow.
-   """
-   i = 0		# Tracks which line is being parsed.
-   num_paths = ""	# Contains number of paths in report.
 
-   # This contains the worst slack times in order.
-   # Update the global variable to increase the number
-   # of slack times collected.
-   slack_list = []
+def add_summary_block(summary_table, mode, block):
+    """
+        Function adding the metrics of one summary table to
+        the StageTable, one record per path group column.
 
-   # This for loop gathers all the data needed from the report.
-   for line in report:
-	# Save the number of paths from the report.
-	if line.find("-max_paths") != -1:
-		num_paths = int(line.split()[1])
-		if num_paths < NUM_PATHS_FULL_CLK:
-			raise Exception("Can't gather more paths than available in full_clock file. Decrease NUM_PATHS_FULL_CLK variable.")
-	if line.find("slack") != -1:
-		# Start collecting after report title/introduction.
-		if i > 20:
-			# Get the third element becuase that's the slack time for the path.
-			path_slack = float(line.split()[2])
+        input: summary_table: StageTable of kind 'summary'.
+        input: mode: mode of the table (Setup or Hold).
+        input: block: dict of metric name to list of column values.
+    """
+    if not block:
+        return
+    num_groups = max(len(values) for values in block.values())
+    for i in range(num_groups):
+        record = [mode, SUMMARY_PATH_GROUPS[i] if i < len(SUMMARY_PATH_GROUPS) else str(i)]
+        for metric in ('wns', 'tns', 'num_vio_paths'):
+            values = block.get(metric, [])
+            record.append(values[i] if i < len(values) else None)
+        summary_table.append(record)
+
+
+def parse_clock_path_report(report, stage, early_exit=False):
+    """
+        Function to extract data from timing report
+        containing the full clock paths.
+
+        The report is consumed one line at a time so it can be
+        a generator from stream_gz_file(). Only the worst
+        NUM_PATHS_FULL_CLK slack times are kept, in a bounded heap,
+        so memory does not grow with the size of the report.
+
+        With early_exit, reading stops once NUM_PATHS_FULL_CLK paths
+        are found if the report header, up to the first path, has
+        '-sort_by slack' and every slack read so far is at least the
+        one before it. Reports sorted another way, without the
+        option, or whose slacks go out of order, are read to the end.
+
+        input: report: iterable of lines. Contains the full report.
+        input: stage: current stage in APR flow.
+        input: early_exit: stop after the worst paths of a report
+            sorted by slack.
+        output: slack_table: StageTable with the worst slack
+            times, most negative first.
+    """
+    i = 0               # Tracks which line is being parsed.
+    num_paths = ""      # Contains number of paths in report.
+    in_header = True    # No path read yet.
+    sorted_by_slack = False     # Header has the -sort_by slack option.
+    in_order = True     # Every slack is at least the previous one.
+    last_slack = None   # Slack of the previous path.
+
+    # Max-heap (slack values negated) holding the worst slack times
+    # seen so far. The root is the best of the kept slacks, so it is
+    # the one replaced when a worse path shows up.
+    # Update the global variable to increase the number
+    # of slack times collected.
+    worst_heap = []
+
+    start_time = time.time()
+    # This for loop gathers all the data needed from the report.
+    for line in report:
+        # Save the number of paths from the report.
+        if line.find("-max_paths") != -1:
+            num_paths = int(line.split()[1])
+            if num_paths < NUM_PATHS_FULL_CLK:
+                raise Exception("Can't gather more paths than available in full_clock file. Decrease NUM_PATHS_FULL_CLK variable.")
+        if in_header and line.find("Startpoint") != -1:
+            in_header = False
+        if in_header and early_exit and SORT_BY_SLACK_RE.search(line):
+            sorted_by_slack = True
+        # Start collecting after report title/introduction.
+        if i > 20 and line.find("slack") != -1:
+            # Get the third element becuase that's the slack time for the path.
+            try:
+                path_slack = float(line.split()[2])
+            except (IndexError, ValueError):
+                i = i + 1
+                continue
+            in_header = False
+
+            if len(worst_heap) < NUM_PATHS_FULL_CLK:
+                heapq.heappush(worst_heap, -path_slack)
+            elif -path_slack > worst_heap[0]:
+                heapq.heapreplace(worst_heap, -path_slack)
+
+            # A path better than the next one means the order is not
+            # the one the header gives; read everything.
+            if last_slack is not None and path_slack < last_slack:
+                in_order = False
+            last_slack = path_slack
+            if sorted_by_slack and in_order and len(worst_heap) == NUM_PATHS_FULL_CLK:
+                i = i + 1
+                break
+
+        i = i + 1   # Increment as we iterate line by line.
+
+    elapsed = time.time() - start_time
+    if i:
+        print("Parsed {0} lines for stage {1} in {2:.2f} s ({3:.0f} lines/s).".format(
+            i, stage, elapsed, i / elapsed if elapsed > 0 else float(i)))
+
+    slack_table = StageTable('apr', stage, 'full_clock')
+    for slack in sorted(-slack for slack in worst_heap):
+        slack_table.append([slack])
+
+    return slack_table
+
+
+def write_full_clock_data_txt(top_design, slack_tables, folder_path=FOLDER_WRITE_PATH,
+                              mode='w'):
+    """
+        Function to write the worst failing slack times
+        from full_clock timing files to a text file.
+
+        input: top_design: str. design being evaluated.
+        input: slack_tables: list of StageTable from parse_clock_path_report(),
+            one per stage of APR flow.
+        input: folder_path: folder the file is written to.
+        input: mode: 'w' to overwrite the file, 'a' to append to it.
+    """
+    file_path = folder_path + top_design + ".full_clock_worst_slack_times" + ".txt" 
 
-			if len(slack_list) < NUM_PATHS_FULL_CLK:
-				slack_list.append(path_slack)
+    report_writer.write_lines(file_path, full_clock_lines(slack_tables), mode)
+    print("text file generated at path: " + file_path)
 
-				sorted(slack_list, reverse=True)	
-			elif len(slack_list) < slack_list[NUM_PATHS_FULL_CLK - 1]:
-				slack_list.pop(NUM_PATHS_FULL_CLK - 1)
-				slack_list.append(path_slack)
 
-				sorted(slack_list, reverse=True)	
+def full_clock_lines(slack_tables):
+    """
+        Generator of the lines of the worst slack times file.
 
-	i = i + 1   # Increment as we iterate line by line.
-   
-   label_str = "Worst slack times for stage " + stage
-   slack_list.insert(0, label_str)
-	
-   return slack_list
+        input: slack_tables: list of StageTable from parse_clock_path_report().
+        output: yields each line, newline included.
+    """
+    for slack_table in slack_tables:
+        yield "Worst slack times for stage " + slack_table.stage + '\n'
+        for row in slack_table.text_rows():
+            yield row[0] + '\n'
 
 
-def write_full_clock_data_txt(top_design, slack_list):
+def summary_rows(summary_tables, mode):
     """
-	Function to write the worst failing slack times
-	from full_clock timing files to a text file.
+        Generator of the output rows of the stage summaries.
+        The column titles are only written to new files.
 
-	input: top_design: str. design being evaluated.
-	input: slack_list: list. Contains worst failing times for each stage of APR flow. 
+        input: summary_tables: list of StageTable from parse_report().
+        input: mode: file mode of the output.
+        output: yields rows, each a list of strings.
     """
-    file_path = FOLDER_WRITE_PATH + top_design + ".full_clock_worst_slack_times" + ".txt" 
+    if mode == 'w':
+        yield SUMMARY_COLUMNS
+    for summary_table in summary_tables:
+        yield [summary_table.stage] + organize_data(summary_table)
 
-    with open(file_path, 'w') as txtfile:
 
-	for line in slack_list:
-		txtfile.write(str(line) + '\n')	
-    print("text file generated at path: " + file_path)
-    txtfile.close()
-
-def write_data_to_csv(top_design, stages_data):
+def write_data_to_csv(top_design, summary_tables, folder_path=FOLDER_WRITE_PATH,
+                      mode='w'):
     """
         Function to print all of the parsed data to a CSV file.
 
         input: top_design: design currently being worked on.
-        input: stages data: list of lists containing timing information.
+        input: summary_tables: list of StageTable, one per stage.
+        input: folder_path: folder the file is written to.
+        input: mode: 'w' to overwrite the file, 'a' to append to it.
     """
-    file_path = FOLDER_WRITE_PATH + top_design + '_stages_summary.csv'
-    with open(file_path, 'w') as csvfile:
-        writer = csv.writer(csvfile)
-        for row in stages_data:
-            writer.writerow(row)
+    file_path = folder_path + top_design + '_stages_summary.csv'
+    report_writer.write_csv(file_path, summary_rows(summary_tables, mode), mode)
     print("CSV file generated at path: " + file_path)
 
 
-def write_data_to_text(top_design, stages_data):
+def write_data_to_text(top_design, summary_tables, folder_path=FOLDER_WRITE_PATH,
+                       mode='w', fit_columns=False):
     """
         Function that writes all the report 
         summaries to a text file.
@@ -194,17 +329,32 @@ def write_data_to_text(top_design, stages_data):
         https://stackoverflow.com/questions/16796709/align-columns-in-a-text-file
 
         input: top_design: string indicating design name.
-        input: reports: list of lists containing report data.
-    """
-    file_path = FOLDER_WRITE_PATH + top_design + '_report_text.txt'
-    with open(file_path, 'w') as txtfile:
-        for stage in stages_data:
-            for val in stage:
-                if val is not None:
-                    txtfile.write(val.ljust(ALIGN_LENGTH))
-                else:
-                    txtfile.write(" ".ljust(ALIGN_LENGTH))
-            txtfile.write('\n')
+        input: summary_tables: list of StageTable, one per stage.
+        input: folder_path: folder the file is written to.
+        input: mode: 'w' to overwrite the file, 'a' to append to it.
+        input: fit_columns: size the columns to their values instead
+            of ALIGN_LENGTH. The rows are generated twice.
+    """
+    file_path = folder_path + top_design + '_report_text.txt'
+    widths = report_writer.column_widths(summary_rows(summary_tables, mode)) if fit_columns else None
+    report_writer.write_text(file_path, summary_rows(summary_tables, mode), ALIGN_LENGTH, mode,
+                             widths)
     print("text file generated at path: " + file_path)
 
 
+def write_data_to_columnar(top_design, tables, folder_path=FOLDER_WRITE_PATH,
+                           fmt=None, run=""):
+    """
+        Function that writes the summaries or the worst slack
+        times of all stages to a typed columnar file, see qor_export.
+
+        input: top_design: string indicating design name.
+        input: tables: list of StageTable of one kind, one per stage.
+        input: folder_path: folder the file is written to.
+        input: fmt: export format, None for the first available one.
+        input: run: name of the run the reports belong to.
+    """
+    if not tables:
+        return None
+    file_stem = folder_path + top_design + COLUMNAR_FILE_NAMES[tables[0].kind]
+    return qor_export.write_tables(file_stem, tables, top_design, run, fmt)
@@ -0,0 +1,71 @@
+"""
+    Description:
+        Deferred imports. A module from lazy_module() is imported the
+        first time one of its attributes is used, so the tool parsers
+        and the optional libraries (numpy, pyarrow, sqlite3) are only
+        loaded by the runs that need them and a small run starts
+        quickly.
+
+        optional_module() replaces the try/except ImportError of an
+        optional library: it returns None when the library is not
+        installed, found without importing it.
+"""
+import importlib
+import importlib.util
+import sys
+
+
+class LazyModule(object):
+    """
+        Module imported on the first use of one of its attributes.
+    """
+
+    def __init__(self, name):
+        """
+            input: name: full name of the module.
+        """
+        self._lazy_name = name
+        self._lazy_module = None
+
+    def __getattr__(self, attr):
+        module = self._lazy_module
+        if module is None:
+            module = importlib.import_module(self._lazy_name)
+            self._lazy_module = module
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._lazy_module is not None else "not loaded"
+        return "<lazy module '{0}', {1}>".format(self._lazy_name, state)
+
+
+def lazy_module(name):
+    """
+        Function returning a module imported on first use.
+
+        input: name: full name of the module.
+        output: the module when it is already imported, a LazyModule
+            otherwise.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def optional_module(name):
+    """
+        Function returning an optional library imported on first use.
+
+        input: name: full name of the module, e.g. "pyarrow.parquet".
+        output: module or LazyModule, None when its package is not
+            installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    try:
+        spec = importlib.util.find_spec(name.split(".")[0])
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None:
+        return None
+    return LazyModule(name)
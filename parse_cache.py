@@ -0,0 +1,183 @@
+"""
+    Description:
+        Persistent on-disk cache of parsed reports. An entry is
+        keyed by the report path and the kind of parse done on it,
+        and is valid while the size and modification time of the
+        report are unchanged. When they changed, the content hash
+        of the report can be compared instead, so a report that was
+        copied or touched without being modified is not re-parsed.
+
+        The cache is bounded in size. Entries are touched when read
+        and the least recently used entries are removed first.
+"""
+import os
+
+import lazy_import
+
+# Imported when the cache is used.
+hashlib = lazy_import.lazy_module("hashlib")
+pickle = lazy_import.lazy_module("pickle")
+tempfile = lazy_import.lazy_module("tempfile")
+
+CACHE_FOLDER_PATH = ".parse_cache/"     # Default location of the cache.
+CACHE_MAX_BYTES = 256 * 1024 * 1024     # Size limit of the cache folder.
+CACHE_VERSION = 6       # Increment when the parsed data format changes.
+HASH_BLOCK_SIZE = 1024 * 1024           # Read size used to hash reports.
+
+
+def entry_path(cache_dir, file_path, kind):
+    """
+        Function returning the cache file of a report.
+
+        input: cache_dir: folder of the cache.
+        input: file_path: path of the report.
+        input: kind: string naming the parse done on the report.
+        output: path of the cache entry.
+    """
+    key = "{0}\0{1}".format(os.path.abspath(file_path), kind)
+    return os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".pkl")
+
+
+def file_hash(file_path):
+    """
+        Function returning the sha1 of the content of a file.
+
+        input: file_path: path of the file.
+    """
+    sha = hashlib.sha1()
+    with open(file_path, 'rb') as fp:
+        block = fp.read(HASH_BLOCK_SIZE)
+        while block:
+            sha.update(block)
+            block = fp.read(HASH_BLOCK_SIZE)
+    return sha.hexdigest()
+
+
+def load_entry(path, version=CACHE_VERSION):
+    """
+        Function reading a cache entry. Entries that are missing,
+        corrupt or from another cache version read as None.
+
+        input: path: path of the cache entry.
+        input: version: version the entry must have, None for
+            entries checking their own version.
+    """
+    try:
+        with open(path, 'rb') as fp:
+            entry = pickle.load(fp)
+    except Exception:
+        return None
+    if version is not None and entry.get("version") != version:
+        return None
+    return entry
+
+
+def store_entry(path, entry):
+    """
+        Function writing a cache entry. The entry is written to a
+        temporary file and renamed, so processes sharing the cache
+        never read a partial entry.
+
+        input: path: path of the cache entry.
+        input: entry: dict to save.
+    """
+    folder = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            pickle.dump(entry, fp, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def evict(cache_dir, max_bytes=CACHE_MAX_BYTES):
+    """
+        Function removing the least recently used entries until
+        the cache is smaller than max_bytes.
+
+        input: cache_dir: folder of the cache.
+        input: max_bytes: size limit of the cache.
+        output: number of entries removed.
+    """
+    entries = []
+    total = 0
+    for item in os.scandir(cache_dir):
+        if not item.name.endswith(".pkl"):
+            continue
+        stat = item.stat()
+        entries.append((stat.st_mtime, stat.st_size, item.path))
+        total += stat.st_size
+
+    removed = 0
+    entries.sort()
+    for mtime, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    return removed
+
+
+def cached_call(file_path, kind, function, cache_dir=CACHE_FOLDER_PATH,
+                verify_hash=False, max_bytes=CACHE_MAX_BYTES, refresh=False):
+    """
+        Function returning the parsed data of a report, from the
+        cache when the report did not change and from function()
+        otherwise. Reports that don't exist are never cached.
+
+        input: file_path: path of the report.
+        input: kind: string naming the parse done on the report. It
+            must change when the parse options change.
+        input: function: callable without arguments that reads and
+            parses the report.
+        input: cache_dir: folder of the cache.
+        input: verify_hash: compare content hashes when the size or
+            modification time of the report changed.
+        input: max_bytes: size limit of the cache.
+        input: refresh: run function() and store its data even when
+            the cache holds the report.
+        output: (data, hit). hit is True when data came from the cache.
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return function(), False
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+    path = entry_path(cache_dir, file_path, kind)
+    entry = load_entry(path) if not refresh else None
+
+    content_hash = None
+    if entry is not None:
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            os.utime(path, None)    # Mark as recently used.
+            return entry["data"], True
+        if verify_hash and entry["size"] == stat.st_size and entry["hash"] is not None:
+            content_hash = file_hash(file_path)
+            if content_hash == entry["hash"]:
+                entry["mtime"] = stat.st_mtime
+                store_entry(path, entry)
+                return entry["data"], True
+
+    data = function()
+    if verify_hash and content_hash is None:
+        content_hash = file_hash(file_path)
+    store_entry(path, {"version": CACHE_VERSION,
+                       "path": os.path.abspath(file_path),
+                       "kind": kind,
+                       "size": stat.st_size,
+                       "mtime": stat.st_mtime,
+                       "hash": content_hash,
+                       "data": data})
+    evict(cache_dir, max_bytes)
+
+    return data, False
@@ -0,0 +1,432 @@
+"""
+    Description:
+        Optional instrumentation of the parsers. Once enabled, every
+        report parsed through report_parser.cached_parse() adds a
+        record of where its time went, and every output written
+        through report_writer adds one with its write time:
+
+            report: bytes_read (on disk) and bytes_decoded, read_s
+                (file reads), decompress_s, parse_s (the rest of the
+                time, the parser itself), records emitted and whether
+                the result came from the parse cache.
+            output: write_s and bytes_written.
+
+        Plain reports read through mmap fault their pages in while
+        they are parsed, so their read time counts as parse time.
+
+        Records are kept per process. Work sent to worker processes
+        goes through recorded_call(), which sends the records of the
+        worker back with its result. write_log() saves them as JSON
+        or CSV.
+
+        The profile mode wraps cProfile (cpu) or tracemalloc
+        (memory) around the parses of one kind of report.
+"""
+import contextlib
+import io
+import os
+import threading
+import time
+from collections import namedtuple
+
+import lazy_import
+
+# Imported when a log is written or a profile runs.
+cProfile = lazy_import.lazy_module("cProfile")
+csv = lazy_import.lazy_module("csv")
+json = lazy_import.lazy_module("json")
+platform = lazy_import.lazy_module("platform")
+pstats = lazy_import.lazy_module("pstats")
+tracemalloc = lazy_import.lazy_module("tracemalloc")
+
+METRICS_LOG_ENV = "REPORT_PARSER_METRICS"   # Metrics log of the interactive prompt.
+METRIC_COLUMNS = ["event", "pid", "file", "kind", "stage", "codec", "cached", "bytes_read",
+                  "bytes_decoded", "read_s", "decompress_s", "parse_s", "records",
+                  "write_s", "bytes_written", "alloc_peak_bytes"]
+# Parses that can be profiled, the first field of the parse cache kinds.
+PROFILE_KINDS = ["syn_qor", "apr_qor", "clock_qor", "summary", "full_clock"]
+PROFILE_MODES = ["cpu", "memory"]
+PROFILE_TOP = 30        # Functions or source lines printed of a profile.
+
+# Records of this process, the report parsed by each thread and the
+# running profile.
+_STATE = {"enabled": False, "records": [], "profile": None}
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+
+Recorded = namedtuple('Recorded', ['value', 'records'])
+
+
+def enable():
+    """
+        Function starting to record the metrics of this process.
+    """
+    _STATE["enabled"] = True
+
+
+def enabled():
+    """
+        Function returning True when metrics are recorded.
+    """
+    return _STATE["enabled"]
+
+
+def drain():
+    """
+        Function returning the records of this process and
+        clearing them.
+
+        output: list of record dicts with the fields of METRIC_COLUMNS.
+    """
+    with _LOCK:
+        records = _STATE["records"]
+        _STATE["records"] = []
+    return records
+
+
+def add_records(records):
+    """
+        Function adding records, from a worker process, to the
+        records of this process.
+
+        input: records: list of record dicts.
+    """
+    with _LOCK:
+        _STATE["records"].extend(records)
+
+
+def recorded_call(function, *args):
+    """
+        Function calling function in a worker process with metrics
+        enabled.
+
+        input: function: callable run by the worker.
+        input: args: arguments of function.
+        output: Recorded with the value of function and the records
+            of the call.
+    """
+    enable()
+    drain()
+    value = function(*args)
+    return Recorded(value, drain())
+
+
+def unwrap(result):
+    """
+        Function returning the value of a worker result, adding its
+        records when it came from recorded_call().
+
+        input: result: Recorded or any value.
+    """
+    if isinstance(result, Recorded):
+        add_records(result.records)
+        return result.value
+    return result
+
+
+def new_record(event, file_path):
+    """
+        Function returning an empty record.
+
+        input: event: "report" or "output".
+        input: file_path: path of the report or output.
+    """
+    record = dict.fromkeys(METRIC_COLUMNS, 0)
+    record.update({"event": event, "pid": os.getpid(), "file": file_path, "kind": "",
+                   "stage": "", "codec": "", "cached": False})
+    return record
+
+
+def current_report():
+    """
+        Function returning the record of the report parsed by this
+        thread, None when metrics are off.
+    """
+    return getattr(_LOCAL, "record", None)
+
+
+def profiled(kind):
+    """
+        Function returning the running profile when it covers the
+        parses of kind, None otherwise.
+
+        input: kind: parse cache kind, e.g. "apr_qor:route_opt".
+    """
+    profile = _STATE["profile"]
+    if profile is None or profile["kind"] not in ("all", kind.split(":")[0]):
+        return None
+    return profile
+
+
+@contextlib.contextmanager
+def report_timer(file_path, kind):
+    """
+        Function timing the read and parse of one report. The
+        readers of report_io add their read and decompression times
+        to the record while the block runs.
+
+        input: file_path: path of the report.
+        input: kind: parse cache kind, "<parse>:<stage>[:...]".
+        output: yields the record, None when metrics and profile
+            are both off.
+    """
+    profile = profiled(kind)
+    if not _STATE["enabled"] and profile is None:
+        yield None
+        return
+
+    fields = kind.split(":")
+    record = new_record("report", file_path)
+    record.update({"kind": fields[0], "stage": fields[1] if len(fields) > 1 else ""})
+    previous = current_report()
+    _LOCAL.record = record
+    start_profile_block(profile)
+    start_time = time.perf_counter()
+    try:
+        yield record
+    finally:
+        elapsed = time.perf_counter() - start_time
+        stop_profile_block(profile, record)
+        _LOCAL.record = previous
+        finish_record(record, elapsed)
+        if _STATE["enabled"]:
+            add_records([record])
+
+
+def finish_record(record, elapsed):
+    """
+        Function deriving the decompression and parse times of a
+        report record.
+
+        input: record: report record, updated.
+        input: elapsed: time of the whole block in seconds.
+    """
+    # decompress_s holds the time of the decompressed reads, which
+    # includes the reads of the file.
+    if record["decompress_s"]:
+        record["decompress_s"] = max(0.0, record["decompress_s"] - record["read_s"])
+    elif not record["bytes_decoded"]:
+        record["bytes_decoded"] = record["bytes_read"]
+    if not record["cached"] and not record["bytes_read"] and os.path.isfile(record["file"]):
+        # Plain report read through mmap.
+        record["bytes_read"] = record["bytes_decoded"] = os.path.getsize(record["file"])
+        record["codec"] = record["codec"] or "none"
+    record["parse_s"] = max(0.0, elapsed - record["read_s"] - record["decompress_s"])
+
+
+def count_records(record, data):
+    """
+        Function setting the records emitted by a parse.
+
+        input: record: record from report_timer(), or None.
+        input: data: parsed data, a StageTable or None.
+    """
+    if record is not None and data is not None:
+        record["records"] = len(data)
+
+
+class TimedReader(io.RawIOBase):
+    """
+        Raw reader adding the time and bytes of its reads to a
+        report record.
+    """
+
+    def __init__(self, raw, record, time_field, bytes_field, owned=()):
+        """
+            input: raw: object with readinto(), closed with the reader.
+            input: record: report record, updated.
+            input: time_field: record field of the read time.
+            input: bytes_field: record field of the bytes read.
+            input: owned: other objects closed with the reader.
+        """
+        io.RawIOBase.__init__(self)
+        self.raw = raw
+        self.record = record
+        self.time_field = time_field
+        self.bytes_field = bytes_field
+        self.owned = owned
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        start_time = time.perf_counter()
+        size = self.raw.readinto(buffer)
+        self.record[self.time_field] += time.perf_counter() - start_time
+        self.record[self.bytes_field] += size or 0
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+            for item in self.owned:
+                item.close()
+        io.RawIOBase.close(self)
+
+
+@contextlib.contextmanager
+def output_timer(file_path):
+    """
+        Function timing the write of one output.
+
+        input: file_path: path of the output.
+    """
+    if not _STATE["enabled"]:
+        yield
+        return
+
+    record = new_record("output", file_path)
+    start_time = time.perf_counter()
+    yield
+    record["write_s"] = time.perf_counter() - start_time
+    record["bytes_written"] = os.path.getsize(file_path) if os.path.isfile(file_path) else 0
+    add_records([record])
+
+
+def totals(records):
+    """
+        Function summing the records per event and kind.
+
+        input: records: list of record dicts.
+        output: list of dicts with the "event", "kind", number of
+            "files" and the sum of every numeric field.
+    """
+    sums = {}
+    for record in records:
+        key = (record["event"], record["kind"])
+        if key not in sums:
+            sums[key] = {"event": key[0], "kind": key[1], "files": 0, "cached": 0}
+            for field in METRIC_COLUMNS[7:]:
+                sums[key][field] = 0
+        total = sums[key]
+        total["files"] += 1
+        total["cached"] += bool(record["cached"])
+        for field in METRIC_COLUMNS[7:]:
+            total[field] += record[field]
+    return [sums[key] for key in sorted(sums)]
+
+
+def print_totals(records):
+    """
+        Function printing where the time of the parse went.
+
+        input: records: list of record dicts.
+    """
+    print("{0:<8}{1:<12}{2:>7}{3:>7}{4:>9}{5:>11}{6:>9}{7:>11}{8:>10}{9:>10}{10:>9}{11:>12}".format(
+        "Event", "Kind", "Files", "Cached", "Read MB", "Decoded MB", "Read s", "Decomp. s",
+        "Parse s", "Records", "Write s", "Written MB"))
+    for total in totals(records):
+        print("{0:<8}{1:<12}{2:>7}{3:>7}{4:>9.1f}{5:>11.1f}{6:>9.2f}{7:>11.2f}{8:>10.2f}"
+              "{9:>10}{10:>9.2f}{11:>12.1f}".format(
+                  total["event"], total["kind"] or "-", total["files"], total["cached"],
+                  total["bytes_read"] / 1e6, total["bytes_decoded"] / 1e6, total["read_s"],
+                  total["decompress_s"], total["parse_s"], total["records"], total["write_s"],
+                  total["bytes_written"] / 1e6))
+
+
+def write_log(file_path, records):
+    """
+        Function writing records to a metrics log, CSV when the
+        file name ends with .csv and JSON otherwise.
+
+        input: file_path: path of the log.
+        input: records: list of record dicts.
+    """
+    if file_path.endswith(".csv"):
+        with open(file_path, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=METRIC_COLUMNS)
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        with open(file_path, 'w') as fp:
+            json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                       "host": platform.node(),
+                       "totals": totals(records),
+                       "records": records}, fp, indent=1)
+    print("Metrics log generated at path: " + file_path)
+
+
+def start_profile(kind, mode="cpu"):
+    """
+        Function starting to profile the parses of one kind of
+        report. Only the thread parsing the report is profiled by
+        cProfile, so the profiled reports should be parsed serially
+        in this process.
+
+        input: kind: one of PROFILE_KINDS, or "all".
+        input: mode: "cpu" for cProfile, "memory" for tracemalloc.
+    """
+    _STATE["profile"] = {"kind": kind, "mode": mode,
+                         "profiler": cProfile.Profile() if mode == "cpu" else None,
+                         "sizes": {}, "peaks": []}
+
+
+def start_profile_block(profile):
+    """
+        Function starting the profiler for one parse.
+
+        input: profile: running profile, or None.
+    """
+    if profile is None:
+        return
+    if profile["mode"] == "cpu":
+        profile["profiler"].enable()
+    else:
+        tracemalloc.start()
+
+
+def stop_profile_block(profile, record):
+    """
+        Function stopping the profiler after one parse. tracemalloc
+        adds the peak allocation of the parse to the record and
+        the allocations still held to the profile.
+
+        input: profile: running profile, or None.
+        input: record: report record, updated.
+    """
+    if profile is None:
+        return
+    if profile["mode"] == "cpu":
+        profile["profiler"].disable()
+        return
+    snapshot = tracemalloc.take_snapshot()
+    record["alloc_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    profile["peaks"].append((record["alloc_peak_bytes"], record["file"]))
+    for stat in snapshot.statistics("lineno"):
+        line = str(stat.traceback)
+        profile["sizes"][line] = profile["sizes"].get(line, 0) + stat.size
+
+
+def finish_profile(out_path=None):
+    """
+        Function stopping the profile and printing its results.
+
+        input: out_path: file the profile is saved to: pstats data
+            for cpu, text for memory. None to only print it.
+    """
+    profile = _STATE["profile"]
+    _STATE["profile"] = None
+    if profile is None:
+        return
+
+    if profile["mode"] == "cpu":
+        stats = pstats.Stats(profile["profiler"])
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        if out_path:
+            stats.dump_stats(out_path)
+            print("Profile generated at path: " + out_path)
+        return
+
+    lines = ["Peak allocation per report:"]
+    for peak, file_path in sorted(profile["peaks"], reverse=True):
+        lines.append("{0:>12.1f} KB  {1}".format(peak / 1024.0, file_path))
+    lines.append("Allocations held after the parses, by source line:")
+    ranked = sorted(profile["sizes"].items(), key=lambda item: item[1], reverse=True)
+    for line, size in ranked[:PROFILE_TOP]:
+        lines.append("{0:>12.1f} KB  {1}".format(size / 1024.0, line))
+    print("\n".join(lines))
+    if out_path:
+        with open(out_path, 'w') as fp:
+            fp.write("\n".join(lines) + "\n")
+        print("Profile generated at path: " + out_path)
@@ -0,0 +1,372 @@
+"""
+    Description:
+        Extraction of every timing path of a full_clock report into
+        NumPy arrays, and slack analytics computed on the arrays.
+
+        Each decompressed block of whole paths is searched with
+        regular expressions for the path fields, and the matches are
+        assigned to their path with np.searchsorted() on the offsets
+        of the slack lines, so no Python code runs per report line
+        or per path. The clock pins of the start and end registers,
+        which give the clock skew, are matched the same way, with a
+        back reference to the startpoint or endpoint of the path.
+        The logic depth counts the pin lines between them, found
+        with NumPy on the bytes of the block.
+
+        Columns of the extracted paths (one value per path, in report
+        order):
+            slack, required, arrival: float64, NaN when missing.
+            skew: capture minus launch clock latency, read from the
+                clock pin lines of the start and end registers.
+            logic_depth: cells on the data path between the start and
+                end registers, -1 when it cannot be found.
+            endpoint_id, group_id: index in the endpoints and groups
+                arrays of names.
+
+        Usage:
+            python path_arrays.py blk.route2.timing.max.full_clock.rpt.gz \\
+                --thresholds 0 -0.05 -0.1 --bins 20
+"""
+import argparse
+import re
+import sys
+
+import numpy as np
+
+import path_index
+import report_io
+
+HEADER_LINES = path_index.HEADER_LINES   # Title lines of a report.
+PERCENTILES = [0.0, 0.1, 1.0, 5.0, 10.0, 50.0]      # Default percentiles of slack.
+THRESHOLDS = [0.0, -0.01, -0.05, -0.1, -0.5]        # Default slack thresholds.
+
+# Fields of a timing path. Every pattern starts with a literal so the
+# regular expression engine can skip ahead quickly.
+SLACK_RE = re.compile(br"slack \([^)\n]*\)[ \t]+(\S+)")
+REQUIRED_RE = re.compile(br"data required time[ \t]+(\S+)")
+ARRIVAL_RE = re.compile(br"data arrival time[ \t]+(\S+)")
+STARTPOINT_RE = re.compile(br"Startpoint:[ \t]*(\S+)")
+ENDPOINT_RE = re.compile(br"Endpoint:[ \t]*(\S+)")
+GROUP_RE = re.compile(br"Path Group:[ \t]*(\S+)")
+# Clock edge line, group 1 is the edge time.
+EDGE_RE = re.compile(br"clock \S+ \((?:rise|fall) edge\)[ \t]+\S+[ \t]+(\S+)")
+# Lines of one path, from the end of a line up to a line of the same
+# path, never past the Startpoint line of the next path.
+PATH_LINES = br"[^\n]*(?:\n(?![ \t]*Startpoint:)[^\n]*)*?"
+# Pin line of the instance of group 1, e.g. "u0/CK (DFF)  0.00  0.35 r",
+# group 2 is the path time.
+INSTANCE_PIN = br"\n[ \t]*\1/\S+[ \t]+\([^)\n]*\)[ \t&*]+-?[\d.]+[ \t&*]+(-?[\d.]+)"
+# First pin of the start register, its clock pin.
+LAUNCH_RE = re.compile(br"Startpoint:[ \t]*(\S+)" + PATH_LINES + INSTANCE_PIN)
+# First pin of the end register after the data arrival, its clock
+# pin in the capture clock path.
+CAPTURE_RE = re.compile(br"Endpoint:[ \t]*(\S+)/[^\s/]+" + PATH_LINES
+                        + br"\n[ \t]*data arrival time" + PATH_LINES + INSTANCE_PIN)
+
+
+def find_values(pattern, block, group=1):
+    """
+        Function returning the offsets and values of one group of
+        every match of a pattern in a block.
+
+        input: pattern: compiled bytes pattern.
+        input: block: bytes searched.
+        input: group: number of the group.
+        output: (offsets, values). offsets is an int64 array of the
+            group offsets and values a list of bytes.
+    """
+    matches = [(match.start(group), match.group(group)) for match in pattern.finditer(block)]
+    if not matches:
+        return np.empty(0, dtype=np.int64), []
+    offsets, values = zip(*matches)
+    return np.array(offsets, dtype=np.int64), list(values)
+
+
+def to_floats(values):
+    """
+        Function converting report tokens to a float64 array. Tokens
+        that are not numbers give NaN.
+
+        input: values: list of bytes.
+    """
+    try:
+        return np.array(values, dtype=np.bytes_).astype(np.float64)
+    except ValueError:
+        result = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                result[i] = float(value)
+            except ValueError:
+                result[i] = np.nan
+        return result
+
+
+def first_per_path(path_ends, offsets, values, num_paths, fill):
+    """
+        Function assigning each match to the path holding it and
+        keeping the first match of every path.
+
+        input: path_ends: sorted offsets of the slack lines.
+        input: offsets: offsets of the matches.
+        input: values: array of the matched values.
+        input: num_paths: number of paths in the block.
+        input: fill: value of paths without match.
+        output: array with one value per path.
+    """
+    result = np.full(num_paths, fill, dtype=values.dtype)
+    if len(offsets):
+        paths = np.searchsorted(path_ends, offsets)
+        keep = paths < num_paths
+        paths, first = np.unique(paths[keep], return_index=True)
+        result[paths] = values[keep][first]
+    return result
+
+
+def path_blocks(file_path):
+    """
+        Generator of the decompressed report in blocks of whole
+        paths. Each block ends after a slack line; the title lines
+        of the report are left out.
+
+        input: file_path: path of the report file.
+    """
+    codec = report_io.detect_codec(file_path)
+    blocks, fp, _ = path_index.report_blocks(file_path, codec, False)
+    with fp:
+        carry = b""
+        skip = HEADER_LINES + 1
+        for block in path_index.line_blocks(blocks):
+            while skip and block:
+                # Drop the title of the report.
+                position = block.find(b"\n") + 1
+                block = block[position:] if position else b""
+                skip -= 1
+            block = carry + block
+            cut = paths_end(block)
+            if cut:
+                yield block[:cut]
+            carry = block[cut:]
+        if paths_end(carry):
+            yield carry
+
+
+def paths_end(block):
+    """
+        Function returning the offset after the last slack line of
+        a block, 0 if the block has no slack line.
+
+        input: block: bytes of whole lines.
+    """
+    position = len(block)
+    while True:
+        position = block.rfind(b"slack (", 0, position)
+        if position == -1:
+            return 0
+        match = SLACK_RE.match(block, position)
+        if match is not None:
+            line_end = block.find(b"\n", match.end())
+            return len(block) if line_end == -1 else line_end + 1
+
+
+def pin_line_ends(block):
+    """
+        Function returning the offsets of the newlines ending a pin
+        line, which ends with the rise or fall transition.
+
+        input: block: bytes of whole lines.
+        output: sorted int64 array.
+    """
+    data = np.frombuffer(block, dtype=np.uint8)
+    newlines = np.flatnonzero(data == ord("\n"))
+    last = newlines - 1
+    last -= (last >= 0) & (data[np.maximum(last, 0)] == ord("\r"))
+    keep = last >= 1
+    newlines, last = newlines[keep], last[keep]
+    pins = (((data[last] == ord("r")) | (data[last] == ord("f")))
+            & (data[last - 1] == ord(" ")))
+    return newlines[pins]
+
+
+def block_paths(block):
+    """
+        Function extracting the paths of one block.
+
+        input: block: bytes of whole paths from path_blocks().
+        output: dict of the columns of the paths in the block, with
+            startpoint, endpoint and group names as lists of bytes.
+    """
+    slack_offsets, slack_values = find_values(SLACK_RE, block)
+    num_paths = len(slack_offsets)
+    path_starts = np.concatenate(([0], slack_offsets[:-1]))
+
+    columns = {"slack": to_floats(slack_values)}
+    offsets, values = find_values(REQUIRED_RE, block)
+    columns["required"] = first_per_path(slack_offsets, offsets, to_floats(values), num_paths, np.nan)
+    arrival_offsets, values = find_values(ARRIVAL_RE, block)
+    columns["arrival"] = first_per_path(slack_offsets, arrival_offsets, to_floats(values),
+                                        num_paths, np.nan)
+    for name, pattern in (("startpoint", STARTPOINT_RE), ("endpoint", ENDPOINT_RE),
+                          ("group", GROUP_RE)):
+        offsets, values = find_values(pattern, block)
+        names = np.array(values, dtype=np.bytes_) if values else np.empty(0, dtype=np.bytes_)
+        columns[name] = first_per_path(slack_offsets, offsets, names, num_paths, b"").tolist()
+
+    edge_offsets, edge_values = find_values(EDGE_RE, block)
+    edge_times = to_floats(edge_values)
+
+    # Offsets of the first arrival line and of the clock pins of
+    # the start and end registers of every path, -1 when missing.
+    arrival = first_per_path(slack_offsets, arrival_offsets, arrival_offsets, num_paths,
+                             -1).astype(np.int64)
+    offsets, values = find_values(LAUNCH_RE, block, 2)
+    launch = first_per_path(slack_offsets, offsets, offsets, num_paths, -1).astype(np.int64)
+    launch_time = first_per_path(slack_offsets, offsets, to_floats(values), num_paths, np.nan)
+    offsets, values = find_values(CAPTURE_RE, block, 2)
+    capture_time = first_per_path(slack_offsets, offsets, to_floats(values), num_paths, np.nan)
+
+    logic_depth = np.full(num_paths, -1, dtype=np.int32)
+    found = (launch >= 0) & (launch < arrival)
+    # Pins from the clock pin to the data arrival, less the clock pin,
+    # the start register output and the end register input.
+    pin_ends = pin_line_ends(block)
+    num_pins = np.searchsorted(pin_ends, arrival[found]) - np.searchsorted(pin_ends, launch[found])
+    logic_depth[found] = np.maximum(0, num_pins - 3)
+
+    # Launch edge is the first clock edge of the path, capture edge the last.
+    first_edge = np.searchsorted(edge_offsets, path_starts)
+    last_edge = np.searchsorted(edge_offsets, slack_offsets) - 1
+    skew = np.full(num_paths, np.nan)
+    found &= (last_edge > first_edge)
+    skew[found] = ((capture_time[found] - edge_times[last_edge[found]])
+                   - (launch_time[found] - edge_times[first_edge[found]]))
+
+    columns["skew"] = skew
+    columns["logic_depth"] = logic_depth
+    return columns
+
+
+def extract_paths(file_path):
+    """
+        Function extracting every timing path of a report.
+
+        input: file_path: path of the report, plain or compressed.
+        output: dict of arrays: slack, required, arrival, skew,
+            logic_depth, endpoint_id and group_id with one value per
+            path, endpoints and groups with the names of the ids.
+    """
+    parts = [block_paths(block) for block in path_blocks(file_path)]
+    paths = {}
+    for name, dtype in (("slack", np.float64), ("required", np.float64),
+                        ("arrival", np.float64), ("skew", np.float64),
+                        ("logic_depth", np.int32)):
+        paths[name] = np.concatenate([part[name] for part in parts]) if parts \
+            else np.empty(0, dtype=dtype)
+    for name, ids in (("endpoint", "endpoint_id"), ("group", "group_id")):
+        names = [value for part in parts for value in part[name]]
+        unique, inverse = np.unique(np.array(names, dtype=np.bytes_), return_inverse=True)
+        paths[name + "s"] = np.char.decode(unique, 'utf-8') if len(unique) else np.empty(0, dtype=str)
+        paths[ids] = inverse.astype(np.int32).reshape(-1)
+    return paths
+
+
+def slack_histogram(paths, bins=50, value_range=None):
+    """
+        Function returning the histogram of the path slacks.
+
+        input: paths: dict from extract_paths().
+        input: bins: number of bins, or array of bin edges.
+        input: value_range: (low, high) of the bins, None for the
+            range of the slacks.
+        output: (counts, bin edges).
+    """
+    slack = paths["slack"]
+    return np.histogram(slack[np.isfinite(slack)], bins=bins, range=value_range)
+
+
+def tns_per_group(paths):
+    """
+        Function returning the total negative slack of every path group.
+
+        input: paths: dict from extract_paths().
+        output: dict of TNS per group name.
+    """
+    negative = np.minimum(np.nan_to_num(paths["slack"], nan=0.0), 0.0)
+    totals = np.bincount(paths["group_id"], weights=negative, minlength=len(paths["groups"]))
+    return dict(zip(paths["groups"].tolist(), totals.tolist()))
+
+
+def slack_percentiles(paths, percents=PERCENTILES):
+    """
+        Function returning percentiles of the path slacks. The 0th
+        percentile is the WNS.
+
+        input: paths: dict from extract_paths().
+        input: percents: list of percentiles, between 0 and 100.
+        output: dict of slack per percentile.
+    """
+    slack = paths["slack"]
+    slack = slack[np.isfinite(slack)]
+    if not len(slack):
+        return dict((percent, float("nan")) for percent in percents)
+    return dict(zip(percents, np.percentile(slack, percents).tolist()))
+
+
+def count_below(paths, thresholds=THRESHOLDS):
+    """
+        Function counting the paths with a slack below each threshold.
+
+        input: paths: dict from extract_paths().
+        input: thresholds: list of slack thresholds.
+        output: dict of path count per threshold.
+    """
+    slack = np.sort(paths["slack"][np.isfinite(paths["slack"])])
+    counts = np.searchsorted(slack, thresholds, side='left')
+    return dict(zip(thresholds, counts.tolist()))
+
+
+def main(argv):
+    """
+        Command line entry point printing the slack analytics of a report.
+
+        input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Slack analytics of a full_clock report.")
+    parser.add_argument("report", help="full_clock report, plain or compressed")
+    parser.add_argument("--bins", type=int, default=20, help="bins of the slack histogram")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=THRESHOLDS,
+                        help="count the paths with a slack below these values")
+    parser.add_argument("--percentiles", type=float, nargs="+", default=PERCENTILES,
+                        help="slack percentiles printed")
+    parser.add_argument("--save", default=None, help="save the path arrays to this .npz file")
+    args = parser.parse_args(argv)
+
+    file_path = report_io.find_report(args.report)
+    if file_path is None:
+        print("File path {0} not found.".format(args.report))
+        return 1
+    paths = extract_paths(file_path)
+    print("{0} paths, {1} endpoints, {2} path groups.".format(
+        len(paths["slack"]), len(paths["endpoints"]), len(paths["groups"])))
+
+    print("Slack percentiles:")
+    for percent, slack in slack_percentiles(paths, args.percentiles).items():
+        print("    {0:>6.1f}%  {1:.4f}".format(percent, slack))
+    print("Paths below slack threshold:")
+    for threshold, count in count_below(paths, args.thresholds).items():
+        print("    {0:>8.3f}  {1}".format(threshold, count))
+    print("TNS per path group:")
+    for group, tns in sorted(tns_per_group(paths).items(), key=lambda item: item[1]):
+        print("    {0:<30}{1:.4f}".format(group, tns))
+    print("Slack histogram:")
+    counts, edges = slack_histogram(paths, args.bins)
+    for count, low, high in zip(counts, edges[:-1], edges[1:]):
+        print("    [{0:8.3f}, {1:8.3f})  {2}".format(low, high, count))
+
+    if args.save:
+        np.savez(args.save, **paths)
+        print("npz file generated at path: " + args.save)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,483 @@
+"""
+    Description:
+        Random access to the timing paths of full_clock reports.
+        The first parse of a report records, for every path, its
+        startpoint, endpoint, path group, slack and the offset and
+        length of its text in the decompressed report. The index is
+        saved in a sidecar file next to the report, so later
+        questions ("path #37", "all paths to this endpoint") seek
+        straight to the paths instead of scanning the report again.
+
+        Random reads into gzip reports need the indexed_gzip
+        module: its seek points are exported to a second sidecar
+        file while indexing, and every later read starts from the
+        nearest one instead of byte 0. Without indexed_gzip, gzip
+        reports are still indexed but their paths can't be read.
+        bz2, xz and zstd reports are read from the start.
+
+        Usage:
+            python path_index.py blk.route2.timing.max.full_clock.rpt.gz --path 37
+            python path_index.py blk.route2.timing.max.full_clock.rpt.gz --endpoint u_core/r_reg/D
+"""
+import argparse
+import io
+import os
+import sys
+import zlib
+from collections import deque
+
+import parse_cache
+import report_io
+from qor_records import StageTable, number_decimals
+
+try:
+    import indexed_gzip
+except ImportError:
+    indexed_gzip = None
+
+INDEX_SUFFIX = ".pidx"              # Sidecar file of the path index.
+GZIP_INDEX_SUFFIX = ".gzidx"        # Sidecar file of the indexed_gzip seek points.
+INDEX_VERSION = 2                   # Increment when the index format changes.
+CHECKPOINT_SPACING = 16 * 1024 * 1024   # Decompressed bytes between indexed_gzip seek points.
+HEADER_LINES = 20                   # Title lines of a report, never part of a path.
+GZIP_WBITS = zlib.MAX_WBITS | 16    # zlib window bits of a gzip stream.
+
+
+def index_path(file_path):
+    """
+        Function returning the sidecar index file of a report.
+
+        input: file_path: path of the report file.
+    """
+    return file_path + INDEX_SUFFIX
+
+
+def report_key(file_path):
+    """
+        Function returning the key identifying one version of a report.
+
+        input: file_path: path of the report file.
+        output: (absolute path, size, mtime).
+    """
+    stat = os.stat(file_path)
+    return os.path.abspath(file_path), stat.st_size, stat.st_mtime
+
+
+def gzip_blocks(fp):
+    """
+        Generator decompressing a gzip file with zlib.
+
+        input: fp: gzip file opened in binary mode.
+        output: yields blocks of decompressed bytes.
+    """
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    while True:
+        chunk = fp.read(report_io.STREAM_BUFFER_SIZE)
+        if not chunk:
+            return
+        while chunk:
+            block = decompressor.decompress(chunk)
+            if block:
+                yield block
+            chunk = b""
+            if decompressor.eof:
+                # The next gzip member, if any, starts in the unused data.
+                chunk = decompressor.unused_data
+                if chunk and not chunk.startswith(b"\x1f\x8b"):
+                    return      # Trailing garbage after the last member.
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+
+
+def line_blocks(blocks):
+    """
+        Generator regrouping blocks of bytes so every block ends
+        on a newline, except the last one.
+
+        input: blocks: iterable of bytes.
+        output: yields blocks of whole lines.
+    """
+    tail = b""
+    for block in blocks:
+        cut = block.rfind(b"\n") + 1
+        if cut == 0:
+            tail += block
+            continue
+        yield tail + block[:cut]
+        tail = block[cut:]
+    if tail:
+        yield tail
+
+
+def read_blocks(fp):
+    """
+        Generator reading a binary file object in large blocks.
+
+        input: fp: binary file object.
+    """
+    block = fp.read(report_io.STREAM_BUFFER_SIZE)
+    while block:
+        yield block
+        block = fp.read(report_io.STREAM_BUFFER_SIZE)
+
+
+def report_blocks(file_path, codec, seek_points=True):
+    """
+        Function opening a report for indexing.
+
+        input: file_path: path of the report file.
+        input: codec: codec from report_io.detect_codec().
+        input: seek_points: build the seek points of gzip reports
+            with indexed_gzip, when it is installed.
+        output: (iterable of decompressed blocks, file object to
+            close, indexed_gzip file or None).
+    """
+    if codec == "gzip" and seek_points and indexed_gzip is not None:
+        indexed = indexed_gzip.IndexedGzipFile(file_path, spacing=CHECKPOINT_SPACING)
+        return read_blocks(indexed), indexed, indexed
+    if codec == "gzip":
+        fp = open(file_path, 'rb')
+        return gzip_blocks(fp), fp, None
+    fp = report_io.open_binary(file_path)
+    return read_blocks(fp), fp, None
+
+
+def indexed_report(file_path, stage=""):
+    """
+        Generator yielding the decoded lines of a report while
+        indexing its timing paths. The index is saved when the
+        report has been read to the end, so the lines can be given
+        to cadence_parser.parse_clock_path_report() and the report
+        is decompressed only once.
+
+        Blocks of whole lines are searched for the path header and
+        slack lines with bytes.find(); only those lines are looked
+        at one by one. A path ends on its slack line. It
+        starts on its Startpoint line, or after the end of the
+        previous path for reports without one.
+
+        input: file_path: path of the report file.
+        input: stage: stage of the report.
+        output: yields each line of the report as a string.
+    """
+    key = report_key(file_path)
+    codec = report_io.detect_codec(file_path)
+    paths = StageTable('apr', stage, 'timing_path')
+    startpoints, endpoints, path_groups, slacks, offsets, lengths = paths.columns
+    slack_decimals = paths.decimals[paths.names.index('slack')]
+
+    blocks, fp, indexed = report_blocks(file_path, codec)
+    with fp:
+        block_start = 0         # Offset of the block in the report.
+        header_end = None       # Offset of the first line after the title.
+        header_lines = 0
+        path_start = 0
+        startpoint = endpoint = path_group = ""
+        for block in line_blocks(blocks):
+            yield from io.StringIO(block.decode('utf-8', 'replace'))
+
+            if header_end is None:
+                header_end = title_end(block, block_start, header_lines)
+                header_lines += block.count(b"\n")
+
+            starts = find_all(block, b"Startpoint:")
+            ends = find_all(block, b"Endpoint:")
+            groups = find_all(block, b"Path Group:")
+            slack_positions = find_all(block, b"slack")
+            slack_positions.append(len(block))
+            for position in slack_positions:
+                # Take the path header lines found before the slack line.
+                while starts and starts[0] < position:
+                    start = starts.popleft()
+                    path_start = block_start + block.rfind(b"\n", 0, start) + 1
+                    startpoint = word(block, start, 1)
+                while ends and ends[0] < position:
+                    endpoint = word(block, ends.popleft(), 1)
+                while groups and groups[0] < position:
+                    path_group = word(block, groups.popleft(), 2)
+                if position == len(block):
+                    break   # The rest of the path is in the next block.
+
+                line_start = block.rfind(b"\n", 0, position) + 1
+                if header_end is None or block_start + line_start < header_end:
+                    continue
+                line_end = block.find(b"\n", position)
+                line_end = len(block) if line_end == -1 else line_end + 1
+                try:
+                    slack_token = block[line_start:line_end].split()[2].decode('ascii')
+                    slack = float(slack_token)
+                except (IndexError, ValueError):
+                    continue
+                end = block_start + line_end
+                startpoints.append(sys.intern(startpoint))
+                endpoints.append(sys.intern(endpoint))
+                path_groups.append(sys.intern(path_group))
+                slacks.append(slack)
+                slack_decimals.append(number_decimals(slack_token))
+                offsets.append(path_start)
+                lengths.append(end - path_start)
+                path_start = end
+                startpoint = endpoint = path_group = ""
+            block_start += len(block)
+
+        gzip_index = None
+        if indexed is not None:
+            gzip_index = file_path + GZIP_INDEX_SUFFIX
+            try:
+                indexed.export_index(gzip_index)
+            except Exception:
+                gzip_index = None
+
+    save_index(file_path, key, codec, paths, gzip_index)
+
+
+def title_end(block, block_start, header_lines):
+    """
+        Function returning the offset of the first line after the
+        report title, once the block holding it is read.
+
+        input: block: block of whole lines.
+        input: block_start: offset of the block in the report.
+        input: header_lines: lines in the blocks before this one.
+        output: offset, None if the title goes on after the block.
+    """
+    position = 0
+    for _ in range(HEADER_LINES + 1 - header_lines):
+        position = block.find(b"\n", position) + 1
+        if position == 0:
+            return None
+    return block_start + position
+
+
+def find_all(block, needle):
+    """
+        Function returning the offsets of every occurrence of
+        needle in a block.
+
+        input: block: bytes searched.
+        input: needle: bytes to find.
+        output: deque of offsets, in increasing order.
+    """
+    positions = deque()
+    position = block.find(needle)
+    while position != -1:
+        positions.append(position)
+        position = block.find(needle, position + 1)
+    return positions
+
+
+def word(block, position, number):
+    """
+        Function returning one word of the line starting at
+        position, "" if the line is shorter.
+
+        input: block: bytes of whole lines.
+        input: position: offset of the label of the line.
+        input: number: word number, the label being word 0.
+    """
+    line_end = block.find(b"\n", position)
+    words = block[position:line_end if line_end != -1 else len(block)].split()
+    if len(words) > number:
+        return words[number].decode('utf-8', 'replace')
+    return ""
+
+
+def save_index(file_path, key, codec, paths, gzip_index):
+    """
+        Function writing the sidecar index of a report. Reports in
+        read-only folders are left without index.
+
+        input: file_path: path of the report file.
+        input: key: report_key() of the indexed report.
+        input: codec: codec of the report.
+        input: paths: StageTable of kind 'timing_path'.
+        input: gzip_index: indexed_gzip sidecar file, or None.
+    """
+    entry = {"index_version": INDEX_VERSION,
+             "size": key[1],
+             "mtime": key[2],
+             "codec": codec,
+             "gzip_index": gzip_index,
+             "paths": paths}
+    try:
+        parse_cache.store_entry(index_path(file_path), entry)
+    except (IOError, OSError) as err:
+        print("Could not write path index of {0}: {1}".format(file_path, err))
+
+
+def save_seek_points(file_path, entry, indexed):
+    """
+        Function writing the indexed_gzip seek points of a report
+        indexed without them, and adding them to its index.
+
+        input: file_path: path of the report file.
+        input: entry: index entry from load_index().
+        input: indexed: indexed_gzip file of the report.
+    """
+    gzip_index = file_path + GZIP_INDEX_SUFFIX
+    try:
+        indexed.build_full_index()
+        indexed.export_index(gzip_index)
+        entry["gzip_index"] = gzip_index
+        parse_cache.store_entry(index_path(file_path), entry)
+    except Exception as err:
+        print("Could not write gzip seek points of {0}: {1}".format(file_path, err))
+
+
+def load_index(file_path):
+    """
+        Function reading the sidecar index of a report.
+
+        input: file_path: path of the report file.
+        output: index entry, None when there is no index or the
+            report changed since it was indexed.
+    """
+    entry = parse_cache.load_entry(index_path(file_path), None)
+    if entry is None or entry.get("index_version") != INDEX_VERSION:
+        return None
+    stat = os.stat(file_path)
+    if entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+        return None
+    return entry
+
+
+def get_index(file_path, stage=""):
+    """
+        Function returning the index of a report, indexing it when
+        there is no valid sidecar index.
+
+        input: file_path: path of the report file.
+        input: stage: stage of the report.
+        output: index entry.
+    """
+    entry = load_index(file_path)
+    if entry is None:
+        for _ in indexed_report(file_path, stage):
+            pass
+        entry = load_index(file_path)
+    if entry is None:
+        raise IOError("Could not index {0}.".format(file_path))
+    return entry
+
+
+def find_paths(paths, startpoint=None, endpoint=None, path_group=None):
+    """
+        Function selecting paths of an index.
+
+        input: paths: StageTable of kind 'timing_path'.
+        input: startpoint: keep paths from this startpoint, or None.
+        input: endpoint: keep paths to this endpoint, or None.
+        input: path_group: keep paths of this group, or None.
+        output: list of path numbers, starting at 1, in report order.
+    """
+    numbers = []
+    for number, row in enumerate(paths.rows(), 1):
+        if startpoint is not None and row[0] != startpoint:
+            continue
+        if endpoint is not None and row[1] != endpoint:
+            continue
+        if path_group is not None and row[2] != path_group:
+            continue
+        numbers.append(number)
+    return numbers
+
+
+def read_range(file_path, entry, offset, length):
+    """
+        Function reading bytes of the decompressed report.
+
+        input: file_path: path of the report file.
+        input: entry: index entry from get_index().
+        input: offset: decompressed offset of the first byte.
+        input: length: number of bytes.
+        output: bytes read.
+    """
+    codec = entry["codec"]
+    if codec == "gzip" and indexed_gzip is None:
+        raise ImportError("Reading paths of gzip reports needs indexed_gzip.")
+    if codec is None:
+        with open(file_path, 'rb') as fp:
+            fp.seek(offset)
+            return fp.read(length)
+
+    if codec == "gzip":
+        # An index built without indexed_gzip has no seek points; they
+        # are built by the first read and saved for the next ones.
+        gzip_index = file_path + GZIP_INDEX_SUFFIX
+        if not entry["gzip_index"] or not os.path.isfile(gzip_index):
+            gzip_index = None
+        with indexed_gzip.IndexedGzipFile(file_path, spacing=CHECKPOINT_SPACING,
+                                          index_file=gzip_index) as fp:
+            fp.seek(offset)
+            data = fp.read(length)
+            if gzip_index is None:
+                save_seek_points(file_path, entry, fp)
+        return data
+
+    # Other codecs seek by decompressing from the start.
+    with report_io.open_binary(file_path) as fp:
+        fp.seek(offset)
+        return fp.read(length)
+
+
+def read_path(file_path, number, entry=None):
+    """
+        Function returning the text of one timing path.
+
+        input: file_path: path of the report file.
+        input: number: path number, starting at 1, in report order.
+        input: entry: index entry from get_index(), or None to load it.
+        output: text of the path.
+    """
+    if entry is None:
+        entry = get_index(file_path)
+    paths = entry["paths"]
+    if number < 1 or number > len(paths):
+        raise IndexError("Report {0} has {1} paths.".format(file_path, len(paths)))
+    offset = int(paths.column('offset')[number - 1])
+    length = int(paths.column('length')[number - 1])
+    return read_range(file_path, entry, offset, length).decode('utf-8', 'replace')
+
+
+def main(argv):
+    """
+        Command line entry point for path queries.
+
+        input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Query the timing paths of a full_clock report.")
+    parser.add_argument("report", help="full_clock report, plain or compressed")
+    parser.add_argument("--path", type=int, nargs="+", default=None,
+                        help="print these paths, numbered from 1 in report order")
+    parser.add_argument("--startpoint", default=None, help="print the paths from this startpoint")
+    parser.add_argument("--endpoint", default=None, help="print the paths to this endpoint")
+    parser.add_argument("--group", default=None, help="print the paths of this path group")
+    args = parser.parse_args(argv)
+
+    file_path = report_io.find_report(args.report)
+    if file_path is None:
+        print("File path {0} not found.".format(args.report))
+        return 1
+    entry = get_index(file_path)
+    paths = entry["paths"]
+
+    if args.path:
+        numbers = args.path
+    elif args.startpoint or args.endpoint or args.group:
+        numbers = find_paths(paths, args.startpoint, args.endpoint, args.group)
+    else:
+        print("{0:<8}{1:<12}{2:<20}{3:<40}{4}".format("path", "slack", "group", "startpoint", "endpoint"))
+        for number, row in enumerate(paths.text_rows(), 1):
+            print("{0:<8}{1:<12}{2:<20}{3:<40}{4}".format(number, row[3], row[2], row[0], row[1]))
+        return 0
+
+    if entry["codec"] == "gzip" and indexed_gzip is None:
+        print("Reading paths of gzip reports needs indexed_gzip (pip install indexed_gzip).")
+        return 1
+    for number in numbers:
+        print("Path {0}:".format(number))
+        print(read_path(file_path, number, entry))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
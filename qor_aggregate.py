@@ -0,0 +1,329 @@
+"""
+    Description:
+        Cross-run aggregation of a regression sweep. The runs of one
+        design are split in shards parsed by worker processes. Each
+        worker reduces the tables of its runs to a few numbers per
+        run and stage (WNS and TNS), so only these partial aggregates
+        are sent back and merged; the parsed tables of a run never
+        reach the parent process.
+
+        Stage numbers of a run:
+            wns: worst WNS of all scenarios and path groups, or the
+                worst path slack of a full_clock report.
+            tns: TNS of the worst scenario, summed over its path
+                groups (or its "all" group when the report has one).
+        The modes of a Cadence summary report are reduced apart:
+        wns and tns are those of its Setup table, hold_wns and
+        hold_tns those of its Hold table.
+
+        The best, median and worst value of every stage number over
+        the runs are printed, with the runs holding the best and
+        worst values.
+
+        Usage:
+            python qor_aggregate.py --tool synopsys --design blk \\
+                --run-dir sweep/run_* --jobs 32 --csv blk_sweep.csv
+"""
+import argparse
+import contextlib
+import csv
+import math
+import os
+import statistics
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import parse_cache
+import report_parser as rp
+
+SHARDS_PER_JOB = 4      # Shards given to each worker, to balance the load.
+ALL_GROUP = "all"       # Path group holding the total of a scenario.
+SETUP_MODE = "setup"    # Summary mode whose numbers are named wns and tns.
+STAT_COLUMNS = ["flow", "stage", "kind", "metric", "runs", "best", "best_run",
+                "median", "worst", "worst_run"]
+
+
+def stage_numbers(table):
+    """
+        Function reducing one table to its stage numbers.
+
+        input: table: StageTable of kind 'qor', 'summary' or 'full_clock'.
+        output: dict of metric name to value, empty for other kinds
+            and tables without values.
+    """
+    numbers = {}
+    if table.kind == 'full_clock':
+        slacks = [slack for slack in table.column('slack') if not math.isnan(slack)]
+        if slacks:
+            numbers['wns'] = min(slacks)
+        return numbers
+    if table.kind == 'qor':
+        rows = zip(table.column('scenario'), table.column('path_group'),
+                   table.column('wns'), table.column('tns'))
+        return scenario_numbers(rows, "")
+    if table.kind != 'summary':
+        return numbers
+
+    # Setup and Hold are not mixed: each mode gives its own numbers.
+    modes = {}
+    for mode, path_group, wns, tns in zip(table.column('mode'), table.column('path_group'),
+                                          table.column('wns'), table.column('tns')):
+        modes.setdefault(mode, []).append((mode, path_group, wns, tns))
+    for mode, rows in modes.items():
+        prefix = "" if mode.lower() == SETUP_MODE else mode.lower() + "_"
+        numbers.update(scenario_numbers(rows, prefix))
+    return numbers
+
+
+def scenario_numbers(rows, prefix):
+    """
+        Function reducing the rows of a table to its worst WNS and
+        the TNS of its worst scenario.
+
+        input: rows: iterable of (scenario, path group, wns, tns).
+        input: prefix: prefix of the metric names.
+        output: dict of metric name to value.
+    """
+    numbers = {}
+    wns_values = []
+    # TNS of each scenario, from its "all" group when there is one.
+    totals = {}
+    all_totals = {}
+    for scenario, path_group, wns, tns in rows:
+        if not math.isnan(wns):
+            wns_values.append(wns)
+        if math.isnan(tns):
+            continue
+        if path_group.strip("'") == ALL_GROUP:
+            all_totals[scenario] = tns
+        else:
+            totals[scenario] = totals.get(scenario, 0.0) + tns
+    if wns_values:
+        numbers[prefix + 'wns'] = min(wns_values)
+    totals.update(all_totals)
+    if totals:
+        numbers[prefix + 'tns'] = min(totals.values())
+    return numbers
+
+
+def run_numbers(tables):
+    """
+        Function reducing the tables of one run.
+
+        input: tables: list of StageTable of the run.
+        output: dict of (flow, stage, kind, metric) to value.
+    """
+    numbers = {}
+    for table in tables:
+        for metric, value in stage_numbers(table).items():
+            numbers[(table.flow, table.stage, table.kind, metric)] = value
+    return numbers
+
+
+def new_partial():
+    """
+        Function returning an empty partial aggregate.
+
+        output: dict with the "runs" names, the "values" (dict of
+            stage number key to array('d') with one value per run,
+            NaN when a run has none), the "failed" runs as (run,
+            error) and the "bytes" read.
+    """
+    return {"runs": [], "values": {}, "failed": [], "bytes": 0}
+
+
+def add_run(partial, run_name, numbers):
+    """
+        Function adding the stage numbers of one run to a partial
+        aggregate.
+
+        input: partial: dict from new_partial().
+        input: run_name: name of the run.
+        input: numbers: dict from run_numbers().
+    """
+    num_runs = len(partial["runs"])
+    for key in numbers:
+        if key not in partial["values"]:
+            partial["values"][key] = array('d', [float("nan")]) * num_runs
+    for key, values in partial["values"].items():
+        values.append(numbers.get(key, float("nan")))
+    partial["runs"].append(run_name)
+
+
+def merge_partials(total, partial):
+    """
+        Function merging a partial aggregate into another.
+
+        input: total: dict from new_partial(), updated.
+        input: partial: dict from new_partial().
+    """
+    num_runs = len(total["runs"])
+    num_added = len(partial["runs"])
+    for key, values in partial["values"].items():
+        if key not in total["values"]:
+            total["values"][key] = array('d', [float("nan")]) * num_runs
+        total["values"][key].extend(values)
+    for key, values in total["values"].items():
+        if key not in partial["values"]:
+            values.extend(array('d', [float("nan")]) * num_added)
+    total["runs"].extend(partial["runs"])
+    total["failed"].extend(partial["failed"])
+    total["bytes"] += partial["bytes"]
+
+
+def aggregate_shard(tool_option, top_design, run_dirs, cache=None):
+    """
+        Function parsing the runs of one shard and reducing them.
+        Runs on a worker process; the messages of the parsers are
+        not printed.
+
+        input: tool_option: one of report_parser.ASIC_TOOLS.
+        input: top_design: design name.
+        input: run_dirs: list of run directories.
+        input: cache: parse cache options, see report_parser.get_folders().
+        output: dict from new_partial().
+    """
+    partial = new_partial()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for run_dir in run_dirs:
+            folders = rp.get_folders(run_dir, cache=cache)
+            try:
+                tables, bytes_read = rp.collect_tables(tool_option, top_design, folders)
+            except Exception as err:
+                partial["failed"].append((folders["run"], str(err)))
+                continue
+            if not tables:
+                partial["failed"].append((folders["run"], "no reports found"))
+                continue
+            add_run(partial, folders["run"], run_numbers(tables))
+            partial["bytes"] += bytes_read
+    return partial
+
+
+def shard_runs(run_dirs, jobs):
+    """
+        Function splitting the runs in shards.
+
+        input: run_dirs: list of run directories.
+        input: jobs: number of worker processes.
+        output: list of lists of run directories.
+    """
+    size = max(1, int(math.ceil(len(run_dirs) / float(jobs * SHARDS_PER_JOB))))
+    return [run_dirs[i:i + size] for i in range(0, len(run_dirs), size)]
+
+
+def aggregate_runs(tool_option, top_design, run_dirs, jobs=None, cache=None):
+    """
+        Function aggregating the stage numbers of many runs in a pool
+        of worker processes, printing the progress.
+
+        input: tool_option: one of report_parser.ASIC_TOOLS.
+        input: top_design: design name.
+        input: run_dirs: list of run directories.
+        input: jobs: number of worker processes. Defaults to the number
+            of cores of the machine.
+        input: cache: parse cache options, see report_parser.get_folders().
+        output: dict from new_partial() with every run.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(run_dirs)))
+    shards = shard_runs(run_dirs, jobs)
+
+    print("Aggregating {0} runs in {1} shards with {2} worker processes.".format(
+        len(run_dirs), len(shards), jobs))
+    start_time = time.time()
+    total = new_partial()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(aggregate_shard, tool_option, top_design, shard, cache)
+                   for shard in shards]
+        for future in as_completed(futures):
+            merge_partials(total, future.result())
+            elapsed = time.time() - start_time
+            rate = elapsed if elapsed > 0 else 1e-9
+            num_done = len(total["runs"]) + len(total["failed"])
+            print("{0}/{1} runs in {2:.1f} s ({3:.2f} runs/s, {4:.2f} MB/s), {5} failed.".format(
+                num_done, len(run_dirs), elapsed, num_done / rate, total["bytes"] / rate / 1e6,
+                len(total["failed"])))
+
+    for run_name, err in total["failed"]:
+        print("Failed to parse run {0}: {1}".format(run_name, err))
+    return total
+
+
+def stage_statistics(total):
+    """
+        Function computing the best, median and worst value of every
+        stage number. A higher WNS or TNS is better.
+
+        input: total: dict from aggregate_runs().
+        output: list of rows with the fields of STAT_COLUMNS, in the
+            order of the stage numbers.
+    """
+    rows = []
+    for key, values in total["values"].items():
+        runs = [(value, run) for value, run in zip(values, total["runs"]) if not math.isnan(value)]
+        if not runs:
+            continue
+        best = max(runs, key=lambda item: item[0])
+        worst = min(runs, key=lambda item: item[0])
+        median = statistics.median([value for value, _ in runs])
+        rows.append(list(key) + [len(runs), best[0], best[1], median, worst[0], worst[1]])
+    return rows
+
+
+def print_statistics(rows):
+    """
+        Function printing the rows from stage_statistics().
+
+        input: rows: list of rows with the fields of STAT_COLUMNS.
+    """
+    # The numeric fields are separated by a space, so wide values never merge.
+    print("{0:<6}{1:<14}{2:<12}{3:<10}{4:>6} {5:>11}  {6:<20} {7:>11} {8:>11}  {9:<20}".format(
+        "Flow", "Stage", "Report", "Value", "Runs", "Best", "Best run", "Median", "Worst",
+        "Worst run"))
+    for row in rows:
+        print("{0:<6}{1:<14}{2:<12}{3:<10}{4:>6} {5:>11.4f}  {6:<20} {7:>11.4f} {8:>11.4f}  {9:<20}".format(
+            *row))
+
+
+def main(argv):
+    """
+        Command line entry point aggregating a sweep of runs.
+
+        input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Best, median and worst QoR of many runs.")
+    parser.add_argument("--tool", required=True, choices=rp.ASIC_TOOLS,
+                        help="tool that generated the reports")
+    parser.add_argument("--design", required=True, help="design name")
+    parser.add_argument("--run-dir", nargs="+", required=True,
+                        help="run directories containing syn/ and apr/")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="worker processes (default: number of cores)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse parsed reports stored in this folder")
+    parser.add_argument("--csv", default=None, help="write the statistics to this file")
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.cache_dir:
+        cache = {"cache_dir": args.cache_dir, "verify_hash": False,
+                 "max_bytes": parse_cache.CACHE_MAX_BYTES}
+    total = aggregate_runs(args.tool, args.design, args.run_dir, args.jobs, cache)
+    rows = stage_statistics(total)
+    print_statistics(rows)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(STAT_COLUMNS)
+            writer.writerows(rows)
+        print("CSV file generated at path: " + args.csv)
+    return 1 if total["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,279 @@
+"""
+    Description:
+        Run-to-run QoR diff. The reports of two runs of a design are
+        parsed, or their metrics loaded from the historical QoR store,
+        and every metric is aligned by stage, scenario and clock or
+        path group. Deltas are computed on NumPy arrays and the worst
+        regressions of the WNS, TNS and skew metrics are ranked.
+
+        A regression is a lower value in the new run for the slack
+        metrics (wns, tns, worst_hold, total_hold, slack) and a higher
+        value for the others (violation counts, skew, latency, area).
+
+        Usage:
+            python qor_diff.py --tool synopsys --design blk runs/base runs/new
+            python qor_diff.py --tool synopsys --design blk --db qor.db \\
+                base_run new_run --top 50 --csv blk_diff.csv
+"""
+import argparse
+import csv
+import sys
+import time
+
+import numpy as np
+
+import parse_cache
+import qor_store
+import report_parser as rp
+from qor_records import MISSING_STR
+
+RANKED_METRICS = ["wns", "tns", "global_skew"]  # Metrics ranked by default.
+# Metrics where a lower value is worse. For the others a higher value is worse.
+LOWER_IS_WORSE = ["wns", "tns", "worst_hold", "total_hold", "slack"]
+TOP_REGRESSIONS = 20        # Regressions printed per metric.
+KEY_FIELDS = ["flow", "stage", "kind", "scenario", "path_group", "metric"]
+DIFF_COLUMNS = KEY_FIELDS + ["base", "new", "delta"]
+
+
+def parse_run(tool_option, top_design, run_dir, cache=None, threads=1):
+    """
+        Function parsing the reports of one run.
+
+        input: tool_option: one of report_parser.ASIC_TOOLS.
+        input: top_design: design name.
+        input: run_dir: run directory containing syn/ and apr/.
+        input: cache: parse cache options, see report_parser.get_folders().
+        input: threads: threads used to parse the stages.
+        output: list of metric rows, see qor_store.table_metrics().
+    """
+    folders = rp.get_folders(run_dir, cache=cache)
+    tables, _ = rp.collect_tables(tool_option, top_design, folders, threads)
+    rows = []
+    for table in tables:
+        rows.extend(qor_store.table_metrics(table))
+    return rows
+
+
+def load_run(conn, top_design, run):
+    """
+        Function loading the metric rows of a run of the QoR store.
+
+        input: conn: connection from qor_store.open_store().
+        input: top_design: design name.
+        input: run: run_id or run name.
+        output: list of metric rows, see qor_store.table_metrics().
+    """
+    run_id = qor_store.find_run(conn, top_design, run)
+    if run_id is None:
+        raise ValueError("Run {0} of design {1} not found in the database.".format(run, top_design))
+    return qor_store.run_metrics(conn, run_id)
+
+
+def align_runs(base_rows, new_rows):
+    """
+        Function aligning the metrics of two runs on their key. When
+        a key repeats in a run, its first value is kept.
+
+        input: base_rows: metric rows of the base run.
+        input: new_rows: metric rows of the new run.
+        output: dict with the "keys" (list of (flow, stage, kind,
+            scenario, path_group, metric)) and the "base" and "new"
+            float64 arrays, NaN where a run has no value.
+    """
+    index = {}
+    base = []
+    add_key = index.setdefault
+    for row in base_rows:
+        if add_key(row[:6], len(base)) == len(base):
+            base.append(row[6])
+
+    num_base = len(base)
+    new = [None] * num_base
+    for row in new_rows:
+        position = add_key(row[:6], len(new))
+        if position == len(new):
+            new.append(row[6])
+        elif position < num_base and new[position] is None:
+            new[position] = row[6]
+
+    # None, a missing value, becomes NaN.
+    base_values = np.full(len(new), np.nan)
+    base_values[:num_base] = np.array(base, dtype=np.float64)
+    return {"keys": list(index), "base": base_values, "new": np.array(new, dtype=np.float64)}
+
+
+def metric_deltas(aligned):
+    """
+        Function computing the delta of every aligned metric.
+
+        input: aligned: dict from align_runs().
+        output: aligned with the "metric" names (array of str), the
+            "delta" (new - base) and the "regression" (delta signed so
+            that a positive value is worse) arrays added.
+    """
+    metrics = np.array([key[5] for key in aligned["keys"]], dtype=str)
+    delta = aligned["new"] - aligned["base"]
+    regression = np.where(np.isin(metrics, LOWER_IS_WORSE), -delta, delta)
+    aligned["metric"] = metrics
+    aligned["delta"] = delta
+    aligned["regression"] = regression
+    return aligned
+
+
+def diff_runs(base_rows, new_rows):
+    """
+        Function comparing the metrics of two runs.
+
+        input: base_rows: metric rows of the base run.
+        input: new_rows: metric rows of the new run.
+        output: dict from metric_deltas().
+    """
+    return metric_deltas(align_runs(base_rows, new_rows))
+
+
+def ranked_regressions(diff, metric, top=TOP_REGRESSIONS):
+    """
+        Function returning the worst regressions of one metric.
+
+        input: diff: dict from diff_runs().
+        input: metric: metric name, e.g. "wns".
+        input: top: number of regressions returned, None for all.
+        output: array of positions in diff["keys"], worst first.
+    """
+    regression = diff["regression"]
+    selected = np.flatnonzero((diff["metric"] == metric) & (regression > 0))
+    order = selected[np.argsort(-regression[selected], kind="stable")]
+    return order if top is None else order[:top]
+
+
+def diff_counts(diff):
+    """
+        Function counting the metrics that changed.
+
+        input: diff: dict from diff_runs().
+        output: dict with the number of "regressed", "improved" and
+            "unchanged" metrics, and of metrics found "only_base" or
+            "only_new".
+    """
+    base_missing = np.isnan(diff["base"])
+    new_missing = np.isnan(diff["new"])
+    regression = diff["regression"]
+    return {"regressed": int(np.count_nonzero(regression > 0)),
+            "improved": int(np.count_nonzero(regression < 0)),
+            "unchanged": int(np.count_nonzero(regression == 0)),
+            "only_base": int(np.count_nonzero(new_missing & ~base_missing)),
+            "only_new": int(np.count_nonzero(base_missing & ~new_missing))}
+
+
+def format_value(value, sign=""):
+    """
+        Function formatting a metric value for the report.
+
+        input: value: float, NaN when missing.
+        input: sign: "+" to always print the sign.
+    """
+    if value != value:
+        return MISSING_STR
+    return "{0:{1}.4f}".format(value, sign)
+
+
+def write_diff_csv(file_path, diff):
+    """
+        Function writing every aligned metric to a CSV file, the
+        worst regressions first.
+
+        input: file_path: path of the CSV file.
+        input: diff: dict from diff_runs().
+    """
+    # NaN regressions (metric missing in a run) go last.
+    order = np.argsort(-np.nan_to_num(diff["regression"], nan=-np.inf), kind="stable")
+    with open(file_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(DIFF_COLUMNS)
+        for i in order:
+            writer.writerow(list(diff["keys"][i]) + [format_value(diff["base"][i]),
+                                                     format_value(diff["new"][i]),
+                                                     format_value(diff["delta"][i], "+")])
+    print("CSV file generated at path: " + file_path)
+
+
+def print_regressions(diff, metric, top):
+    """
+        Function printing the ranked regressions of one metric.
+
+        input: diff: dict from diff_runs().
+        input: metric: metric name.
+        input: top: number of regressions printed.
+    """
+    order = ranked_regressions(diff, metric, top)
+    print("Worst {0} regressions ({1} found):".format(
+        metric, np.count_nonzero((diff["metric"] == metric) & (diff["regression"] > 0))))
+    if not len(order):
+        return
+    print("    {0:<12}{1:<28}{2:<36}{3:>12}{4:>12}{5:>12}".format(
+        "Stage", "Scenario", "Group", "Base", "New", "Delta"))
+    for i in order:
+        flow, stage, kind, scenario, path_group, _ = diff["keys"][i]
+        print("    {0:<12}{1:<28}{2:<36}{3:>12}{4:>12}{5:>12}".format(
+            stage, scenario, path_group, format_value(diff["base"][i]),
+            format_value(diff["new"][i]), format_value(diff["delta"][i], "+")))
+
+
+def main(argv):
+    """
+        Command line entry point comparing two runs of a design.
+
+        input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Compare the QoR of two runs of a design.")
+    parser.add_argument("base", help="base run directory, or run name/id with --db")
+    parser.add_argument("new", help="new run directory, or run name/id with --db")
+    parser.add_argument("--tool", choices=rp.ASIC_TOOLS, default=rp.ASIC_TOOLS[0],
+                        help="tool that generated the reports")
+    parser.add_argument("--design", required=True, help="design name")
+    parser.add_argument("--db", default=None,
+                        help="load both runs from this QoR database instead of parsing")
+    parser.add_argument("--metric", nargs="+", default=RANKED_METRICS,
+                        help="metrics whose regressions are ranked")
+    parser.add_argument("--top", type=int, default=TOP_REGRESSIONS,
+                        help="regressions printed per metric")
+    parser.add_argument("--csv", default=None, help="write every aligned metric to this file")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse parsed reports stored in this folder")
+    parser.add_argument("--stage-threads", type=int, default=1,
+                        help="threads reading and parsing the stages of a run")
+    args = parser.parse_args(argv)
+
+    start_time = time.time()
+    if args.db:
+        conn = qor_store.open_store(args.db)
+        try:
+            base_rows = load_run(conn, args.design, args.base)
+            new_rows = load_run(conn, args.design, args.new)
+        finally:
+            conn.close()
+    else:
+        cache = None
+        if args.cache_dir:
+            cache = {"cache_dir": args.cache_dir, "verify_hash": False,
+                     "max_bytes": parse_cache.CACHE_MAX_BYTES}
+        base_rows = parse_run(args.tool, args.design, args.base, cache, args.stage_threads)
+        new_rows = parse_run(args.tool, args.design, args.new, cache, args.stage_threads)
+    load_time = time.time() - start_time
+
+    diff = diff_runs(base_rows, new_rows)
+    counts = diff_counts(diff)
+    print("Compared {0} metrics in {1:.2f} s ({2:.2f} s loading the runs).".format(
+        len(diff["keys"]), time.time() - start_time, load_time))
+    print("{regressed} regressed, {improved} improved, {unchanged} unchanged, "
+          "{only_base} only in base, {only_new} only in new.".format(**counts))
+    for metric in args.metric:
+        print_regressions(diff, metric, args.top)
+
+    if args.csv:
+        write_diff_csv(args.csv, diff)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,205 @@
+"""
+    Description:
+        Columnar export of the parsed tables. The CSV and text
+        outputs mix section headers and label rows with the data;
+        the files written here hold one typed column per field, so
+        downstream tools load them without parsing.
+
+        Every file holds one kind of table ("qor", "clock_qor",
+        "summary" or "full_clock") and its columns are, in order:
+        design, run, flow, stage and row (position of the record in
+        its stage, i.e. the slack rank for "full_clock"), followed by
+        the fields of qor_records.TABLE_FIELDS for the kind. Text
+        columns are strings, number columns are float64 with NaN for
+        missing values. The schema version is stored with the data.
+
+        Formats:
+            arrow:   Arrow IPC file, read with memory mapping (pyarrow).
+            parquet: Parquet file (pyarrow).
+            npz:     uncompressed NumPy archive (numpy).
+"""
+import os
+from array import array
+
+import lazy_import
+from qor_records import TABLE_FIELDS, TEXT
+
+# Imported when an export is written, None when not installed.
+np = lazy_import.optional_module("numpy")
+pa = lazy_import.optional_module("pyarrow")
+pq = lazy_import.optional_module("pyarrow.parquet")
+
+SCHEMA_VERSION = 2      # Increment when the columns of a kind change.
+KEY_FIELDS = [('design', TEXT), ('run', TEXT), ('flow', TEXT), ('stage', TEXT), ('row', 'int')]
+EXPORT_FORMATS = ["arrow", "parquet", "npz"]    # Formats in order of preference.
+FILE_EXTENSIONS = {"arrow": ".arrow", "parquet": ".parquet", "npz": ".npz"}
+
+
+def available_formats():
+    """
+        Function listing the export formats whose libraries are
+        installed.
+
+        output: list of format names, in order of preference.
+    """
+    formats = []
+    if pa is not None:
+        formats.extend(["arrow", "parquet"])
+    if np is not None:
+        formats.append("npz")
+    return formats
+
+
+def schema(kind):
+    """
+        Function returning the columns of an export file.
+
+        input: kind: key of qor_records.TABLE_FIELDS.
+        output: list of (name, type).
+    """
+    return KEY_FIELDS + TABLE_FIELDS[kind]
+
+
+def table_columns(tables, design, run=""):
+    """
+        Function concatenating tables of one kind column by column.
+
+        input: tables: list of StageTable of the same kind.
+        input: design: design name.
+        input: run: run name.
+        output: (kind, dict of column per name). Text columns are
+            lists, the row column a list of ints and number columns
+            array('d').
+    """
+    kind = tables[0].kind
+    columns = {}
+    for name, field_type in schema(kind):
+        columns[name] = array('d') if field_type not in (TEXT, 'int') else []
+
+    for table in tables:
+        if table.kind != kind:
+            raise ValueError("Cannot export {0} and {1} tables to one file.".format(kind, table.kind))
+        num_rows = len(table)
+        columns['design'].extend([design] * num_rows)
+        columns['run'].extend([run] * num_rows)
+        columns['flow'].extend([table.flow] * num_rows)
+        columns['stage'].extend([table.stage] * num_rows)
+        columns['row'].extend(range(num_rows))
+        for name, column in zip(table.names, table.columns):
+            columns[name].extend(column)
+
+    return kind, columns
+
+
+def write_arrow(file_path, kind, columns, fmt):
+    """
+        Function writing the columns to an Arrow IPC or Parquet file.
+
+        input: file_path: path of the file.
+        input: kind: kind of the tables.
+        input: columns: dict from table_columns().
+        input: fmt: "arrow" or "parquet".
+    """
+    arrays = []
+    names = []
+    for name, field_type in schema(kind):
+        if field_type == TEXT:
+            arrays.append(pa.array(columns[name], type=pa.string()).dictionary_encode())
+        elif field_type == 'int':
+            arrays.append(pa.array(columns[name], type=pa.int32()))
+        else:
+            arrays.append(pa.array(np.frombuffer(columns[name], dtype=np.float64)
+                                   if np is not None else list(columns[name]), type=pa.float64()))
+        names.append(name)
+    metadata = {"kind": kind, "schema_version": str(SCHEMA_VERSION)}
+    table = pa.Table.from_arrays(arrays, names=names).replace_schema_metadata(metadata)
+
+    if fmt == "parquet":
+        pq.write_table(table, file_path)
+    else:
+        with pa.OSFile(file_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+def write_npz(file_path, kind, columns):
+    """
+        Function writing the columns to an uncompressed NumPy archive.
+
+        input: file_path: path of the file.
+        input: kind: kind of the tables.
+        input: columns: dict from table_columns().
+    """
+    arrays = {}
+    for name, field_type in schema(kind):
+        if field_type == TEXT:
+            arrays[name] = np.array(columns[name], dtype=str)
+        elif field_type == 'int':
+            arrays[name] = np.array(columns[name], dtype=np.int32)
+        else:
+            arrays[name] = np.frombuffer(columns[name], dtype=np.float64)
+    arrays["__kind__"] = np.array(kind)
+    arrays["__schema_version__"] = np.array(SCHEMA_VERSION)
+    with open(file_path, 'wb') as fp:
+        np.savez(fp, **arrays)
+
+
+def write_tables(file_stem, tables, design, run="", fmt=None):
+    """
+        Function writing tables of one kind to a columnar file. The
+        file is written next to its final path and renamed, so a
+        reader never loads a partial file.
+
+        input: file_stem: path of the file without extension.
+        input: tables: list of StageTable of the same kind.
+        input: design: design name.
+        input: run: run name.
+        input: fmt: one of EXPORT_FORMATS, or None for the first
+            available one.
+        output: path of the written file, None if there was no data.
+    """
+    formats = available_formats()
+    if fmt is None:
+        if not formats:
+            raise ImportError("Columnar export needs pyarrow or numpy.")
+        fmt = formats[0]
+    if fmt not in formats:
+        raise ImportError("Export format {0} needs {1}.".format(
+            fmt, "numpy" if fmt == "npz" else "pyarrow"))
+
+    tables = [table for table in tables if table is not None]
+    if not tables:
+        return None
+    kind, columns = table_columns(tables, design, run)
+
+    file_path = file_stem + FILE_EXTENSIONS[fmt]
+    tmp_path = file_path + ".tmp"
+    try:
+        if fmt == "npz":
+            write_npz(tmp_path, kind, columns)
+        else:
+            write_arrow(tmp_path, kind, columns, fmt)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    print("{0} file generated at path: {1}".format(fmt, file_path))
+    return file_path
+
+
+def load_columns(file_path):
+    """
+        Function loading an export file. Arrow IPC files are memory
+        mapped, Parquet files are read through a memory map and NumPy
+        archives load each column when it is accessed.
+
+        input: file_path: path of a file from write_tables().
+        output: pyarrow.Table for arrow and parquet files, NpzFile
+            for npz files.
+    """
+    if file_path.endswith(FILE_EXTENSIONS["npz"]):
+        return np.load(file_path)
+    if file_path.endswith(FILE_EXTENSIONS["parquet"]):
+        return pq.read_table(file_path, memory_map=True)
+    return pa.ipc.open_file(pa.memory_map(file_path, 'r')).read_all()
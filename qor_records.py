@@ -0,0 +1,189 @@
+"""
+    Description:
+        Compact in-memory model of the parsed reports. Every parser
+        returns a StageTable holding the records of one report: one
+        column per field, numbers in array('d') columns and text in
+        lists of interned strings. A missing or "N/A" number is
+        stored as NaN.
+
+        The writers of synopsys_parser and cadence_parser take lists
+        of StageTable, so no nested lists of strings are passed
+        around and numbers are only turned back into text on output.
+        The decimal places of each number are kept in array('b')
+        columns, so a number is written as it is in the report:
+        "0.00" stays "0.00" and "-0.010" stays "-0.010".
+"""
+import itertools
+import math
+import sys
+from array import array
+
+# Field types of a table.
+TEXT = "text"       # Kept as an interned string.
+FLOAT = "float"     # Kept as a float.
+COUNT = "count"     # Kept as a float, written as an integer.
+
+# Fields of each kind of table, in column order.
+QOR_FIELDS = [('scenario', TEXT), ('path_group', TEXT),
+              ('wns', FLOAT), ('tns', FLOAT), ('num_vio_paths', COUNT),
+              ('worst_hold', FLOAT), ('total_hold', FLOAT), ('num_hold_vio', COUNT)]
+
+# The corner and scenario lines of the report are kept to be written back.
+CLOCK_QOR_FIELDS = [('corner', TEXT), ('mode', TEXT), ('scenario', TEXT),
+                    ('corner_line', TEXT), ('scenario_line', TEXT),
+                    ('clock', TEXT), ('attrs', TEXT),
+                    ('sinks', COUNT), ('levels', COUNT),
+                    ('repeater_count', COUNT), ('repeater_area', FLOAT),
+                    ('stdcell_area', FLOAT), ('max_latency', FLOAT),
+                    ('global_skew', FLOAT), ('trans_drc', COUNT), ('cap_drc', COUNT)]
+
+SUMMARY_FIELDS = [('mode', TEXT), ('path_group', TEXT),
+                  ('wns', FLOAT), ('tns', FLOAT), ('num_vio_paths', COUNT)]
+
+SLACK_FIELDS = [('slack', FLOAT)]
+
+# Timing paths of a full_clock report and their place in it.
+TIMING_PATH_FIELDS = [('startpoint', TEXT), ('endpoint', TEXT), ('path_group', TEXT),
+                      ('slack', FLOAT), ('offset', COUNT), ('length', COUNT)]
+
+TABLE_FIELDS = {'qor': QOR_FIELDS,
+                'clock_qor': CLOCK_QOR_FIELDS,
+                'summary': SUMMARY_FIELDS,
+                'full_clock': SLACK_FIELDS,
+                'timing_path': TIMING_PATH_FIELDS}
+
+MISSING_STR = "N/A"     # Text written for a missing number.
+NO_DECIMALS = -1        # Decimal places of a number written with repr().
+MAX_DECIMALS = 30       # Numbers with more decimal places are written with repr().
+
+
+def to_number(value):
+    """
+        Function converting a report token to a float. Tokens that
+        are not numbers (missing, "N/A", "-") give NaN.
+
+        input: value: string, number or None.
+    """
+    if value is None:
+        return float("nan")
+    try:
+        return float(value)
+    except ValueError:
+        return float("nan")
+
+
+def number_decimals(value):
+    """
+        Function returning the decimal places of a report token, so
+        the number can be written back as it was read.
+
+        input: value: string, number or None.
+        output: number of digits after the point, NO_DECIMALS for
+            numbers that are not fixed-point text.
+    """
+    if not isinstance(value, str):
+        return NO_DECIMALS
+    token = value.strip()
+    if 'e' in token or 'E' in token or math.isnan(to_number(token)):
+        return NO_DECIMALS
+    point = token.find('.')
+    places = len(token) - point - 1 if point != -1 else 0
+    return places if places <= MAX_DECIMALS else NO_DECIMALS
+
+
+def format_value(value, field_type, decimals=NO_DECIMALS):
+    """
+        Function converting a stored value back to text for output.
+
+        input: value: value of a column.
+        input: field_type: TEXT, FLOAT or COUNT.
+        input: decimals: decimal places of a FLOAT, from number_decimals().
+    """
+    if field_type == TEXT:
+        return value
+    if math.isnan(value):
+        return MISSING_STR
+    if field_type == COUNT:
+        return str(int(value))
+    if decimals == NO_DECIMALS:
+        return repr(value)
+    return "{0:.{1}f}".format(value, decimals)
+
+
+class StageTable(object):
+    """
+        Records of one report (one kind of table for one stage),
+        stored column by column. FLOAT columns have a decimals
+        column with the decimal places of each value; code filling
+        the columns directly fills it too.
+    """
+    __slots__ = ('flow', 'stage', 'kind', 'names', 'types', 'columns', 'decimals')
+
+    def __init__(self, flow, stage, kind):
+        """
+            input: flow: flow of the report ("syn" or "apr").
+            input: stage: stage of the flow.
+            input: kind: key of TABLE_FIELDS.
+        """
+        self.flow = flow
+        self.stage = stage
+        self.kind = kind
+        fields = TABLE_FIELDS[kind]
+        self.names = tuple(name for name, field_type in fields)
+        self.types = tuple(field_type for name, field_type in fields)
+        self.columns = tuple([] if field_type == TEXT else array('d')
+                             for field_type in self.types)
+        self.decimals = tuple(array('b') if field_type == FLOAT else None
+                              for field_type in self.types)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def append(self, values):
+        """
+            Function adding one record. Text is interned and
+            numbers are converted with to_number().
+
+            input: values: sequence with one value per field.
+        """
+        for column, decimals, field_type, value in zip(self.columns, self.decimals,
+                                                      self.types, values):
+            if field_type == TEXT:
+                column.append(sys.intern(str(value)))
+            else:
+                column.append(to_number(value))
+                if decimals is not None:
+                    decimals.append(number_decimals(value))
+
+    def column(self, name):
+        """
+            Function returning the column of a field.
+
+            input: name: field name.
+        """
+        return self.columns[self.names.index(name)]
+
+    def rows(self):
+        """
+            Generator of the records as tuples of stored values.
+        """
+        return zip(*self.columns)
+
+    def text_rows(self):
+        """
+            Generator of the records as lists of output strings.
+        """
+        places = [decimals if decimals is not None else itertools.repeat(NO_DECIMALS)
+                  for decimals in self.decimals]
+        for row, row_places in zip(self.rows(), zip(*places)):
+            yield [format_value(value, field_type, decimals)
+                   for value, field_type, decimals in zip(row, self.types, row_places)]
+
+    def __getstate__(self):
+        return (self.flow, self.stage, self.kind, self.columns, self.decimals)
+
+    def __setstate__(self, state):
+        flow, stage, kind, columns, decimals = state
+        self.__init__(flow, stage, kind)
+        self.columns = columns
+        self.decimals = decimals
@@ -0,0 +1,417 @@
+"""
+    Description:
+        Resident QoR service. Parsed reports are kept in memory,
+        keyed by report file, and are parsed again only when the
+        modification time or size of the report changes, so a query
+        costs a stat() per report instead of a new interpreter and a
+        full parse. The reports are parsed with the functions of
+        report_parser, synopsys_parser and cadence_parser.
+
+        Queries are JSON objects, answered with a JSON object, over
+        localhost HTTP (POST the query, or GET with the fields as URL
+        parameters) or a Unix socket (one query per line):
+
+            {"op": "summary", "run_dir": "runs/run_01", "design": "blk",
+             "stage": "postcts"}
+                WNS and TNS of each report, the Hold numbers of a
+                summary report apart, see qor_aggregate.stage_numbers().
+            {"op": "metrics", "run_dir": ..., "design": ..., "stage": ...,
+             "kind": "qor", "metric": "wns", "scenario": ..., "path_group": ...}
+                Metric rows, see qor_store.table_metrics(). Every field
+                but design is optional.
+            {"op": "reports", "run_dir": ..., "design": ...}
+                Reports found for the design.
+            {"op": "stats"}
+                Cache entries, hits, misses and parse time.
+
+        Usage:
+            python qor_server.py serve --port 8765
+            python qor_server.py serve --socket /tmp/qor.sock
+            python qor_server.py query --port 8765 '{"op": "summary", "design": "blk"}'
+            curl 'http://127.0.0.1:8765/?op=summary&design=blk&stage=postcts'
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from urllib.request import Request, urlopen
+
+import qor_aggregate
+import qor_store
+import report_discovery
+import report_parser as rp
+
+DEFAULT_HOST = "127.0.0.1"      # The service only listens on this machine.
+DEFAULT_PORT = 8765
+MAX_TABLES = 2000               # Parsed reports kept in memory.
+QUERY_OPS = ["summary", "metrics", "reports", "stats", "ping"]
+METRIC_FIELDS = ["flow", "stage", "kind", "scenario", "path_group", "metric", "value"]
+# Fields of a query matched against the metric rows.
+FILTER_FIELDS = ["flow", "stage", "kind", "scenario", "path_group", "metric"]
+
+
+def new_cache(max_tables=MAX_TABLES):
+    """
+        Function returning an empty table cache.
+
+        input: max_tables: parsed reports kept, the least recently
+            used are dropped.
+        output: dict with the "tables" (OrderedDict of report path to
+            (signature, table)), the lock, the counters and the limit.
+    """
+    return {"tables": OrderedDict(), "lock": threading.Lock(), "parse_locks": {},
+            "max_tables": max_tables, "hits": 0, "misses": 0, "parse_s": 0.0,
+            "queries": 0, "started": time.time()}
+
+
+def report_signature(file_path):
+    """
+        Function returning what revalidates a cached report.
+
+        input: file_path: path of the report.
+        output: (mtime in ns, size), None when the report is gone.
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def parse_report(key, entry, folders):
+    """
+        Function parsing one report found by report_discovery.
+
+        input: key: (flow, kind, design, stage).
+        input: entry: dict with the "path" and "extension" of the report.
+        input: folders: dict from report_parser.get_folders().
+        output: StageTable, None if the report has no data.
+    """
+    flow, kind, design, stage = key
+    file_path = entry["path"][:len(entry["path"]) - len(entry["extension"])]
+    if kind == "summary":
+        return rp.read_summary(file_path, stage)
+    if kind == "full_clock":
+        return rp.read_full_clock(file_path, stage)
+    to_open = os.path.basename(file_path)
+    if kind == "clock_qor":
+        return rp.read_apr_clock_qor(to_open, stage, folders)
+    if flow == "syn":
+        return rp.read_syn_qor(to_open, stage, folders)
+    return rp.read_apr_qor(to_open, stage, folders)
+
+
+def cached_table(cache, key, entry, folders):
+    """
+        Function returning the parsed table of a report, parsing it
+        when it is not cached or changed since it was parsed.
+
+        input: cache: dict from new_cache().
+        input: key: (flow, kind, design, stage).
+        input: entry: dict from report_discovery.discover_reports().
+        input: folders: dict from report_parser.get_folders().
+        output: StageTable, or None.
+    """
+    file_path = entry["path"]
+    with cache["lock"]:
+        lock = cache["parse_locks"].setdefault(file_path, threading.Lock())
+
+    # One thread parses a report; the others wait for its table.
+    with lock:
+        signature = report_signature(file_path)
+        with cache["lock"]:
+            cached = cache["tables"].get(file_path)
+            if cached is not None and cached[0] == signature:
+                cache["tables"].move_to_end(file_path)
+                cache["hits"] += 1
+                return cached[1]
+
+        start_time = time.perf_counter()
+        table = parse_report(key, entry, folders)
+        with cache["lock"]:
+            cache["parse_s"] += time.perf_counter() - start_time
+            cache["misses"] += 1
+            cache["tables"][file_path] = (signature, table)
+            cache["tables"].move_to_end(file_path)
+            while len(cache["tables"]) > cache["max_tables"]:
+                cache["tables"].popitem(last=False)
+        return table
+
+
+def query_reports(request):
+    """
+        Function finding the reports a query is about.
+
+        input: request: query dict with the "design" and optional
+            "run_dir", "flow", "kind" and "stage".
+        output: (folders, list of ((flow, kind, design, stage), entry)).
+    """
+    if not request.get("design"):
+        raise ValueError("The query has no design.")
+    folders = rp.get_folders(request.get("run_dir"))
+    reports = report_discovery.discover_reports(folders["syn"], folders["apr"])
+    selected = []
+    for key, entry in sorted(reports.items()):
+        flow, kind, design, stage = key
+        if design != request["design"]:
+            continue
+        if any(request.get(name) not in (None, value)
+               for name, value in (("flow", flow), ("kind", kind), ("stage", stage))):
+            continue
+        selected.append((key, entry))
+    return folders, selected
+
+
+def query_tables(cache, request):
+    """
+        Function returning the parsed tables a query is about.
+
+        input: cache: dict from new_cache().
+        input: request: query dict, see query_reports().
+        output: list of StageTable.
+    """
+    folders, selected = query_reports(request)
+    tables = []
+    for key, entry in selected:
+        table = cached_table(cache, key, entry, folders)
+        if table is not None:
+            tables.append(table)
+    return tables
+
+
+def metric_rows(tables, request):
+    """
+        Function listing the metric rows of tables matching a query.
+
+        input: tables: list of StageTable.
+        input: request: query dict, with optional FILTER_FIELDS.
+        output: list of dicts with the METRIC_FIELDS.
+    """
+    filters = [(i, request[name]) for i, name in enumerate(FILTER_FIELDS)
+               if request.get(name) is not None]
+    rows = []
+    for table in tables:
+        for row in qor_store.table_metrics(table):
+            if all(row[i] == value for i, value in filters):
+                rows.append(dict(zip(METRIC_FIELDS, row)))
+    return rows
+
+
+def handle_query(cache, request):
+    """
+        Function answering one query.
+
+        input: cache: dict from new_cache().
+        input: request: query dict, see the module description.
+        output: response dict with "ok" and the results, or "error".
+    """
+    start_time = time.perf_counter()
+    with cache["lock"]:
+        cache["queries"] += 1
+    op = request.get("op", "summary")
+    try:
+        if op == "ping":
+            response = {"ok": True}
+        elif op == "stats":
+            with cache["lock"]:
+                response = {"ok": True, "tables": len(cache["tables"]), "hits": cache["hits"],
+                            "misses": cache["misses"], "parse_s": cache["parse_s"],
+                            "queries": cache["queries"],
+                            "uptime_s": time.time() - cache["started"]}
+        elif op == "reports":
+            _, selected = query_reports(request)
+            response = {"ok": True, "reports": [dict(zip(["flow", "kind", "design", "stage"], key),
+                                                     path=entry["path"])
+                                                for key, entry in selected]}
+        elif op == "metrics":
+            response = {"ok": True, "rows": metric_rows(query_tables(cache, request), request)}
+        elif op == "summary":
+            response = {"ok": True, "stages": [
+                dict(flow=table.flow, stage=table.stage, kind=table.kind,
+                     **qor_aggregate.stage_numbers(table))
+                for table in query_tables(cache, request)]}
+        else:
+            response = {"ok": False, "error": "Unknown op {0}. Options are: {1}".format(
+                op, ", ".join(QUERY_OPS))}
+    except Exception as err:
+        response = {"ok": False, "error": str(err)}
+    response["elapsed_ms"] = (time.perf_counter() - start_time) * 1000.0
+    return response
+
+
+def encode_response(response):
+    """
+        Function encoding a response as one line of JSON.
+    """
+    return (json.dumps(response, default=str) + "\n").encode("utf-8")
+
+
+def http_handler(cache):
+    """
+        Function returning the HTTP request handler class of a cache.
+
+        input: cache: dict from new_cache().
+    """
+    class QueryHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            self.answer(dict(parse_qsl(urlsplit(self.path).query)))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+            except ValueError as err:
+                request = {"op": "invalid: {0}".format(err)}
+            self.answer(request)
+
+        def answer(self, request):
+            body = encode_response(handle_query(cache, request))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return QueryHandler
+
+
+def socket_handler(cache):
+    """
+        Function returning the Unix socket request handler class of
+        a cache. Each line received is one query.
+
+        input: cache: dict from new_cache().
+    """
+    class QueryHandler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line.decode("utf-8"))
+                except ValueError as err:
+                    request = {"op": "invalid: {0}".format(err)}
+                self.wfile.write(encode_response(handle_query(cache, request)))
+                self.wfile.flush()
+
+    return QueryHandler
+
+
+def create_server(cache, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+        Function creating the server of the service.
+
+        input: cache: dict from new_cache().
+        input: socket_path: path of the Unix socket, None for HTTP.
+        input: host: address the HTTP server listens on.
+        input: port: port of the HTTP server.
+        output: socketserver server, not started.
+    """
+    if socket_path is None:
+        return ThreadingHTTPServer((host, port), http_handler(cache))
+    if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+        raise ValueError("Unix sockets are not supported on this platform, use --port.")
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, socket_handler(cache))
+    server.daemon_threads = True
+    return server
+
+
+def query(request, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=60.0):
+    """
+        Function sending a query to a running service.
+
+        input: request: query dict.
+        input: socket_path: path of the Unix socket, None for HTTP.
+        input: host: address of the HTTP server.
+        input: port: port of the HTTP server.
+        input: timeout: seconds to wait for the answer.
+        output: response dict.
+    """
+    data = json.dumps(request).encode("utf-8")
+    if socket_path is None:
+        url = "http://{0}:{1}/".format(host, port)
+        with urlopen(Request(url, data=data, headers={"Content-Type": "application/json"}),
+                     timeout=timeout) as answer:
+            return json.loads(answer.read().decode("utf-8"))
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path)
+        client.sendall(data + b"\n")
+        with client.makefile('rb') as answer:
+            return json.loads(answer.readline().decode("utf-8"))
+    finally:
+        client.close()
+
+
+def stop_server(signum, frame):
+    """
+        Signal handler stopping the service like Ctrl-C.
+    """
+    raise KeyboardInterrupt
+
+
+def main(argv):
+    """
+        Command line entry point running the service or sending it
+        a query.
+
+        input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Resident QoR query service.")
+    parser.add_argument("command", choices=["serve", "query"])
+    parser.add_argument("request", nargs="?", default=None,
+                        help="query as a JSON object (query command)")
+    parser.add_argument("--socket", default=None, help="Unix socket of the service")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address of the HTTP service")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port of the HTTP service")
+    parser.add_argument("--max-tables", type=int, default=MAX_TABLES,
+                        help="parsed reports kept in memory")
+    args = parser.parse_intermixed_args(argv)
+
+    if args.command == "query":
+        if args.request is None:
+            parser.error("query needs a JSON request.")
+        response = query(json.loads(args.request), args.socket, args.host, args.port)
+        print(json.dumps(response, indent=2))
+        return 0 if response.get("ok") else 1
+
+    cache = new_cache(args.max_tables)
+    server = create_server(cache, args.socket, args.host, args.port)
+    print("Serving QoR queries on {0}.".format(
+        args.socket or "http://{0}:{1}/".format(args.host, args.port)))
+    sys.stdout.flush()
+    signal.signal(signal.SIGTERM, stop_server)
+    try:
+        with open(os.devnull, 'w') as devnull:
+            # The parsers print their progress; the service answers queries only.
+            sys.stdout = devnull
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = sys.__stdout__
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,330 @@
+"""
+    Description:
+        Historical QoR store. Parsed tables of every run are added
+        to a local SQLite database, one row per metric, so trends
+        across runs can be queried without parsing archived reports
+        again.
+
+        Each metric row carries the design, run id, tool, stage,
+        scenario (or view/mode/corner), clock or path group, metric
+        name and value. Rows of a run are inserted in batched
+        transactions and the metrics table is indexed for trend
+        queries on one design, path group, stage and metric. A run
+        is stored once per design and name: adding it again replaces
+        its metric rows.
+
+        Usage:
+            python qor_store.py --db qor.db trend --design blk \\
+                --stage route2 --group clk_core --metric wns --last 200
+            python qor_store.py --db qor.db runs --design blk
+"""
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import time
+
+from qor_records import TEXT
+
+INSERT_BATCH_SIZE = 10000   # Metric rows per executemany() call.
+BUSY_TIMEOUT = 60.0         # Seconds to wait for another writer.
+STORE_VERSION = 1           # Increment when the schema or the stored values change.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    design      TEXT NOT NULL,
+    run_name    TEXT NOT NULL,
+    tool        TEXT NOT NULL,
+    created     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id      INTEGER NOT NULL REFERENCES runs(run_id),
+    design      TEXT NOT NULL,
+    tool        TEXT NOT NULL,
+    flow        TEXT NOT NULL,
+    stage       TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    scenario    TEXT NOT NULL,
+    path_group  TEXT NOT NULL,
+    metric      TEXT NOT NULL,
+    value       REAL
+);
+CREATE INDEX IF NOT EXISTS metrics_trend
+    ON metrics (design, path_group, stage, metric, run_id);
+CREATE INDEX IF NOT EXISTS metrics_run
+    ON metrics (run_id);
+CREATE INDEX IF NOT EXISTS runs_design
+    ON runs (design, run_id);
+"""
+# Unique run names per design, created by upgrade_store() once the
+# duplicates of older stores are removed.
+RUNS_UNIQUE = """
+CREATE UNIQUE INDEX IF NOT EXISTS runs_name
+    ON runs (design, run_name)
+"""
+# Kinds of tables whose scenario and path group names are quoted in
+# the reports, e.g. 'clk_core'.
+QUOTED_KINDS = ['qor']
+
+# Columns of each kind of table giving the scenario and the
+# clock/path group of a metric row.
+KEY_COLUMNS = {'qor': ('scenario', 'path_group'),
+               'clock_qor': ('scenario', 'clock'),
+               'summary': ('mode', 'path_group'),
+               'full_clock': (None, None)}
+
+
+def open_store(db_path):
+    """
+        Function opening the database, creating the tables when
+        they don't exist.
+
+        input: db_path: path of the SQLite file.
+        output: sqlite3 connection.
+    """
+    folder = os.path.dirname(db_path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < STORE_VERSION:
+        upgrade_store(conn)
+    return conn
+
+
+def upgrade_store(conn):
+    """
+        Function upgrading a store written by an older version: only
+        the last run of each design and name is kept, the quotes of
+        the scenario and path group names are removed and run names
+        are made unique.
+
+        input: conn: sqlite3 connection.
+    """
+    last_runs = "SELECT MAX(run_id) FROM runs GROUP BY design, run_name"
+    kinds = ", ".join("'{0}'".format(kind) for kind in QUOTED_KINDS)
+    with conn:
+        conn.execute("DELETE FROM metrics WHERE run_id NOT IN ({0})".format(last_runs))
+        conn.execute("DELETE FROM runs WHERE run_id NOT IN ({0})".format(last_runs))
+        conn.execute("UPDATE metrics SET scenario = trim(scenario, ''''), "
+                     "path_group = trim(path_group, '''') WHERE kind IN ({0})".format(kinds))
+        conn.execute(RUNS_UNIQUE)
+        conn.execute("PRAGMA user_version = {0}".format(STORE_VERSION))
+
+
+def table_metrics(table):
+    """
+        Generator of the metric rows of one StageTable.
+
+        input: table: StageTable.
+        output: yields (flow, stage, kind, scenario, path_group,
+            metric, value). Missing numbers give a None value, and
+            scenario and path group names have no quotes.
+    """
+    scenario_name, group_name = KEY_COLUMNS[table.kind]
+    names = table.names
+    numeric = [i for i, field_type in enumerate(table.types) if field_type != TEXT]
+    scenario_index = names.index(scenario_name) if scenario_name else None
+    group_index = names.index(group_name) if group_name else None
+    quoted = table.kind in QUOTED_KINDS
+
+    for rank, row in enumerate(table.rows()):
+        scenario = row[scenario_index] if scenario_index is not None else ""
+        if table.kind == 'clock_qor':
+            scenario = row[names.index('corner')] + ":" + scenario
+        if group_index is not None:
+            path_group = row[group_index]
+        else:
+            path_group = "path_{0}".format(rank + 1)   # Slack rank of a full_clock path.
+        if quoted:
+            scenario = scenario.strip("'")
+            path_group = path_group.strip("'")
+        for i in numeric:
+            value = row[i]
+            if math.isnan(value):
+                value = None
+            yield (table.flow, table.stage, table.kind, scenario, path_group, names[i], value)
+
+
+def add_run(conn, design, tool, tables, run_name=None):
+    """
+        Function adding the tables of one run to the store. A run
+        already stored under the same design and name keeps its
+        run_id and has its metric rows replaced, in one transaction.
+
+        input: conn: connection from open_store().
+        input: design: design name.
+        input: tool: tool that generated the reports.
+        input: tables: list of StageTable of the run.
+        input: run_name: label of the run. Defaults to the time.
+        output: run_id of the run.
+    """
+    created = time.time()
+    if run_name is None:
+        run_name = time.strftime("%Y%m%d_%H%M%S", time.localtime(created))
+
+    with conn:
+        # The insert takes the write lock first, so two writers of the
+        # same run replace it one after the other.
+        conn.execute("INSERT OR IGNORE INTO runs (design, run_name, tool, created) "
+                     "VALUES (?, ?, ?, ?)", (design, run_name, tool, created))
+        run_id = conn.execute("SELECT run_id FROM runs WHERE design = ? AND run_name = ?",
+                              (design, run_name)).fetchone()[0]
+        conn.execute("UPDATE runs SET tool = ?, created = ? WHERE run_id = ?",
+                     (tool, created, run_id))
+        conn.execute("DELETE FROM metrics WHERE run_id = ?", (run_id,))
+        batch = []
+        for table in tables:
+            for metric in table_metrics(table):
+                batch.append((run_id, design, tool) + metric)
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    insert_metrics(conn, batch)
+                    batch = []
+        insert_metrics(conn, batch)
+
+    return run_id
+
+
+def insert_metrics(conn, batch):
+    """
+        Function inserting a batch of metric rows.
+
+        input: conn: connection from open_store().
+        input: batch: list of metric rows.
+    """
+    if batch:
+        conn.executemany("INSERT INTO metrics (run_id, design, tool, flow, stage, kind, "
+                         "scenario, path_group, metric, value) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+
+def store_run(db_path, design, tool, tables, run_name=None):
+    """
+        Function opening the store, adding one run and closing it.
+        Used by the batch mode, where each worker adds its runs.
+
+        input: db_path: path of the SQLite file.
+        input: design: design name.
+        input: tool: tool that generated the reports.
+        input: tables: list of StageTable of the run.
+        input: run_name: label of the run.
+        output: run_id of the run.
+    """
+    conn = open_store(db_path)
+    try:
+        return add_run(conn, design, tool, tables, run_name)
+    finally:
+        conn.close()
+
+
+def trend(conn, design, path_group, stage, metric, last=200, scenario=None):
+    """
+        Function returning the value of one metric over the last runs.
+
+        input: conn: connection from open_store().
+        input: design: design name.
+        input: path_group: clock or path group.
+        input: stage: stage of the flow.
+        input: metric: metric name, e.g. "wns".
+        input: last: number of runs returned.
+        input: scenario: only rows of this scenario, or None for all.
+        output: list of (run_id, run_name, scenario, value), oldest first.
+    """
+    query = ("SELECT m.run_id, r.run_name, m.scenario, m.value FROM metrics m "
+             "JOIN runs r ON r.run_id = m.run_id "
+             "WHERE m.design = ? AND m.path_group = ? AND m.stage = ? AND m.metric = ?")
+    params = [design, path_group, stage, metric]
+    if scenario is not None:
+        query += " AND m.scenario = ?"
+        params.append(scenario)
+    query += " AND m.run_id IN (SELECT run_id FROM runs WHERE design = ? " \
+             "ORDER BY run_id DESC LIMIT ?) ORDER BY m.run_id"
+    params.extend([design, last])
+    return conn.execute(query, params).fetchall()
+
+
+def list_runs(conn, design, last=200):
+    """
+        Function returning the last runs of a design.
+
+        input: conn: connection from open_store().
+        input: design: design name.
+        input: last: number of runs returned.
+        output: list of (run_id, run_name, tool, created), oldest first.
+    """
+    rows = conn.execute("SELECT run_id, run_name, tool, created FROM runs WHERE design = ? "
+                        "ORDER BY run_id DESC LIMIT ?", (design, last)).fetchall()
+    rows.reverse()
+    return rows
+
+
+def find_run(conn, design, run):
+    """
+        Function returning the run_id of a run, given its id or
+        name. A name matches before an id.
+
+        input: conn: connection from open_store().
+        input: design: design name.
+        input: run: run_id or run name.
+        output: run_id, None if there is no such run.
+    """
+    row = conn.execute("SELECT run_id FROM runs WHERE design = ? AND (run_name = ? OR run_id = ?) "
+                       "ORDER BY run_name = ? DESC, run_id DESC LIMIT 1",
+                       (design, str(run), run, str(run))).fetchone()
+    return row[0] if row is not None else None
+
+
+def run_metrics(conn, run_id):
+    """
+        Function returning the metric rows of one run.
+
+        input: conn: connection from open_store().
+        input: run_id: run_id of the run.
+        output: list of (flow, stage, kind, scenario, path_group,
+            metric, value), the rows of table_metrics().
+    """
+    return conn.execute("SELECT flow, stage, kind, scenario, path_group, metric, value "
+                        "FROM metrics WHERE run_id = ?", (run_id,)).fetchall()
+
+
+def main(argv):
+    """
+        Command line entry point for trend queries.
+
+        input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Query the historical QoR store.")
+    parser.add_argument("--db", required=True, help="path of the SQLite file")
+    commands = parser.add_subparsers(dest="command")
+    trend_parser = commands.add_parser("trend", help="one metric over the last runs")
+    trend_parser.add_argument("--design", required=True)
+    trend_parser.add_argument("--stage", required=True)
+    trend_parser.add_argument("--group", required=True, help="clock or path group")
+    trend_parser.add_argument("--metric", required=True)
+    trend_parser.add_argument("--scenario", default=None)
+    trend_parser.add_argument("--last", type=int, default=200)
+    runs_parser = commands.add_parser("runs", help="runs stored for a design")
+    runs_parser.add_argument("--design", required=True)
+    runs_parser.add_argument("--last", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    conn = open_store(args.db)
+    if args.command == "trend":
+        for run_id, run_name, scenario, value in trend(conn, args.design, args.group, args.stage,
+                                                       args.metric, args.last, args.scenario):
+            print("{0:<8}{1:<30}{2:<30}{3}".format(run_id, run_name, scenario, value))
+    elif args.command == "runs":
+        for run_id, run_name, tool, created in list_runs(conn, args.design, args.last):
+            print("{0:<8}{1:<30}{2:<12}{3}".format(
+                run_id, run_name, tool, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))))
+    else:
+        parser.print_help()
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
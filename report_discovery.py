@@ -0,0 +1,174 @@
+"""
+    Description:
+        Discovery of the reports of a run. The /syn and /apr report
+        folders are listed once with os.scandir and every report
+        name is matched against the known report types, so the
+        parse is planned from the files that exist instead of
+        opening every design, stage and compression combination.
+        Stages missing from the stage lists of the parsers are
+        found too.
+
+        Reports indexed, with their kind:
+            syn/reports/<design>.<stage>.qor.rpt                    qor
+            apr/reports/<design>.<stage>.qor.rpt                    qor
+            apr/reports/<design>.<stage>.clock_qor.rpt              clock_qor
+            apr/reports/<design>.<stage>2.timing.max.full_clock.rpt full_clock
+            apr/reports/<design>.innovus/<stage>.summary            summary
+
+        Each name may end with a compression extension of
+        report_io.REPORT_EXTENSIONS.
+"""
+import os
+
+import report_io
+
+INNOVUS_SUFFIX = ".innovus"     # Folder of the Cadence stage summaries of a design.
+SUMMARY_SUFFIX = ".summary"
+# Kinds of the reports of the /syn and /apr folders, with the end of
+# their name. Longer suffixes are tried first.
+REPORT_SUFFIXES = {"syn": [("qor", ".qor.rpt")],
+                   "apr": [("full_clock", "2.timing.max.full_clock.rpt"),
+                           ("clock_qor", ".clock_qor.rpt"),
+                           ("qor", ".qor.rpt")]}
+# Codec of each compression extension, see report_io.detect_codec().
+EXTENSION_CODECS = {"": None, ".gz": "gzip", ".zst": "zstd", ".bz2": "bz2", ".xz": "xz"}
+
+
+def split_extension(name):
+    """
+        Function removing the compression extension of a file name.
+
+        input: name: file name.
+        output: (name without extension, extension). The extension
+            is "" for other names.
+    """
+    for extension in report_io.REPORT_EXTENSIONS:
+        if extension and name.endswith(extension):
+            return name[:-len(extension)], extension
+    return name, ""
+
+
+def add_report(reports, key, file_path, extension):
+    """
+        Function adding a report to the index. When a report exists
+        with several extensions, the one report_io.find_report()
+        would open is kept.
+
+        input: reports: dict from discover_reports().
+        input: key: (flow, kind, design, stage).
+        input: file_path: path of the file.
+        input: extension: compression extension of the file.
+    """
+    entry = reports.get(key)
+    if entry is not None and report_io.REPORT_EXTENSIONS.index(entry["extension"]) \
+            < report_io.REPORT_EXTENSIONS.index(extension):
+        return
+    reports[key] = {"path": file_path, "extension": extension,
+                    "codec": EXTENSION_CODECS[extension]}
+
+
+def scan_summaries(reports, folder_path, design):
+    """
+        Function indexing the stage summaries of a .innovus folder.
+
+        input: reports: dict from discover_reports().
+        input: folder_path: path of the .innovus folder.
+        input: design: design name.
+    """
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            name, extension = split_extension(entry.name)
+            if name.endswith(SUMMARY_SUFFIX) and entry.is_file():
+                stage = name[:-len(SUMMARY_SUFFIX)]
+                add_report(reports, ("apr", "summary", design, stage), entry.path, extension)
+
+
+def scan_folder(reports, folder_path, flow):
+    """
+        Function indexing the reports of a /syn or /apr report folder.
+        A missing folder holds no report.
+
+        input: reports: dict from discover_reports().
+        input: folder_path: path of the folder.
+        input: flow: "syn" or "apr".
+    """
+    try:
+        entries = os.scandir(folder_path)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            if flow == "apr" and entry.name.endswith(INNOVUS_SUFFIX) and entry.is_dir():
+                scan_summaries(reports, entry.path, entry.name[:-len(INNOVUS_SUFFIX)])
+                continue
+            name, extension = split_extension(entry.name)
+            for kind, suffix in REPORT_SUFFIXES[flow]:
+                if not name.endswith(suffix):
+                    continue
+                design, _, stage = name[:-len(suffix)].rpartition(".")
+                if design and stage and entry.is_file():
+                    add_report(reports, (flow, kind, design, stage), entry.path, extension)
+                break
+
+
+def discover_reports(syn_folder, apr_folder):
+    """
+        Function listing the reports of a run.
+
+        input: syn_folder: report folder of /syn.
+        input: apr_folder: report folder of /apr.
+        output: dict of the reports, keyed by (flow, kind, design,
+            stage). Each entry has the "path" of the file, its
+            compression "extension" and "codec".
+    """
+    reports = {}
+    scan_folder(reports, syn_folder, "syn")
+    scan_folder(reports, apr_folder, "apr")
+    return reports
+
+
+def report_designs(reports):
+    """
+        Function returning the designs that have reports.
+
+        input: reports: dict from discover_reports().
+        output: sorted list of design names.
+    """
+    return sorted(set(key[2] for key in reports))
+
+
+def has_report(reports, flow, kind, design, stage):
+    """
+        Function checking if a report was found. Without an index
+        every report is assumed to exist.
+
+        input: reports: dict from discover_reports(), or None.
+        input: flow: "syn" or "apr".
+        input: kind: kind of the report.
+        input: design: design name.
+        input: stage: stage of the report.
+    """
+    return reports is None or (flow, kind, design, stage) in reports
+
+
+def plan_stages(reports, flow, kinds, design, known_stages):
+    """
+        Function returning the stages to parse for some kinds of
+        report. Stages of the stage list come first, in flow order,
+        followed by the other stages found, by name.
+
+        input: reports: dict from discover_reports().
+        input: flow: "syn" or "apr".
+        input: kinds: list of report kinds parsed per stage.
+        input: design: design name.
+        input: known_stages: stage list of the parser.
+        output: list of stages with at least one report.
+    """
+    found = set(key[3] for key in reports
+                if key[0] == flow and key[1] in kinds and key[2] == design)
+    stages = [stage for stage in known_stages if stage in found]
+    for stage in sorted(found.difference(known_stages)):
+        print("Found {0} {1} reports for stage {2}, which is not in the stage list.".format(
+            flow, "/".join(kinds), stage))
+        stages.append(stage)
+    return stages
@@ -0,0 +1,292 @@
+"""
+    Description:
+        Deterministic generator of synthetic reports, used by the
+        benchmarks. The same scale and seed always give the same
+        files. A generated run directory has the layout the parsers
+        read:
+
+            syn/reports/<design>.<stage>.qor.rpt              DC_STAGES
+            apr/reports/<design>.<stage>.qor.rpt              APR_STAGES
+            apr/reports/<design>.<stage>.clock_qor.rpt        APR_STAGES
+            apr/reports/<design>.innovus/<stage>.summary.gz   STAGES
+            apr/reports/<design>.<stage>2.timing.max.full_clock.rpt.gz
+                                                              STAGES_full_clock
+
+        Usage:
+            python report_generator.py --run-dir bench/run_01 --design blk \\
+                --scenarios 8 --groups 500 --corners 4 --clocks 200 --paths 50000
+"""
+import argparse
+import gzip
+import io
+import os
+import random
+import sys
+
+import cadence_parser as cp
+import report_parser as rp
+import synopsys_parser as sp
+
+# Scale of a generated run.
+DEFAULT_SCALE = {"scenarios": 4,    # Scenarios of the .qor reports.
+                 "groups": 250,     # Timing path groups per scenario.
+                 "corners": 4,      # Corners of the .clock_qor reports.
+                 "clocks": 100,     # Clocks per corner and scenario.
+                 "paths": 20000,    # Paths of the full_clock reports.
+                 "cells": 8}        # Cells on the data path of a full_clock path.
+GZIP_LEVEL = 1          # Compression of the generated .gz reports.
+TITLE_LINES = 21        # Title lines of a full_clock report, see parse_clock_path_report().
+
+
+def scenario_names(num_scenarios):
+    """
+        Function returning the scenario names of a generated report:
+        the scenarios of synopsys_parser.APR_SCENARIO_FIELDS in turn,
+        with a suffix after the first round.
+
+        input: num_scenarios: number of scenarios.
+    """
+    names = [scenario for scenario, fields in sp.APR_SCENARIO_FIELDS]
+    return [names[i % len(names)] + ("_{0}".format(i // len(names)) if i >= len(names) else "")
+            for i in range(num_scenarios)]
+
+
+def qor_lines(rng, num_scenarios, num_groups):
+    """
+        Generator of the lines of a .qor report. Without scenarios
+        the report has the /syn layout.
+
+        input: rng: random.Random of the report.
+        input: num_scenarios: number of scenarios, 0 for none.
+        input: num_groups: timing path groups per scenario.
+    """
+    scenarios = scenario_names(num_scenarios) or [None]
+    for scenario in scenarios:
+        for group in range(num_groups):
+            wns = round(rng.uniform(-0.5, 0.2), 3)
+            num_vio = rng.randint(0, 500) if wns < 0 else 0
+            if scenario is not None:
+                yield "  Scenario           '{0}'\n".format(scenario)
+            yield "  Timing Path Group  'clk_{0}'\n".format(group)
+            yield "  ----------------------------------------\n"
+            yield "  Levels of Logic:                     {0}\n".format(rng.randint(2, 40))
+            yield "  Critical Path Length:              {0:.2f}\n".format(rng.uniform(0.5, 2.0))
+            yield "  Critical Path Slack:              {0:.3f}\n".format(wns)
+            yield "  Critical Path Clk Period:          2.00\n"
+            yield "  Total Negative Slack:             {0:.3f}\n".format(min(0.0, wns) * num_vio)
+            yield "  No. of Violating Paths:              {0}\n".format(num_vio)
+            yield "  Worst Hold Violation:             {0:.3f}\n".format(rng.uniform(-0.05, 0.0))
+            yield "  Total Hold Violation:             {0:.3f}\n".format(rng.uniform(-1.0, 0.0))
+            yield "  No. of Hold Violations:              {0}\n".format(rng.randint(0, 50))
+            yield "  ----------------------------------------\n"
+            yield "\n"
+
+
+def clock_qor_lines(rng, num_corners, num_scenarios, num_clocks):
+    """
+        Generator of the lines of a .clock_qor report.
+
+        input: rng: random.Random of the report.
+        input: num_corners: number of corners.
+        input: num_scenarios: scenarios per corner.
+        input: num_clocks: clocks per corner and scenario.
+    """
+    for corner in range(num_corners):
+        yield "Summary Reporting for Corner corner_{0}\n".format(corner)
+        yield "Clock /   Attrs  Sinks Levels\n"
+        yield "---------------------------\n"
+        for scenario in scenario_names(max(1, num_scenarios)):
+            yield "### Mode: {0}, Scenario: {1}\n".format(scenario.split("_")[0], scenario)
+            for clock in range(num_clocks):
+                yield "clk_{0}  {1}  {2}  {3}  {4}  {5:.1f}  {6:.1f}  {7:.3f}  {8:.3f}  {9}  {10}\n".format(
+                    clock, "M,D" if clock % 5 == 0 else "G", rng.randint(1, 20000),
+                    rng.randint(2, 30), rng.randint(10, 2000), rng.uniform(10, 5000),
+                    rng.uniform(10, 5000), rng.uniform(0.1, 1.0), rng.uniform(0.0, 0.2),
+                    rng.randint(0, 5), rng.randint(0, 5))
+        yield "---------------------------\n"
+        yield "All Clocks   {0}\n".format(num_clocks)
+        yield "\n"
+
+
+def summary_lines(rng):
+    """
+        Generator of the lines of a Cadence .summary report, with a
+        setup and a hold table.
+
+        input: rng: random.Random of the report.
+    """
+    border = "+--------------------+---------+---------+---------+---------+---------+\n"
+    for mode in ("Setup", "Hold"):
+        wns = [round(rng.uniform(-0.5, 0.2), 3) for _ in range(4)]
+        tns = [round(min(0.0, value) * rng.randint(1, 100), 3) for value in wns]
+        vio = [rng.randint(1, 500) if value < 0 else 0 for value in wns]
+        yield border
+        yield "|{0:^20}|   all   | reg2reg | in2reg  | reg2out | in2out  |\n".format(mode + " mode")
+        yield border
+        yield "|           WNS (ns):| {0:^7} | {1:^7} | {2:^7} | {3:^7} | {4:^7} |\n".format(
+            min(wns), *wns)
+        yield "|           TNS (ns):| {0:^7} | {1:^7} | {2:^7} | {3:^7} | {4:^7} |\n".format(
+            round(sum(tns), 3), *tns)
+        yield "|    Violating Paths:| {0:^7} | {1:^7} | {2:^7} | {3:^7} | {4:^7} |\n".format(
+            sum(vio), *vio)
+        yield "|          All Paths:| {0:^7} | {1:^7} | {2:^7} | {3:^7} | {4:^7} |\n".format(
+            4000, 1000, 1000, 1000, 1000)
+        yield border
+        yield "\n"
+
+
+def full_clock_lines(rng, num_paths, num_cells, sort_by_slack=False):
+    """
+        Generator of the lines of a .max.full_clock timing report.
+
+        input: rng: random.Random of the report.
+        input: num_paths: number of timing paths.
+        input: num_cells: cells on the data path of each path.
+        input: sort_by_slack: sort the paths by slack, worst first,
+            and give the -sort_by slack option in the title.
+    """
+    slacks = [round(rng.uniform(-1.0, 1.0), 4) for _ in range(num_paths)]
+    if sort_by_slack:
+        slacks.sort()
+    title = ["Report : timing\n", "        -path_type full_clock\n",
+             "        -max_paths {0}\n".format(num_paths)]
+    if sort_by_slack:
+        title.append("        -sort_by slack\n")
+    for line in title:
+        yield line
+    for _ in range(TITLE_LINES - len(title)):
+        yield "\n"
+
+    for number, slack in enumerate(slacks):
+        group = "clk_{0}".format(number % 4)
+        startpoint = "u_core/s_reg_{0}".format(number)
+        endpoint = "u_core/e_reg_{0}".format(number % 5000)
+        yield "  Startpoint: {0} (rising edge-triggered flip-flop clocked by {1})\n".format(
+            startpoint, group)
+        yield "  Endpoint: {0}/D (rising edge-triggered flip-flop clocked by {1})\n".format(
+            endpoint, group)
+        yield "  Path Group: {0}\n".format(group)
+        yield "  Path Type: max\n\n"
+        yield "  Point                                    Incr       Path\n"
+        yield "  ------------------------------------------------------------\n"
+        yield "  clock {0} (rise edge)                    0.0000     0.0000\n".format(group)
+        path_time = rng.uniform(0.2, 0.5)
+        yield "  {0}/CK (DFF)                   0.0000     {1:.4f} r\n".format(startpoint, path_time)
+        incr = rng.uniform(0.05, 0.15)
+        path_time += incr
+        yield "  {0}/Q (DFF)                    {1:.4f}     {2:.4f} r\n".format(
+            startpoint, incr, path_time)
+        for cell in range(num_cells):
+            incr = rng.uniform(0.01, 0.1)
+            path_time += incr
+            yield "  u_core/u{0}_{1}/Z (BUF)       {2:.4f}     {3:.4f} r\n".format(
+                number, cell, incr, path_time)
+        yield "  {0}/D (DFF)                    0.0100     {1:.4f} r\n".format(endpoint, path_time + 0.01)
+        arrival = path_time + 0.01
+        yield "  data arrival time                                   {0:.4f}\n\n".format(arrival)
+        yield "  clock {0} (rise edge)                    2.0000     2.0000\n".format(group)
+        latency = rng.uniform(0.2, 0.5)
+        required = arrival + slack
+        yield "  {0}/CK (DFF)                   {1:.4f}     {2:.4f} r\n".format(
+            endpoint, latency, 2.0 + latency)
+        yield "  library setup time                       {0:.4f}     {1:.4f}\n".format(
+            required - 2.0 - latency, required)
+        yield "  data required time                                  {0:.4f}\n".format(required)
+        yield "  ------------------------------------------------------------\n"
+        yield "  slack ({0})                                  {1:.4f}\n\n\n".format(
+            "VIOLATED" if slack < 0 else "MET", slack)
+
+
+def write_report(file_path, lines):
+    """
+        Function writing generated lines to a report, compressed
+        with gzip when the path ends with .gz.
+
+        input: file_path: path of the report.
+        input: lines: iterable of lines.
+        output: size of the written report before compression.
+    """
+    folder = os.path.dirname(file_path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    size = 0
+    with open(file_path, 'wb') as raw:
+        if file_path.endswith(".gz"):
+            # No name or time in the header, so the file only depends on the seed.
+            fp = io.TextIOWrapper(gzip.GzipFile(filename="", mode='wb', compresslevel=GZIP_LEVEL,
+                                                fileobj=raw, mtime=0))
+        else:
+            fp = io.TextIOWrapper(raw)
+        with fp:
+            for line in lines:
+                fp.write(line)
+                size += len(line)
+    return size
+
+
+def generate_run(run_dir, design, scale=None, seed=0, sort_by_slack=False):
+    """
+        Function writing every report of a synthetic run.
+
+        input: run_dir: run directory, created if needed.
+        input: design: design name.
+        input: scale: dict with the keys of DEFAULT_SCALE, missing
+            keys take the default.
+        input: seed: seed of the reports.
+        input: sort_by_slack: sort the full_clock paths by slack.
+        output: dict of report path to (kind, stage).
+    """
+    scale = dict(DEFAULT_SCALE, **(scale or {}))
+    folders = rp.get_folders(run_dir)
+    reports = {}
+
+    def add(kind, stage, file_path, lines):
+        write_report(file_path, lines)
+        reports[file_path] = (kind, stage)
+
+    for i, stage in enumerate(rp.DC_STAGES):
+        rng = random.Random("{0}:syn:{1}".format(seed, i))
+        add("syn_qor", stage, folders["syn"] + design + "." + stage + ".qor.rpt",
+            qor_lines(rng, 0, scale["groups"]))
+    for i, stage in enumerate(sp.APR_STAGES):
+        rng = random.Random("{0}:apr:{1}".format(seed, i))
+        add("qor", stage, folders["apr"] + design + "." + stage + ".qor.rpt",
+            qor_lines(rng, scale["scenarios"], scale["groups"]))
+        add("clock_qor", stage, folders["apr"] + design + "." + stage + ".clock_qor.rpt",
+            clock_qor_lines(rng, scale["corners"], scale["scenarios"], scale["clocks"]))
+    for i, stage in enumerate(cp.STAGES):
+        rng = random.Random("{0}:summary:{1}".format(seed, i))
+        add("summary", stage, folders["apr"] + design + ".innovus/" + stage + ".summary.gz",
+            summary_lines(rng))
+    for i, stage in enumerate(cp.STAGES_full_clock):
+        rng = random.Random("{0}:full_clock:{1}".format(seed, i))
+        add("full_clock", stage, folders["apr"] + design + "." + stage + "2"
+            + ".timing.max.full_clock.rpt.gz",
+            full_clock_lines(rng, scale["paths"], scale["cells"], sort_by_slack))
+    return reports
+
+
+def main(argv):
+    """
+        Command line entry point writing a synthetic run.
+
+        input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Write synthetic reports for benchmarks.")
+    parser.add_argument("--run-dir", required=True, help="run directory written")
+    parser.add_argument("--design", default="blk", help="design name")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the reports")
+    parser.add_argument("--sort-by-slack", action="store_true",
+                        help="sort the full_clock paths by slack")
+    for name, value in sorted(DEFAULT_SCALE.items()):
+        parser.add_argument("--" + name, type=int, default=value)
+    args = parser.parse_args(argv)
+
+    scale = dict((name, getattr(args, name)) for name in DEFAULT_SCALE)
+    reports = generate_run(args.run_dir, args.design, scale, args.seed, args.sort_by_slack)
+    print("{0} reports generated in {1}.".format(len(reports), args.run_dir))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
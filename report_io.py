@@ -0,0 +1,167 @@
+"""
+    Description:
+        Reader layer shared by the parsers. Reports may be plain
+        text or compressed with gzip, bz2, xz or zstd; the codec is
+        picked from the first bytes of the file, not its name. Text
+        is streamed with large buffered reads and decoded
+        incrementally, so a report is never held in memory twice.
+        When parse_metrics is recording a report, the file reads and
+        the decompression are timed separately.
+
+        zstd needs the zstandard module, or compression.zstd on
+        Python 3.14 and later.
+"""
+import gzip
+import io
+import os
+
+import lazy_import
+import parse_metrics
+
+# Imported when a report uses them; the zstd modules are None when
+# not installed.
+bz2 = lazy_import.lazy_module("bz2")
+lzma = lazy_import.lazy_module("lzma")
+zstd = lazy_import.optional_module("compression.zstd")
+zstandard = lazy_import.optional_module("zstandard")
+
+STREAM_BUFFER_SIZE = 1024 * 1024    # Size of the reads done on reports.
+# Extensions tried after the report name, in order.
+REPORT_EXTENSIONS = ["", ".gz", ".zst", ".bz2", ".xz"]
+# First bytes of each compressed format.
+CODEC_MAGIC = [("gzip", b"\x1f\x8b"),
+               ("bz2", b"BZh"),
+               ("xz", b"\xfd7zXZ\x00"),
+               ("zstd", b"\x28\xb5\x2f\xfd")]
+
+
+def find_report(file_path):
+    """
+        Function returning the file of a report, which may have a
+        compression extension added to its name.
+
+        input: file_path: path of the report, without compression
+            extension.
+        output: path of the first existing file, None if not found.
+    """
+    for extension in REPORT_EXTENSIONS:
+        if os.path.isfile(file_path + extension):
+            return file_path + extension
+    return None
+
+
+def report_paths(file_path):
+    """
+        Function listing every file name a report may have.
+
+        input: file_path: path of the report, without compression
+            extension.
+    """
+    return [file_path + extension for extension in REPORT_EXTENSIONS]
+
+
+def detect_codec(file_path):
+    """
+        Function returning the compression of a file.
+
+        input: file_path: path of the file.
+        output: "gzip", "bz2", "xz", "zstd", or None for plain text.
+    """
+    with open(file_path, 'rb') as fp:
+        head = fp.read(6)
+    for codec, magic in CODEC_MAGIC:
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def open_binary(file_path):
+    """
+        Function opening a report for buffered reads of its
+        decompressed bytes.
+
+        input: file_path: path of the file.
+        output: binary file object.
+    """
+    codec = detect_codec(file_path)
+    record = parse_metrics.current_report()
+    if record is not None:
+        return open_timed(file_path, codec, record)
+    if codec is None:
+        return open(file_path, 'rb', buffering=STREAM_BUFFER_SIZE)
+
+    if codec == "gzip":
+        raw = gzip.open(file_path, 'rb')
+    elif codec == "bz2":
+        raw = bz2.open(file_path, 'rb')
+    elif codec == "xz":
+        raw = lzma.open(file_path, 'rb')
+    elif zstd is not None:
+        raw = zstd.open(file_path, 'rb')
+    elif zstandard is not None:
+        raw = zstandard.ZstdDecompressor().stream_reader(
+            open(file_path, 'rb'), read_size=STREAM_BUFFER_SIZE, closefd=True)
+    else:
+        raise IOError("File {0} is zstd compressed; install zstandard to read it.".format(file_path))
+
+    return io.BufferedReader(raw, buffer_size=STREAM_BUFFER_SIZE)
+
+
+def open_timed(file_path, codec, record):
+    """
+        Function opening a report like open_binary(), adding the
+        time of the file reads and of the decompressed reads to a
+        parse_metrics record.
+
+        input: file_path: path of the file.
+        input: codec: compression from detect_codec().
+        input: record: report record of parse_metrics, updated.
+        output: binary file object.
+    """
+    record["codec"] = codec or "none"
+    source = open(file_path, 'rb', buffering=0)
+    timed_source = parse_metrics.TimedReader(source, record, "read_s", "bytes_read")
+    if codec is None:
+        return io.BufferedReader(timed_source, buffer_size=STREAM_BUFFER_SIZE)
+
+    # The decompressors read through the timed source and do not close it.
+    fileobj = io.BufferedReader(timed_source, buffer_size=STREAM_BUFFER_SIZE)
+    if codec == "gzip":
+        raw = gzip.GzipFile(fileobj=fileobj, mode='rb')
+    elif codec == "bz2":
+        raw = bz2.BZ2File(fileobj, 'rb')
+    elif codec == "xz":
+        raw = lzma.LZMAFile(fileobj, 'rb')
+    elif zstd is not None:
+        raw = zstd.ZstdFile(fileobj, 'rb')
+    elif zstandard is not None:
+        raw = zstandard.ZstdDecompressor().stream_reader(
+            fileobj, read_size=STREAM_BUFFER_SIZE, closefd=False)
+    else:
+        fileobj.close()
+        raise IOError("File {0} is zstd compressed; install zstandard to read it.".format(file_path))
+
+    decoded = parse_metrics.TimedReader(raw, record, "decompress_s", "bytes_decoded",
+                                        owned=(fileobj,))
+    return io.BufferedReader(decoded, buffer_size=STREAM_BUFFER_SIZE)
+
+
+def open_report(file_path):
+    """
+        Function opening a report as a stream of decoded lines.
+
+        input: file_path: path of the file.
+        output: text file object. Bytes that are not UTF-8 are replaced.
+    """
+    return io.TextIOWrapper(open_binary(file_path), encoding='utf-8', errors='replace')
+
+
+def read_lines(file_path):
+    """
+        Function reading every line of a report.
+
+        input: file_path: path of the file.
+        output: list of lines.
+    """
+    with open_report(file_path) as fp:
+        return fp.readlines()
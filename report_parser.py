@@ -7,29 +7,792 @@
     for prompting the user and calling the functions
     to generate appropriate reports.
 
+    Run without arguments for the interactive prompt. Many
+    designs or run directories can be parsed in parallel with
+    the batch mode, for example:
 
+        python report_parser.py --tool cadence --design blk_a blk_b
+        python report_parser.py --tool synopsys --design blk \\
+            --run-dir runs/run_01 runs/run_02 --jobs 16
+
+    --metrics-log saves the read, decompression, parse and write
+    times of every report and output, see parse_metrics; set
+    REPORT_PARSER_METRICS to a log path for the interactive prompt.
 """
 
-import cadence_parser as cp
-import synopsys_parser as sp
+import lazy_import
+import parse_cache
+import parse_metrics
+import qor_export
+import report_discovery
+import report_io
 
+import argparse
+import os
 import sys
+import time
+from functools import partial
+
+# Loaded by the runs that use them: a Cadence run does not import
+# the Synopsys parser, and the reverse.
+concurrent_futures = lazy_import.lazy_module("concurrent.futures")
+cp = lazy_import.lazy_module("cadence_parser")
+sp = lazy_import.lazy_module("synopsys_parser")
+path_index = lazy_import.lazy_module("path_index")
+qor_store = lazy_import.lazy_module("qor_store")
 
 FOLDER_READ_PATH = "reports/"       # Location of reports to be parsed.
 FOLDER_WRITE_PATH = "outputs/"      # Location of the output parsed file.
 
 ASIC_TOOLS = ["synopsys", "cadence"]    # Set of tools that generates reports.
+DC_STAGES = ["dc", "dct"]               # Flows of dc_shell under /syn.
+
+
+def get_folders(run_dir=None, write_path=FOLDER_WRITE_PATH, cache=None, store=None,
+                export=None, index=False):
+    """
+    Function to build the folders a design is read from
+    and written to.
+
+    input: run_dir: run directory containing syn/ and apr/, or
+        None for the folders next to this project.
+    input: write_path: folder the outputs are written to. Outputs of
+        a run directory go to a sub folder named after the run.
+    input: cache: keyword arguments of parse_cache.cached_call(), or
+        None to parse every report.
+    input: store: path of the historical QoR database the parsed
+        tables are added to, or None.
+    input: export: columnar export format written next to the CSV
+        outputs, see qor_export, or None.
+    input: index: build the sidecar path index of full_clock reports,
+        see path_index.
+    output: folders: dict with the "syn", "apr" and "write" folders,
+        the "cache" options, the "store" path, the "export" format,
+        the "index" option and the "run" name.
+    """
+    if run_dir is None:
+        return {"syn": sp.FOLDER_READ_PATH_SYN,
+                "apr": "../apr/" + FOLDER_READ_PATH,
+                "write": write_path,
+                "cache": cache,
+                "store": store,
+                "export": export,
+                "index": index,
+                "run": None}
+
+    run_name = os.path.basename(os.path.normpath(run_dir))
+    return {"syn": os.path.join(run_dir, "syn", FOLDER_READ_PATH),
+            "apr": os.path.join(run_dir, "apr", FOLDER_READ_PATH),
+            "write": os.path.join(write_path, run_name) + "/",
+            "cache": cache,
+            "store": store,
+            "export": export,
+            "index": index,
+            "run": run_name}
+
+
+def report_size(file_path):
+    """
+    Function returning the size of a report in bytes, or
+    0 when the report does not exist.
+
+    input: file_path: path of the report.
+    """
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def create_stage_pool(threads=1, processes=0):
+    """
+    Function creating the worker pool used to read and parse
+    the stages of one design concurrently.
+
+    input: threads: number of threads. Threads overlap the report
+        reads, which helps most when the reports are on NFS.
+    input: processes: number of processes. When set, processes are
+        used instead of threads so parsing runs on several cores.
+    output: executor, or None to parse the stages serially.
+    """
+    if processes and processes > 0:
+        return concurrent_futures.ProcessPoolExecutor(max_workers=processes)
+    if threads and threads > 1:
+        return concurrent_futures.ThreadPoolExecutor(max_workers=threads)
+    return None
+
+
+def submit_stages(pool, function, top_design, stages, folders):
+    """
+    Function starting one task per stage. Serial mode runs the
+    tasks right away.
+
+    input: pool: executor from create_stage_pool(), or None.
+    input: function: stage function taking (top_design, stage, folders).
+    input: top_design: string containing design name.
+    input: stages: list of stages, in flow order.
+    input: folders: dict from get_folders().
+    output: list of futures or results, in the order of stages.
+    """
+    if pool is None:
+        return [function(top_design, stage, folders) for stage in stages]
+    if isinstance(pool, concurrent_futures.ProcessPoolExecutor) and parse_metrics.enabled():
+        # Bring the metrics of the worker processes back with the results.
+        return [pool.submit(parse_metrics.recorded_call, function, top_design, stage, folders)
+                for stage in stages]
+    return [pool.submit(function, top_design, stage, folders) for stage in stages]
+
+
+def stage_results(pending):
+    """
+    Function waiting for the tasks from submit_stages(). Results
+    are returned in stage order so the output does not depend on
+    which stage finished first.
+
+    input: pending: list returned by submit_stages().
+    output: list of stage results.
+    """
+    # Stage results are tuples, the other items are futures.
+    return [item if isinstance(item, tuple) else parse_metrics.unwrap(item.result())
+            for item in pending]
+
+
+def cached_parse(folders, file_path, kind, function, refresh=False):
+    """
+    Function running function() to read and parse a report,
+    through the parse cache when one is configured in folders.
+
+    input: folders: dict from get_folders().
+    input: file_path: path of the report, without compression extension.
+    input: kind: string naming the parse done on the report.
+    input: function: callable without arguments returning the data.
+    input: refresh: parse the report even when the cache holds it.
+    output: (data, bytes_read). bytes_read is 0 when the data came
+        from the cache.
+    """
+    file_path = report_io.find_report(file_path) or file_path
+    with parse_metrics.report_timer(file_path, kind) as record:
+        if folders.get("cache") is None:
+            data, hit = function(), False
+        else:
+            data, hit = parse_cache.cached_call(file_path, kind, function, refresh=refresh,
+                                                **folders["cache"])
+        parse_metrics.count_records(record, data)
+        if record is not None:
+            record["cached"] = hit
+    if hit:
+        return data, 0
+    return data, report_size(file_path)
+
+
+def plan_design(folders, top_design):
+    """
+    Function listing the reports of a run once and adding
+    the index to the folders, so only the reports that exist
+    are read.
+
+    input: folders: dict from get_folders().
+    input: top_design: string containing design name.
+    output: copy of folders with the "reports" index, see
+        report_discovery.discover_reports().
+    """
+    reports = report_discovery.discover_reports(folders["syn"], folders["apr"])
+    if not any(key[2] == top_design for key in reports):
+        print("No reports found for design {0}.".format(top_design))
+    return dict(folders, reports=reports)
+
+
+def store_tables(folders, tool_option, top_design, tables):
+    """
+    Function adding the parsed tables of a design to the
+    historical QoR database when one is configured in folders.
+
+    input: folders: dict from get_folders().
+    input: tool_option: one of ASIC_TOOLS.
+    input: top_design: string containing design name.
+    input: tables: list of StageTable of the design.
+    """
+    if folders.get("store") is None or not tables:
+        return
+    qor_store.store_run(folders["store"], top_design, tool_option, tables, folders["run"])
+
+
+def read_syn_qor(to_open, stage, folders):
+    """
+    Function to read and format a /syn .qor report.
+
+    input: to_open: file name of the report.
+    input: stage: dc_shell flow of the report.
+    input: folders: dict from get_folders().
+    output: qor_table: StageTable, None if the report is missing.
+    """
+    qor_report = sp.read_file_mapped(to_open, folders["syn"], sp.QOR_ANCHOR_RE)
+    # Parse report if it was found.
+    if qor_report == "":
+        return None
+
+    return sp.get_qor_data(qor_report, stage, "syn")
+
+
+def read_apr_qor(to_open, stage, folders):
+    """
+    Function to read and format an /apr .qor report.
+
+    input: to_open: file name of the report.
+    input: stage: APR stage of the report.
+    input: folders: dict from get_folders().
+    output: qor_table: StageTable, None if the report is missing.
+    """
+    qor_report = sp.read_file_mapped(to_open, folders["apr"], sp.QOR_ANCHOR_RE)
+    # Error checking. Skip parsing the file if it wasn't found.
+    if qor_report == "":
+        return None
+
+    # This function extracts data from
+    # the qor_report.
+    return sp.get_qor_data(qor_report, stage, "apr")
+
+
+def read_apr_clock_qor(to_open, stage, folders):
+    """
+    Function to read and parse an /apr .clock_qor report.
+
+    input: to_open: file name of the report.
+    input: stage: APR stage of the report.
+    input: folders: dict from get_folders().
+    output: clock_table: StageTable, None if the report is missing.
+    """
+    clock_qor = sp.read_file_mapped(to_open, folders["apr"], sp.CLOCK_QOR_ANCHOR_RE)
+    # Error checking. Skip parsing the file if it wasn't found.
+    if clock_qor == "":
+        return None
+
+    # Parse the clock_qor report.
+    return sp.parse_clock_qor(clock_qor, stage)
+
+
+def parse_syn_stage(top_design, stage, folders):
+    """
+    Function to read and parse the .qor report of one
+    /syn stage.
+
+    input: top_design: string containing design name.
+    input: stage: dc_shell flow of the report.
+    input: folders: dict from get_folders().
+    output: (qor_table, bytes_read). qor_table is None if the report
+        is missing.
+    """
+    # Create file name and read the file.
+    to_open = top_design + "." + stage + ".qor.rpt"
+    return cached_parse(folders, folders["syn"] + to_open, "syn_qor:" + stage,
+                        partial(read_syn_qor, to_open, stage, folders))
+
+
+def parse_apr_stage(top_design, stage, folders):
+    """
+    Function to read and parse the .qor and .clock_qor
+    reports of one /apr stage.
+
+    input: top_design: string containing design name.
+    input: stage: APR stage of the reports.
+    input: folders: dict from get_folders().
+    output: (qor_table, clock_table, bytes_read). A table is None
+        if its report was not found.
+    """
+    reports = folders.get("reports")
+    qor_table, qor_bytes = None, 0
+    clock_table, clock_bytes = None, 0
+
+    # Create file name and read the file.
+    if report_discovery.has_report(reports, "apr", "qor", top_design, stage):
+        to_open = top_design + "." + stage + ".qor.rpt"
+        qor_table, qor_bytes = cached_parse(folders, folders["apr"] + to_open, "apr_qor:" + stage,
+                                             partial(read_apr_qor, to_open, stage, folders))
+
+    # Read clock_qor report.
+    if report_discovery.has_report(reports, "apr", "clock_qor", top_design, stage):
+        to_open = top_design + "." + stage + ".clock_qor.rpt"
+        clock_table, clock_bytes = cached_parse(folders, folders["apr"] + to_open,
+                                                "clock_qor:" + stage,
+                                                partial(read_apr_clock_qor, to_open, stage, folders))
+
+    return qor_table, clock_table, qor_bytes + clock_bytes
+
+
+def collect_synopsys_tables(top_design, folders, threads=1, processes=0):
+    """
+    Function to parse all .qor and .clock_qor reports of
+    one design.
+
+    input: top_design: string containing design name.
+    input: folders: dict from get_folders().
+    input: threads: threads used to parse the stages, see create_stage_pool().
+    input: processes: processes used to parse the stages.
+    output: (qor_tables, clock_tables, bytes_read). bytes_read is the
+        size of the reports that were parsed.
+    """
+    bytes_read = 0
+    folders = plan_design(folders, top_design)
+    # The .qor files under /syn for synthesis and physical
+    # synthesis flows, and the .qor and .clock_qor files under
+    # /apr for Automatic Place & Route flows (APR).
+    syn_stages = report_discovery.plan_stages(folders["reports"], "syn", ["qor"],
+                                              top_design, DC_STAGES)
+    apr_stages = report_discovery.plan_stages(folders["reports"], "apr", ["qor", "clock_qor"],
+                                              top_design, sp.APR_STAGES)
+
+    pool = create_stage_pool(threads, processes)
+    try:
+        syn_pending = submit_stages(pool, parse_syn_stage, top_design, syn_stages, folders)
+        apr_pending = submit_stages(pool, parse_apr_stage, top_design, apr_stages, folders)
+        syn_results = stage_results(syn_pending)
+        apr_results = stage_results(apr_pending)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Collect the tables of every stage, /syn first.
+    qor_tables = []
+    for qor_table, stage_bytes in syn_results:
+        bytes_read += stage_bytes
+        if qor_table is not None:
+            qor_tables.append(qor_table)
+
+    clock_tables = []
+    for qor_table, clock_table, stage_bytes in apr_results:
+        bytes_read += stage_bytes
+        if qor_table is not None:
+            qor_tables.append(qor_table)
+        if clock_table is not None:
+            clock_tables.append(clock_table)
+
+    return qor_tables, clock_tables, bytes_read
+
+
+def parse_synopsys_design(top_design, folders, threads=1, processes=0):
+    """
+    Function to parse all .qor and .clock_qor reports of
+    one design and write the results.
+
+    input: top_design: string containing design name.
+    input: folders: dict from get_folders().
+    input: threads: threads used to parse the stages, see create_stage_pool().
+    input: processes: processes used to parse the stages.
+    output: bytes_read: size of the reports that were parsed.
+    """
+    qor_tables, clock_tables, bytes_read = collect_synopsys_tables(top_design, folders,
+                                                                   threads, processes)
+    write_synopsys_outputs(top_design, folders, qor_tables, clock_tables)
+    return bytes_read
+
+
+def write_synopsys_outputs(top_design, folders, qor_tables, clock_tables):
+    """
+    Function to write the parsed .qor and .clock_qor tables
+    of one design.
+
+    input: top_design: string containing design name.
+    input: folders: dict from get_folders().
+    input: qor_tables: list of StageTable of the .qor reports.
+    input: clock_tables: list of StageTable of the .clock_qor reports.
+    """
+    if qor_tables:
+        # Write results to CSV file and text file.
+        sp.write_qor_to_csv(top_design, qor_tables, "qor", folders["write"])
+        sp.write_data_to_text(top_design, qor_tables, "qor", folders["write"])
+        if folders.get("export"):
+            sp.write_qor_to_columnar(top_design, qor_tables, "qor", folders["write"],
+                                     folders["export"], folders["run"] or "")
+
+    if clock_tables:
+        sp.write_qor_to_csv(top_design, clock_tables, "clock_qor", folders["write"])
+        sp.write_data_to_text(top_design, clock_tables, "clock_qor", folders["write"])
+        if folders.get("export"):
+            sp.write_qor_to_columnar(top_design, clock_tables, "clock_qor", folders["write"],
+                                     folders["export"], folders["run"] or "")
+
+    store_tables(folders, ASIC_TOOLS[0], top_design, qor_tables + clock_tables)
+
+
+def read_summary(file_path, stage):
+    """
+    Function to read and parse a Cadence .summary report.
+
+    input: file_path: path of the report, without compression extension.
+    input: stage: stage of the Cadence APR flow.
+    output: summary_table: StageTable, None if the report is missing.
+    """
+    report = cp.read_gz_file(file_path)
+    if not report:
+        return None
+
+    # Parse report contents
+    return cp.parse_report(report, stage)
+
+
+def read_full_clock(file_path, stage, index=False):
+    """
+    Function to read and parse a Cadence .max.full_clock report.
+    Reports sorted by slack are closed once their worst paths are
+    read, see cadence_parser.parse_clock_path_report().
+
+    input: file_path: path of the report, without compression extension.
+    input: stage: stage of the Cadence APR flow.
+    input: index: also build the sidecar path index of the report
+        when it has none.
+    output: slack_table: StageTable with the worst slack times of the stage.
+    """
+    report_path = report_io.find_report(file_path)
+    indexing = index and report_path is not None and path_index.load_index(report_path) is None
+    if indexing:
+        # Index the paths while the report is parsed.
+        report = path_index.indexed_report(report_path, stage)
+    else:
+        # Stream the file; full_clock reports are too large to hold in memory.
+        report = cp.stream_gz_file(file_path)
+    # parse the file and extract all the necessary information. A
+    # report sorted by slack is only read up to its worst paths,
+    # unless every path is indexed.
+    try:
+        return cp.parse_clock_path_report(report, stage, early_exit=not indexing)
+    finally:
+        report.close()
+
+
+def parse_summary_stage(top_design, stage, folders):
+    """
+    Function to read and parse the .summary report
+    of one Cadence stage.
+
+    input: top_design: string containing design name.
+    input: stage: stage of the Cadence APR flow.
+    input: folders: dict from get_folders().
+    output: (summary_table, bytes_read). summary_table is None if
+        the report was not found.
+    """
+    # Create file path and read file.
+    # .summary files contained under /apr/reports/.
+    folder_path = folders["apr"] + top_design + ".innovus" + "/"
+    file_name = stage + ".summary"
+    file_path = folder_path + file_name
+
+    return cached_parse(folders, file_path, "summary:" + stage,
+                        partial(read_summary, file_path, stage))
+
+
+def parse_full_clock_stage(top_design, stage, folders):
+    """
+    Function to read and parse the .max.full_clock report
+    of one Cadence stage.
+
+    input: top_design: string containing design name.
+    input: stage: stage of the Cadence APR flow.
+    input: folders: dict from get_folders().
+    output: (slack_table, bytes_read).
+    """
+    # Create file path and read file.
+    folder_path = folders["apr"]
+    file_name = top_design + "." + stage + "2" + ".timing" + ".max.full_clock" + ".rpt"
+    file_path = folder_path + file_name
+
+    # The number of slack times kept is part of the cache key.
+    kind = "full_clock:{0}:{1}".format(stage, cp.NUM_PATHS_FULL_CLK)
+    if folders.get("index"):
+        kind += ":index"
+        # A cache hit would skip building the index: a report whose
+        # sidecar index is missing or stale is parsed again.
+        report_path = report_io.find_report(file_path)
+        refresh = report_path is not None and path_index.load_index(report_path) is None
+    else:
+        refresh = False
+    return cached_parse(folders, file_path, kind,
+                        partial(read_full_clock, file_path, stage, folders.get("index")),
+                        refresh)
+
+
+def collect_cadence_tables(top_design, folders, threads=1, processes=0):
+    """
+    Function to parse all .summary and .max.full_clock
+    reports of one design.
+
+    input: top_design: string containing design name.
+    input: folders: dict from get_folders().
+    input: threads: threads used to parse the stages, see create_stage_pool().
+    input: processes: processes used to parse the stages.
+    output: (summary_tables, slack_tables, bytes_read). bytes_read is
+        the size of the reports that were parsed.
+    """
+    bytes_read = 0
+    folders = plan_design(folders, top_design)
+    # Stages of Cadence APR flow with a .summary file or a
+    # .max.full_clock file.
+    summary_stages = report_discovery.plan_stages(folders["reports"], "apr", ["summary"],
+                                                  top_design, cp.STAGES)
+    full_clock_stages = report_discovery.plan_stages(folders["reports"], "apr", ["full_clock"],
+                                                     top_design, cp.STAGES_full_clock)
+
+    pool = create_stage_pool(threads, processes)
+    try:
+        summary_pending = submit_stages(pool, parse_summary_stage, top_design, summary_stages,
+                                        folders)
+        full_clock_pending = submit_stages(pool, parse_full_clock_stage, top_design,
+                                           full_clock_stages, folders)
+        summary_results = stage_results(summary_pending)
+        full_clock_results = stage_results(full_clock_pending)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    summary_tables = []
+    for summary_table, stage_bytes in summary_results:
+        bytes_read += stage_bytes
+        if summary_table is not None:
+            summary_tables.append(summary_table)
+
+    slack_tables = []       # Contains worst failing times for APR flow.
+    for slack_table, stage_bytes in full_clock_results:
+        bytes_read += stage_bytes
+        slack_tables.append(slack_table)
+
+    return summary_tables, slack_tables, bytes_read
+
+
+def parse_cadence_design(top_design, folders, threads=1, processes=0):
+    """
+    Function to parse all .summary and .max.full_clock
+    reports of one design and write the results.
+
+    input: top_design: string containing design name.
+    input: folders: dict from get_folders().
+    input: threads: threads used to parse the stages, see create_stage_pool().
+    input: processes: processes used to parse the stages.
+    output: bytes_read: size of the reports that were parsed.
+    """
+    summary_tables, slack_tables, bytes_read = collect_cadence_tables(top_design, folders,
+                                                                      threads, processes)
+    write_cadence_outputs(top_design, folders, summary_tables, slack_tables)
+    return bytes_read
+
+
+def write_cadence_outputs(top_design, folders, summary_tables, slack_tables):
+    """
+    Function to write the parsed .summary and .max.full_clock
+    tables of one design.
+
+    input: top_design: string containing design name.
+    input: folders: dict from get_folders().
+    input: summary_tables: list of StageTable of the .summary reports.
+    input: slack_tables: list of StageTable of the .max.full_clock reports.
+    """
+    # Check if any data was actually collected.
+    # If not, don't write to the files.
+    if summary_tables:
+        # Write results to CSV file and text file.
+        cp.write_data_to_csv(top_design, summary_tables, folders["write"])
+        cp.write_data_to_text(top_design, summary_tables, folders["write"])
+        if folders.get("export"):
+            cp.write_data_to_columnar(top_design, summary_tables, folders["write"],
+                                      folders["export"], folders["run"] or "")
+
+    # Print out the worst slack times found to a .txt file.
+    cp.write_full_clock_data_txt(top_design, slack_tables, folders["write"])
+    if folders.get("export"):
+        cp.write_data_to_columnar(top_design, slack_tables, folders["write"],
+                                  folders["export"], folders["run"] or "")
+
+    store_tables(folders, ASIC_TOOLS[1], top_design, summary_tables + slack_tables)
+
+
+def collect_tables(tool_option, top_design, folders, threads=1, processes=0):
+    """
+    Function parsing the reports of one design with the
+    selected tool, without writing any output.
+
+    input: tool_option: one of ASIC_TOOLS.
+    input: top_design: string containing design name.
+    input: folders: dict from get_folders().
+    input: threads: threads used to parse the stages of the design.
+    input: processes: processes used to parse the stages of the design.
+    output: (tables, bytes_read). tables is the list of StageTable
+        of the design.
+    """
+    if tool_option == ASIC_TOOLS[0]:
+        qor_tables, clock_tables, bytes_read = collect_synopsys_tables(top_design, folders,
+                                                                       threads, processes)
+        return qor_tables + clock_tables, bytes_read
+    if tool_option == ASIC_TOOLS[1]:
+        summary_tables, slack_tables, bytes_read = collect_cadence_tables(top_design, folders,
+                                                                          threads, processes)
+        return summary_tables + slack_tables, bytes_read
+    raise ValueError("Unknown tool {0}. Options are: {1}".format(
+        tool_option, ", ".join(ASIC_TOOLS)))
+
+
+def write_outputs(tool_option, top_design, folders, tables):
+    """
+    Function writing the tables from collect_tables() like the
+    parse of the design does.
+
+    input: tool_option: one of ASIC_TOOLS.
+    input: top_design: string containing design name.
+    input: folders: dict from get_folders().
+    input: tables: list of StageTable of the design.
+    """
+    if tool_option == ASIC_TOOLS[0]:
+        write_synopsys_outputs(top_design, folders,
+                               [table for table in tables if table.kind == 'qor'],
+                               [table for table in tables if table.kind == 'clock_qor'])
+    elif tool_option == ASIC_TOOLS[1]:
+        write_cadence_outputs(top_design, folders,
+                              [table for table in tables if table.kind == 'summary'],
+                              [table for table in tables if table.kind == 'full_clock'])
+    else:
+        raise ValueError("Unknown tool {0}. Options are: {1}".format(
+            tool_option, ", ".join(ASIC_TOOLS)))
+
+
+def parse_design(tool_option, top_design, run_dir=None, write_path=FOLDER_WRITE_PATH,
+                 threads=1, processes=0, cache=None, store=None, export=None,
+                 index=False):
+    """
+    Function parsing one design with the selected tool. This is
+    the unit of work given to each worker process in batch mode.
+
+    input: tool_option: one of ASIC_TOOLS.
+    input: top_design: string containing design name.
+    input: run_dir: run directory of the design, or None.
+    input: write_path: folder the outputs are written to.
+    input: threads: threads used to parse the stages of the design.
+    input: processes: processes used to parse the stages of the design.
+    input: cache: parse cache options, see get_folders().
+    input: store: path of the historical QoR database, see get_folders().
+    input: export: columnar export format, see get_folders().
+    input: index: build the path index of full_clock reports, see get_folders().
+    output: (top_design, run_dir, bytes_read) of the parsed design.
+    """
+    folders = get_folders(run_dir, write_path, cache, store, export, index)
+    if not os.path.isdir(folders["write"]):
+        os.makedirs(folders["write"])
+
+    if tool_option == ASIC_TOOLS[0]:
+        bytes_read = parse_synopsys_design(top_design, folders, threads, processes)
+    elif tool_option == ASIC_TOOLS[1]:
+        bytes_read = parse_cadence_design(top_design, folders, threads, processes)
+    else:
+        raise ValueError("Unknown tool {0}. Options are: {1}".format(
+            tool_option, ", ".join(ASIC_TOOLS)))
+
+    return top_design, run_dir, bytes_read
+
+
+def design_outcomes(pool, tasks):
+    """
+    Generator parsing the designs of run_batch() in the worker
+    pool, or in this process.
+
+    input: pool: process pool, or None to parse in this process.
+    input: tasks: list of parse_design() argument tuples.
+    output: yields (task, bytes_read, error) in completion order.
+        error is None when the design was parsed.
+    """
+    if pool is None:
+        for task in tasks:
+            try:
+                yield task, parse_design(*task)[2], None
+            except Exception as err:
+                yield task, 0, err
+        return
+
+    if parse_metrics.enabled():
+        futures = {pool.submit(parse_metrics.recorded_call, parse_design, *task): task
+                   for task in tasks}
+    else:
+        futures = {pool.submit(parse_design, *task): task for task in tasks}
+    for future in concurrent_futures.as_completed(futures):
+        try:
+            yield futures[future], parse_metrics.unwrap(future.result())[2], None
+        except Exception as err:
+            yield futures[future], 0, err
+
+
+def run_batch(tool_option, designs, run_dirs=None, jobs=None, write_path=FOLDER_WRITE_PATH,
+              threads=1, processes=0, cache=None, store=None, export=None,
+              index=False):
+    """
+    Function parsing every design of every run directory
+    in a pool of worker processes and printing the throughput.
+
+    input: tool_option: one of ASIC_TOOLS.
+    input: designs: list of design names.
+    input: run_dirs: list of run directories, or None to read the
+        folders next to this project.
+    input: jobs: number of worker processes. Defaults to the number
+        of cores of the machine. With 0 or 1 job, or a single design,
+        the designs are parsed one at a time in this process.
+    input: write_path: folder the outputs are written to.
+    input: threads: threads used to parse the stages of each design.
+    input: processes: processes used to parse the stages of each design.
+    input: cache: parse cache options, see get_folders().
+    input: store: path of the historical QoR database, see get_folders().
+    input: export: columnar export format, see get_folders().
+    input: index: build the path index of full_clock reports, see get_folders().
+    output: number of designs that failed to parse.
+    """
+    if not run_dirs:
+        run_dirs = [None]
+    tasks = [(design, run_dir) for run_dir in run_dirs for design in designs]
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(tasks))
+    if jobs > 1:
+        print("Parsing {0} designs with {1} worker processes.".format(len(tasks), jobs))
+        pool = concurrent_futures.ProcessPoolExecutor(max_workers=jobs)
+    else:
+        # A worker process would only add its start up time.
+        print("Parsing {0} designs in this process.".format(len(tasks)))
+        pool = None
+
+    start_time = time.time()
+    total_bytes = 0
+    num_done = 0
+    num_failed = 0
+    tasks = [(tool_option, design, run_dir, write_path, threads, processes, cache, store,
+              export, index) for design, run_dir in tasks]
+    try:
+        for task, bytes_read, err in design_outcomes(pool, tasks):
+            if err is None:
+                total_bytes += bytes_read
+                num_done += 1
+            else:
+                num_failed += 1
+                print("Failed to parse design {0} ({1}): {2}".format(
+                    task[1], task[2] if task[2] else ".", err))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.time() - start_time
+    rate = elapsed if elapsed > 0 else 1e-9
+    print("Parsed {0} designs in {1:.2f} s ({2:.2f} designs/s, {3:.2f} MB/s), {4} failed.".format(
+        num_done, elapsed, num_done / rate, total_bytes / rate / 1e6, num_failed))
+
+    return num_failed
+
 
 def main():
     """
     Runs task of selecting which tool we are
     parsing reports from.
     """
+    metrics_log = os.environ.get(parse_metrics.METRICS_LOG_ENV)
+    if metrics_log:
+        parse_metrics.enable()
+
     print("Welcome to ASIC tool Report Parser.")
     print("Please type which tool has generated the reports.")
     print("Options are: " + ASIC_TOOLS[0] + ", " + ASIC_TOOLS[1])
 
-    # Version dependency for getting user input. 
+    # Version dependency for getting user input.
     if sys.version_info[0] < 3:
         tool_option = raw_input()
     else:
@@ -45,152 +808,103 @@ def main():
         else:
             top_design = input("Please enter the design name\n")
 
-	# Variable containing the qor report.
-        qor_reports = []	
-	# Iterate over flows for dc_shell. 
-        dc_stage = ["dc", "dct"]
-        qor_reports = []
-	# This portion of the code will parse the 
-	# .qor files under /syn for synthesis 
-	# and physical synthesis flows. 
-        for stage in dc_stage:
-            # Create file name and read the file.
-            to_open = top_design + "." + stage + ".qor.rpt"
-            qor_report = sp.read_file_syn(to_open)
-
-            # Parse report if it was found. 
-            if qor_report != "":
-
-                # Make the data viewable.
-                qor_report = sp.format_qor_data_syn(qor_report, stage)
-
-                # Add flow and stage label.
-                qor_report.insert(0, ["FLOW:", "syn"])
-                qor_report.insert(1, ["STAGE:", stage])
-
-		# Append the reports to the variable containing 
-		# the entire collection. 
-                for row in qor_report:
-                    qor_reports.append([row])
-
-	# Assign the parsed file to a new variable.
-        syn_qor = qor_reports
-
-        qor_reports = []
-        clock_qor_reports = []
-	# This portion of the code will parse 
-	# files under /apr for Automatic Place &
-	# Route flows (APR). 
-	# The current files parsed here are .qor and 
-	# .clock_qor reports.
-        for stage in sp.APR_STAGES:
-
-            # Create file name and read the file.
-            to_open = top_design + "." + stage + ".qor.rpt"
-            qor_report = sp.read_file_apr(to_open)
-            # Error checking. Skip parsing the file if it wasn't found. 
-            if qor_report != "":
-
-                # This function extracts data from
-		# the qor_report.
-                qor_report = sp.get_qor_data(qor_report)
-		
-                # Make the extracted data viewable.
-                qor_report = sp.format_qor_data_apr(qor_report, stage)
-
-                # Add report for this stage in a list saved.
-                qor_reports.append(qor_report)
-
-            # Read clock_qor report.
-            to_open = top_design + "." + stage + ".clock_qor.rpt"
-            clock_qor = sp.read_file_apr(to_open)
-            # Error checking. Skip parsing the file if it wasn't found. 
-            if clock_qor != "":
-
-                # Parse and format the clock_qor report.
-                clock_qor = sp.parse_clock_qor(clock_qor, stage)
-
-                # Add report for this stage to the list of reports. 
-                clock_qor_reports.append(clock_qor)
-
-	
-	# Label indicating data extracted from APR flow.
-	if clock_qor_reports:
-	        clock_qor_reports.insert(0, [["FLOW:", "apr"]])
-
-        for row in qor_reports:
-            syn_qor.append(row)
-
-	if syn_qor:
-        	# Write results to CSV file and text file.
-        	sp.write_qor_to_csv(top_design, syn_qor, "qor")
-        	sp.write_data_to_text(top_design, syn_qor, "qor")
-
-	if clock_qor_reports:
-        	sp.write_qor_to_csv(top_design, clock_qor_reports, "clock_qor")
-        	sp.write_data_to_text(top_design, clock_qor_reports, "clock_qor")
-
+        parse_synopsys_design(top_design, get_folders())
 
     # Checking if user selected Cadence tools.
     if tool_option == ASIC_TOOLS[1]:
         print("Selected cadence tools.")
         print("Current reports available for parsing:")
         print("- .summary")
-	print("- .max.full_clock")
+        print("- .max.full_clock")
         if sys.version_info[0] < 3:
             top_design = raw_input("Please enter the design name.\n")
         else:
             top_design = input("Please enter the design name.\n")
-        stages_data = []
-	# This for loop processes .summary files.
-        for stage in cp.STAGES:  # Iterate through stages of Cadence APR flow. 
-
-            # Create file path and read file.
-	    # .summary files contained under /apr/reports/.
-            folder_path = "../apr/" + FOLDER_READ_PATH + top_design + ".innovus" + "/"
-            file_name = stage + ".summary"
-            file_path = folder_path + file_name
-
-            report = cp.read_gz_file(file_path)
-
-	    if report:
-		    # Parse report contents
-		    report_contents = cp.parse_report(report)
-
-		    # Organize data for viewability.
-		    stage_summary = cp.organize_data(report_contents)
-		    stage_summary.insert(0, stage)
-		    stages_data.append(stage_summary)
-	# Check if any data was actually collected.
-	# If not, don't write to the files. 
-	if stages_data:
-		# Add titles to columns before getting data.
-		stages_data.insert(0, cp.SUMMARY_COLUMNS)
-
-		# Write results to CSV file and text file.
-		cp.write_data_to_csv(top_design, stages_data)
-		cp.write_data_to_text(top_design, stages_data)
-
-	slack_list = []		# Contains worst failing times for one stage.
-	slack_times = []	# Contains worst failing times for APR flow. 
-	# This for loop processes .max.full_clock files.
-	for stage in cp.STAGES_full_clock:	# Iterate through stages of cadence APR flow.
-
-            # Create file path and read file.
-            folder_path = "../apr/" + FOLDER_READ_PATH
-            file_name = top_design + "." + stage + "2" + ".timing" + ".max.full_clock" + ".rpt"
-            file_path = folder_path + file_name
-
-	    # Read the file and store it in a variable.
-            report = cp.read_gz_file(file_path)
-	    # parse the file and extract all the necessary information.    
-	    slack_list = cp.parse_clock_path_report(report, stage)
-	    if slack_list != []:
-		for item in slack_list:
-			slack_times.append(item)
-	    
-	# Print out the worst slack times found to a .txt file.
-	cp.write_full_clock_data_txt(top_design, slack_times)
+
+        parse_cadence_design(top_design, get_folders())
+
+    if metrics_log:
+        records = parse_metrics.drain()
+        parse_metrics.print_totals(records)
+        parse_metrics.write_log(metrics_log, records)
+
+
+def batch_main(argv):
+    """
+    Non-interactive entry point. Parses the command line
+    and runs the batch mode.
+
+    input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="ASIC tool report parser, batch mode.")
+    parser.add_argument("--tool", required=True, choices=ASIC_TOOLS,
+                        help="tool that generated the reports")
+    parser.add_argument("--design", nargs="+", required=True,
+                        help="design names to parse")
+    parser.add_argument("--run-dir", nargs="+", default=None,
+                        help="run directories containing syn/ and apr/")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="worker processes (default: number of cores)")
+    parser.add_argument("--output-dir", default=FOLDER_WRITE_PATH,
+                        help="folder the outputs are written to")
+    parser.add_argument("--stage-threads", type=int, default=1,
+                        help="threads reading and parsing the stages of a design")
+    parser.add_argument("--stage-processes", type=int, default=0,
+                        help="processes parsing the stages of a design (overrides threads)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse parsed reports stored in this folder")
+    parser.add_argument("--cache-hash", action="store_true",
+                        help="compare report contents when size or mtime changed")
+    parser.add_argument("--cache-max-mb", type=float, default=parse_cache.CACHE_MAX_BYTES / 1e6,
+                        help="size limit of the cache folder")
+    parser.add_argument("--db", default=None,
+                        help="add the parsed QoR of each run to this SQLite database")
+    parser.add_argument("--export", default=None, choices=qor_export.EXPORT_FORMATS,
+                        help="also write the parsed tables as typed columnar files")
+    parser.add_argument("--path-index", action="store_true",
+                        help="index the timing paths of full_clock reports for path_index.py")
+    parser.add_argument("--metrics-log", default=None,
+                        help="save the read, parse and write times of every file to this "
+                             "JSON (or .csv) log")
+    parser.add_argument("--profile", default=None, choices=parse_metrics.PROFILE_KINDS + ["all"],
+                        help="profile the parses of this kind of report; the designs and "
+                             "stages are then parsed one at a time in this process")
+    parser.add_argument("--profile-mode", default="cpu", choices=parse_metrics.PROFILE_MODES,
+                        help="cProfile (cpu) or tracemalloc (memory)")
+    parser.add_argument("--profile-out", default=None,
+                        help="save the profile to this file")
+    args = parser.parse_args(argv)
+    if args.export and args.export not in qor_export.available_formats():
+        parser.error("--export {0} needs {1}, which is not installed.".format(
+            args.export, "numpy" if args.export == "npz" else "pyarrow"))
+
+    cache = None
+    if args.cache_dir:
+        cache = {"cache_dir": args.cache_dir,
+                 "verify_hash": args.cache_hash,
+                 "max_bytes": int(args.cache_max_mb * 1e6)}
+
+    write_path = os.path.join(args.output_dir, "")
+    jobs, threads, processes = args.jobs, args.stage_threads, args.stage_processes
+    if args.metrics_log:
+        parse_metrics.enable()
+    if args.profile:
+        # cProfile follows one thread, and tracemalloc one process.
+        parse_metrics.start_profile(args.profile, args.profile_mode)
+        jobs, threads, processes = 0, 1, 0
+
+    num_failed = run_batch(args.tool, args.design, args.run_dir, jobs, write_path,
+                           threads, processes, cache, args.db, args.export, args.path_index)
+    if args.profile:
+        parse_metrics.finish_profile(args.profile_out)
+    if args.metrics_log:
+        records = parse_metrics.drain()
+        parse_metrics.print_totals(records)
+        parse_metrics.write_log(args.metrics_log, records)
+    return num_failed
+
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(1 if batch_main(sys.argv[1:]) else 0)
     main()
@@ -0,0 +1,277 @@
+"""
+    Description:
+        Watch mode of the report parser. Polls the /syn and /apr
+        report folders while the flow is running and parses each
+        report as soon as it is complete, i.e. once its size and
+        modification time stayed the same for one poll interval.
+
+        Parsed stages are kept in memory, so earlier stages are
+        never parsed again. When a new stage comes after every stage
+        already written, its rows are appended to the CSV and text
+        outputs; otherwise the outputs are rewritten from memory.
+
+        The inotify_simple module is used to wake up on file system
+        events when it is installed. Without it the folders are
+        polled every interval.
+
+        Usage:
+            python report_watcher.py --tool cadence --design blk
+"""
+import argparse
+import os
+import sys
+import time
+from functools import partial
+
+import cadence_parser as cp
+import report_io
+import report_parser as rp
+import synopsys_parser as sp
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+POLL_INTERVAL = 2.0     # Seconds between two scans of the report folders.
+
+
+def synopsys_watch_list(top_design, folders):
+    """
+        Function listing the reports watched for a Synopsys flow.
+
+        input: top_design: string containing design name.
+        input: folders: dict from report_parser.get_folders().
+        output: list of (key, file_path, function). key is
+            (output name, stage), file_path the report path without
+            compression extension and function parses the report.
+    """
+    watch_list = []
+    for stage in rp.DC_STAGES:
+        to_open = top_design + "." + stage + ".qor.rpt"
+        watch_list.append((("qor", "syn_" + stage), folders["syn"] + to_open,
+                           partial(rp.read_syn_qor, to_open, stage, folders)))
+    for stage in sp.APR_STAGES:
+        to_open = top_design + "." + stage + ".qor.rpt"
+        watch_list.append((("qor", stage), folders["apr"] + to_open,
+                           partial(rp.read_apr_qor, to_open, stage, folders)))
+        to_open = top_design + "." + stage + ".clock_qor.rpt"
+        watch_list.append((("clock_qor", stage), folders["apr"] + to_open,
+                           partial(rp.read_apr_clock_qor, to_open, stage, folders)))
+    return watch_list
+
+
+def cadence_watch_list(top_design, folders):
+    """
+        Function listing the reports watched for a Cadence flow.
+
+        input: top_design: string containing design name.
+        input: folders: dict from report_parser.get_folders().
+        output: list of (key, file_path, function), see
+            synopsys_watch_list().
+    """
+    watch_list = []
+    for stage in cp.STAGES:
+        file_path = folders["apr"] + top_design + ".innovus" + "/" + stage + ".summary"
+        watch_list.append((("summary", stage), file_path,
+                           partial(rp.read_summary, file_path, stage)))
+    for stage in cp.STAGES_full_clock:
+        file_path = folders["apr"] + top_design + "." + stage + "2" + ".timing" \
+            + ".max.full_clock" + ".rpt"
+        watch_list.append((("full_clock", stage), file_path,
+                           partial(rp.read_full_clock, file_path, stage)))
+    return watch_list
+
+
+def write_output(name, top_design, data, folders, mode):
+    """
+        Function calling the writers of one output.
+
+        input: name: output name.
+        input: top_design: string containing design name.
+        input: data: list of StageTable, in flow order.
+        input: folders: dict from report_parser.get_folders().
+        input: mode: 'w' to rewrite the outputs, 'a' to append.
+    """
+    if name in ("qor", "clock_qor"):
+        sp.write_qor_to_csv(top_design, data, name, folders["write"], mode)
+        sp.write_data_to_text(top_design, data, name, folders["write"], mode)
+    elif name == "summary":
+        cp.write_data_to_csv(top_design, data, folders["write"], mode)
+        cp.write_data_to_text(top_design, data, folders["write"], mode)
+    else:
+        cp.write_full_clock_data_txt(top_design, data, folders["write"], mode)
+
+
+def update_output(name, key, watch_list, results, written, top_design, folders):
+    """
+        Function updating an output after the stage key was parsed.
+
+        input: name: output name.
+        input: key: (name, stage) of the stage that was parsed.
+        input: watch_list: list from synopsys_watch_list() or
+            cadence_watch_list(), in flow order.
+        input: results: dict of parsed data per key.
+        input: written: dict of the keys already written per output.
+            Updated by this function.
+        input: top_design: string containing design name.
+        input: folders: dict from report_parser.get_folders().
+    """
+    order = [item[0] for item in watch_list if item[0][0] == name]
+    present = [k for k in order if results.get(k) is not None]
+    done = written.setdefault(name, [])
+    if not present:
+        return
+
+    if done and key not in done and order.index(key) > order.index(done[-1]):
+        # New stage after everything in the file: append it.
+        write_output(name, top_design, [results[key]], folders, 'a')
+    else:
+        write_output(name, top_design, [results[k] for k in present], folders, 'w')
+    written[name] = present
+
+
+def wait_for_change(watcher, interval):
+    """
+        Function waiting until the next scan of the folders.
+
+        input: watcher: inotify_simple.INotify, or None to sleep.
+        input: interval: seconds to wait at most.
+    """
+    if watcher is None:
+        time.sleep(interval)
+        return
+    watcher.read(timeout=int(interval * 1000))
+
+
+def create_watcher(folders_to_watch):
+    """
+        Function creating an inotify watcher on the report
+        folders when inotify_simple is available.
+
+        input: folders_to_watch: list of folders.
+        output: inotify_simple.INotify, or None.
+    """
+    if inotify_simple is None:
+        return None
+    flags = inotify_simple.flags
+    watcher = inotify_simple.INotify()
+    for folder in folders_to_watch:
+        if os.path.isdir(folder):
+            watcher.add_watch(folder, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+    return watcher
+
+
+def scan_sizes(folders_to_watch):
+    """
+        Function reading size and modification time of every
+        file in the report folders with one os.scandir per folder.
+
+        input: folders_to_watch: list of folders.
+        output: dict of (size, mtime) per normalized file path.
+    """
+    sizes = {}
+    for folder in folders_to_watch:
+        try:
+            items = list(os.scandir(folder))
+        except OSError:
+            continue
+        for item in items:
+            if item.is_file():
+                stat = item.stat()
+                sizes[os.path.normpath(item.path)] = (stat.st_size, stat.st_mtime)
+    return sizes
+
+
+def report_state(sizes, file_path):
+    """
+        Function finding a report in a scan of the folders. The
+        report may have any of the compression extensions.
+
+        input: sizes: dict from scan_sizes().
+        input: file_path: path of the report, without compression extension.
+        output: (path, (size, mtime)) of the report, (None, None) if
+            it was not found.
+    """
+    for candidate in report_io.report_paths(file_path):
+        candidate = os.path.normpath(candidate)
+        if candidate in sizes:
+            return candidate, sizes[candidate]
+    return None, None
+
+
+def watch(tool_option, top_design, folders, interval=POLL_INTERVAL, once=False):
+    """
+        Function watching the report folders of a design and
+        updating its outputs as stages complete.
+
+        input: tool_option: one of report_parser.ASIC_TOOLS.
+        input: top_design: string containing design name.
+        input: folders: dict from report_parser.get_folders().
+        input: interval: seconds between two scans.
+        input: once: parse the complete reports once and return.
+    """
+    if tool_option == rp.ASIC_TOOLS[0]:
+        watch_list = synopsys_watch_list(top_design, folders)
+    else:
+        watch_list = cadence_watch_list(top_design, folders)
+    if not os.path.isdir(folders["write"]):
+        os.makedirs(folders["write"])
+
+    folders_to_watch = sorted(set(os.path.dirname(item[1]) for item in watch_list))
+    watcher = create_watcher(folders_to_watch)
+
+    results = {}        # Parsed data per key.
+    parsed = {}         # (size, mtime) of each report when it was parsed.
+    written = {}        # Keys written to each output.
+    previous = {}
+    print("Watching {0} for design {1}.".format(", ".join(folders_to_watch), top_design))
+    while True:
+        sizes = scan_sizes(folders_to_watch)
+        for key, report_path, function in watch_list:
+            file_path, current = report_state(sizes, report_path)
+            if current is None or parsed.get(file_path) == current:
+                continue
+            # Only parse reports that stopped growing since the last scan.
+            if not once and previous.get(file_path) != current:
+                continue
+            results[key], _ = rp.cached_parse(folders, file_path, ":".join(key), function)
+            parsed[file_path] = current
+            print("Parsed {0} report of stage {1}.".format(key[0], key[1]))
+            update_output(key[0], key, watch_list, results, written, top_design, folders)
+        if once:
+            return results
+        previous = sizes
+        wait_for_change(watcher, interval)
+
+
+def main(argv):
+    """
+        Command line entry point of the watch mode.
+
+        input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Parse reports as the flow writes them.")
+    parser.add_argument("--tool", required=True, choices=rp.ASIC_TOOLS,
+                        help="tool that generates the reports")
+    parser.add_argument("--design", required=True, help="design name to watch")
+    parser.add_argument("--run-dir", default=None,
+                        help="run directory containing syn/ and apr/")
+    parser.add_argument("--output-dir", default=rp.FOLDER_WRITE_PATH,
+                        help="folder the outputs are written to")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL,
+                        help="seconds between two scans of the report folders")
+    parser.add_argument("--once", action="store_true",
+                        help="parse the reports present now and exit")
+    args = parser.parse_args(argv)
+
+    folders = rp.get_folders(args.run_dir, os.path.join(args.output_dir, ""))
+    try:
+        watch(args.tool, args.design, folders, args.interval, args.once)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
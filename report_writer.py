@@ -0,0 +1,139 @@
+"""
+    Description:
+        Writer layer shared by the parsers. Output rows come from
+        generators and are written in large buffered chunks, so no
+        output is built in memory first. A new file is written next
+        to its final path and renamed once complete, so a reader
+        never sees a partial output; appended files are written in
+        place.
+
+        Text rows are left aligned in columns of a fixed width, or of
+        the widths computed from the rows with column_widths().
+"""
+import contextlib
+import csv
+import itertools
+import os
+import tempfile
+
+import parse_metrics
+
+WRITE_BUFFER_SIZE = 1024 * 1024     # Size of the writes done on outputs.
+ROWS_PER_CHUNK = 4096               # Text rows joined per write() call.
+
+# Permissions of the outputs: mkstemp() creates private files.
+UMASK = os.umask(0)
+os.umask(UMASK)
+OUTPUT_MODE = 0o666 & ~UMASK
+
+
+@contextlib.contextmanager
+def open_output(file_path, mode='w'):
+    """
+        Function opening an output for buffered writes. A file opened
+        with mode 'w' is written to a temporary file of a unique name
+        in the same folder, renamed to file_path when the block ends
+        and removed if it fails.
+
+        input: file_path: path of the output.
+        input: mode: 'w' to overwrite the file, 'a' to append to it.
+        output: yields the text file object.
+    """
+    with parse_metrics.output_timer(file_path):
+        if mode != 'w':
+            with open(file_path, mode, buffering=WRITE_BUFFER_SIZE) as fp:
+                yield fp
+            return
+
+        folder, name = os.path.split(file_path)
+        fd, tmp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=folder or ".")
+        try:
+            os.chmod(tmp_path, OUTPUT_MODE)
+            with os.fdopen(fd, 'w', buffering=WRITE_BUFFER_SIZE) as fp:
+                yield fp
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def write_csv(file_path, rows, mode='w'):
+    """
+        Function writing rows to a CSV file.
+
+        input: file_path: path of the file.
+        input: rows: iterable of rows, each a list of strings.
+        input: mode: 'w' to overwrite the file, 'a' to append to it.
+    """
+    with open_output(file_path, mode) as fp:
+        csv.writer(fp).writerows(rows)
+
+
+def column_widths(rows, min_width=0, padding=2):
+    """
+        Function computing the width of each column of text rows.
+
+        input: rows: iterable of rows, each a list of strings.
+        input: min_width: smallest width of a column.
+        input: padding: spaces added after the longest value.
+        output: list of widths, one per column of the longest row.
+    """
+    widths = []
+    for row in rows:
+        for i, val in enumerate(row):
+            if i == len(widths):
+                widths.append(min_width)
+            if len(val) + padding > widths[i]:
+                widths[i] = len(val) + padding
+    return widths
+
+
+def aligned_lines(rows, width, widths=None):
+    """
+        Generator of the lines of text rows.
+
+        input: rows: iterable of rows, each a list of strings.
+        input: width: width of every column.
+        input: widths: list of widths per column, used instead of
+            width for the columns it covers.
+        output: yields each line, newline included.
+    """
+    if widths is None:
+        for row in rows:
+            yield "".join([val.ljust(width) for val in row]) + "\n"
+        return
+    for row in rows:
+        yield "".join([val.ljust(widths[i] if i < len(widths) else width)
+                       for i, val in enumerate(row)]) + "\n"
+
+
+def write_text(file_path, rows, width, mode='w', widths=None):
+    """
+        Function writing rows to a text file in aligned columns.
+
+        input: file_path: path of the file.
+        input: rows: iterable of rows, each a list of strings.
+        input: width: width of every column.
+        input: mode: 'w' to overwrite the file, 'a' to append to it.
+        input: widths: widths per column from column_widths(), or None.
+    """
+    lines = aligned_lines(rows, width, widths)
+    with open_output(file_path, mode) as fp:
+        while True:
+            chunk = "".join(itertools.islice(lines, ROWS_PER_CHUNK))
+            if not chunk:
+                break
+            fp.write(chunk)
+
+
+def write_lines(file_path, lines, mode='w'):
+    """
+        Function writing lines of text to a file.
+
+        input: file_path: path of the file.
+        input: lines: iterable of strings, newline included.
+        input: mode: 'w' to overwrite the file, 'a' to append to it.
+    """
+    with open_output(file_path, mode) as fp:
+        fp.writelines(lines)
@@ -4,17 +4,23 @@
     Description:
         This script parses a QOR report and creates a comma seperated
         list with values to be loaded into an excel spreadsheet.
-	This file is for parsing report outputs from DC and ICC2;
-	the synopsys applications. 
-	Current parsing abilities:
-		1.) All qor files under /apr and /syn.
-		2.) All clock_qor files under /apr.
+        This file is for parsing report outputs from DC and ICC2;
+        the synopsys applications. 
+        Current parsing abilities:
+                1.) All qor files under /apr and /syn.
+                2.) All clock_qor files under /apr.
 """
 
-import pandas as pd
 import os
-import csv
+import mmap
+import re
 import time
+from collections import namedtuple
+
+import qor_export
+import report_io
+import report_writer
+from qor_records import StageTable
 
 FOLDER_READ_PATH = "reports/"       # Location of reports to be parsed.
 FOLDER_READ_PATH_SYN = "../syn/reports/" # Location of reports from synthesis.
@@ -32,16 +38,65 @@ TOTAL_NEG_SLACK_STR = 'Total Negative Slack:'
 WNS_STR = 'Critical Path Slack:'
 NUM_VIO_PTH_STR = 'No. of Violating Paths'
 
+# Metrics of one timing path group in a .qor report, as found by
+# scan_qor_report(). Values are the strings from the report; they
+# are converted when stored in a StageTable.
+QorRecord = namedtuple('QorRecord', ['scenario', 'path_group', 'wns', 'tns',
+                                     'num_vio_paths', 'worst_hold',
+                                     'total_hold', 'num_hold_vio'])
+
+# Report label for each metric field of QorRecord.
+QOR_FIELD_LABELS = {'wns': WNS_STR,
+                    'tns': TOTAL_NEG_SLACK_STR,
+                    'num_vio_paths': NUM_VIO_PTH_STR,
+                    'worst_hold': HOLD_VIOLATION_STR,
+                    'total_hold': TOTAL_HOLD_VIOLATION_STR,
+                    'num_hold_vio': NUM_HOLD_VIO_STR}
+QOR_LINE_FIELDS = dict((label, field) for field, label in QOR_FIELD_LABELS.items())
+
+# One compiled pattern for every line the .qor parsers extract.
+# Group 1 is the label and group 2 the first token after it.
+QOR_LINE_RE = re.compile(r"(Scenario\b|Timing Path Group|"
+                         + "|".join(re.escape(label) for label in QOR_FIELD_LABELS.values())
+                         + r")\s*:?\s*(\S+)")
+
+# Anchors of the lines extracted from a memory mapped .qor report.
+# Any line holding one of them is decoded, the rest stays as bytes.
+QOR_ANCHOR_RE = re.compile(br"Scenario\b|Timing Path Group|"
+                           + b"|".join(re.escape(label.encode('ascii'))
+                                       for label in QOR_FIELD_LABELS.values()))
+
+# Metrics reported for each scenario of the APR flow, in table order.
+SETUP_FIELDS = ['wns', 'tns', 'num_vio_paths']
+HOLD_FIELDS = ['worst_hold', 'total_hold', 'num_hold_vio']
+APR_SCENARIO_FIELDS = [('func_slow', SETUP_FIELDS + HOLD_FIELDS),
+                       ('func_worst', SETUP_FIELDS),
+                       ('func_best', HOLD_FIELDS),
+                       ('test_worst', SETUP_FIELDS),
+                       ('test_best', HOLD_FIELDS)]
+
 # Variable for different stages in the ASIC APR design flow.
 APR_STAGES = ['place2', 'cts2', 'postcts2', 'route2']
 
+# Corner of a "Summary Reporting for Corner ss_0p72v" line.
+CORNER_RE = re.compile(r"Corner\s+(\S+)")
+
+# Mode and scenario of a "### Mode: func, Scenario: func_slow" line.
+MODE_SCENARIO_RE = re.compile(r"Mode:\s*([^,\s]+).*?Scenario:\s*(\S+)")
+
+# Bytes of a memory mapped report searched before its pages are released.
+MAP_WINDOW_SIZE = 16 * 1024 * 1024
+
+# Anchors of the lines extracted from a memory mapped .clock_qor report.
+CLOCK_QOR_ANCHOR_RE = re.compile(b"Summary Reporting for Corner|###|CLK|clk|All Clocks")
+
 # Labels used for columns of clock_qor report.
 COLUMN_LABELS_CLOCK_QOR = ['Sinks', 'Levels', 'Clock Repeater Count',
                            'Clock Repeater Area', 'Clock Stdcell Area',
                            'Max Latency', 'Global Skew',
                            'Trans DRC Count', 'Cap DRC Count']
 
-def format_qor_data_apr(qor_report, stage):
+def format_qor_data_apr(qor_table):
     """
     Function to make the data easier to read 
     for CSV/text format.
@@ -49,86 +104,37 @@ def format_qor_data_apr(qor_report, stage):
     This function is meant to format .qor files 
     that were gathered from /apr/reports folder.
 
-    input: qor_report: list containing items to be organized.
-    input: stage: string of current stage being processed.
+    input: qor_table: StageTable from get_qor_data().
+    output: list of rows, each a list of strings.
     """
-    func_slow = []
-    func_worst = []
-    func_best = []
-
     # For each scenario, add the labels for the data that will be appended in the structure. 
-    func_slow.append(["func_slow"])
-    func_slow.append(["Clock Path", WNS_STR, TOTAL_NEG_SLACK_STR, NUM_VIO_PTH_STR, HOLD_VIOLATION_STR, TOTAL_HOLD_VIOLATION_STR, NUM_HOLD_VIO_STR])
-
-    func_worst.append(["func_worst"])
-    func_worst.append(["Clock Path", WNS_STR, TOTAL_NEG_SLACK_STR, NUM_VIO_PTH_STR])
-
-    func_best.append(["func_best"])
-    func_best.append(["Clock Path", HOLD_VIOLATION_STR, TOTAL_HOLD_VIOLATION_STR, NUM_HOLD_VIO_STR])
-
-    test_worst = []
-    test_best = []
-
-    # For each scenario, add the labels for the data that will be appended in the structure. 
-    test_worst.append(["test_worst"])
-    test_worst.append(["Clock Path", WNS_STR, TOTAL_NEG_SLACK_STR, NUM_VIO_PTH_STR])
-
-    test_best.append(["test_best"])
-    test_best.append(["Clock Path", HOLD_VIOLATION_STR, TOTAL_HOLD_VIOLATION_STR, NUM_HOLD_VIO_STR])
+    tables = []
+    for scenario, fields in APR_SCENARIO_FIELDS:
+        labels = ["Clock Path"] + [QOR_FIELD_LABELS[field] for field in fields]
+        columns = [qor_table.names.index(field) for field in fields]
+        tables.append((scenario, columns, [[scenario], labels]))
 
     # The below for loop adds the relevant data to each of the data structures.
     # The data appended is essentially the values for each of the labels that were added above
     # for each clock of each scenario. 
-    i = 0
-    for line in qor_report:
-        rtn = line.find("Scenario")
-        if rtn != -1:
-            rtn = line.find('func_slow')
-            if rtn != -1:
-                func_slow.append([qor_report[i+1].split()[3], qor_report[i+2].split()[3], qor_report[i+3].split()[3], qor_report[i+4].split()[4],
-                                   qor_report[i+2].split()[3], qor_report[i+3].split()[3], qor_report[i+4].split()[4]])
-            rtn = line.find('func_worst')
-            if rtn != -1:
-                func_worst.append([qor_report[i+1].split()[3], qor_report[i+2].split()[3], qor_report[i+3].split()[3], qor_report[i+4].split()[4]])
-            rtn = line.find('func_best')
-            if rtn != -1:
-                func_best.append([qor_report[i+1].split()[3], qor_report[i+2].split()[3], qor_report[i+3].split()[3], qor_report[i+4].split()[4]])
-            rtn = line.find('test_worst')
-            if rtn != -1:
-                test_worst.append([qor_report[i+1].split()[3], qor_report[i+2].split()[3], qor_report[i+3].split()[3], qor_report[i+4].split()[4]])
-            rtn = line.find('test_best')
-            if rtn != -1:
-                test_best.append([qor_report[i+1].split()[3], qor_report[i+2].split()[3], qor_report[i+3].split()[3], qor_report[i+4].split()[4]])
-        i += 1
-
-    # Add stage variable to top of list.
+    scenario_column = qor_table.names.index('scenario')
+    group_column = qor_table.names.index('path_group')
+    for row in qor_table.text_rows():
+        for scenario, columns, table in tables:
+            if scenario in row[scenario_column]:
+                table.append([row[group_column]] + [row[column] for column in columns])
+
+    # Not all scenarios may be present in the report. Only append the
+    # scenarios that have at least one row below their labels.
     qor_report = []
-    qor_report.append(["STAGE:", stage])
-    # Not all scenarios may be present in the report. Don't append all scenario variables 
-    # if they aren't present in the report.
-    # TODO: simplify this by removing the magic number.
-    minimum_rows = 3
-    if len(func_slow) > minimum_rows:
-        for row in func_slow:
-            qor_report.append(row)
-    if len(func_worst) > minimum_rows:
-        for row in func_worst:
-            qor_report.append(row)
-    if len(func_best) > minimum_rows:
-        for row in func_best:
-            qor_report.append(row)
-    if len(test_worst) > minimum_rows:
-        for row in test_worst:
-            qor_report.append(row)
-    if len(test_best) > minimum_rows:
-        for row in test_best:
-            qor_report.append(row)
-
+    for scenario, columns, table in tables:
+        if len(table) > 2:
+            qor_report.extend(table)
 
     return qor_report
 
 
-def format_qor_data_syn(qor_report, stage):
+def format_qor_data_syn(qor_table):
     """
     Function to make the data easier to read 
     for CSV/text format.
@@ -136,257 +142,327 @@ def format_qor_data_syn(qor_report, stage):
     This function formats the qor files from 
     /syn/reports.
 
-    input: qor_report: list containing items to be organized.
-    input: stage: string of current stage being processed.
-
+    input: qor_table: StageTable from get_qor_data().
+    output: list of rows, each a list of strings.
     """
-    qor_report_temp = []
+    qor_report = []
     
     # Adding the labels to the data that will be appended below.
-    qor_report_temp.append(["Timing Path Group", WNS_STR, TOTAL_NEG_SLACK_STR,
-                            NUM_VIO_PTH_STR, HOLD_VIOLATION_STR, TOTAL_HOLD_VIOLATION_STR,
-                            NUM_HOLD_VIO_STR])
+    qor_report.append(["Timing Path Group", WNS_STR, TOTAL_NEG_SLACK_STR,
+                       NUM_VIO_PTH_STR, HOLD_VIOLATION_STR, TOTAL_HOLD_VIOLATION_STR,
+                       NUM_HOLD_VIO_STR])
+
+    # One row per timing path group.
+    for row in qor_table.text_rows():
+        qor_report.append(row[1:])
 
-    # Search the file and add all the relevant data to the labels.
-    report_row = []
-    for line in qor_report:
-        line = line.strip("'")
-        rtn = line.find("Timing Path Group")
-        if rtn != -1:
-            report_row = []
-            report_row.append(line.split()[3])
-        rtn = line.find(WNS_STR)
-        if rtn != -1:
-            report_row.append(line.split()[3])
-        rtn = line.find(TOTAL_NEG_SLACK_STR)
-        if rtn != -1:
-            report_row.append(line.split()[3])
-        rtn = line.find(NUM_VIO_PTH_STR)
-        if rtn != -1:
-            report_row.append(line.split()[4])
-        rtn = line.find(HOLD_VIOLATION_STR)
-        if rtn != -1:
-            report_row.append(line.split()[3])
-        rtn = line.find(TOTAL_HOLD_VIOLATION_STR)
-        if rtn != -1:
-            report_row.append(line.split()[3])
-        rtn = line.find(NUM_HOLD_VIO_STR)
-        if rtn != -1:
-            report_row.append(line.split()[4])
-            report_row = pd.DataFrame(report_row)
-	    # Transpose for readability.
-            report_row = report_row.transpose()
-            report_row = report_row.values.tolist()
-            qor_report_temp.append(report_row)
-
-    qor_report = qor_report_temp
-    
     return qor_report
 
 
-def get_qor_data(qor_report):
+def format_clock_qor(clock_table):
+    """
+    Function to make the clock_qor data easier to read
+    for CSV/text format.
+
+    input: clock_table: StageTable from parse_clock_qor().
+    output: list of rows, each a list of strings.
+    """
+    clock_qor = []
+    corner = None
+    scenario = None
+    for row in clock_table.text_rows():
+        # Append the corner line of the report and the lables for the clock paths.
+        if row[:4] != corner:
+            corner = row[:4]
+            scenario = None
+            clock_qor.append([row[3]])
+            clock_qor.append(["Clock Group", "Attrs"] + COLUMN_LABELS_CLOCK_QOR)
+        # Append the mode and scenario line of the report, if any.
+        if row[4] != scenario:
+            scenario = row[4]
+            if scenario:
+                clock_qor.append([scenario])
+        # Append the clock path data.
+        clock_qor.append(row[5:])
+
+    return clock_qor
+
+
+def get_qor_data(qor_report, stage="", flow="apr"):
     """
         File to take a qor report file and grab important contents
 
-	Only works on qor files from /syn/reports.
+        Works on qor files from /apr/reports and /syn/reports.
 
         inputs: qor_report: .qor file that is a list of strings.
+        inputs: stage: stage of the report.
+        inputs: flow: "apr" or "syn".
+        output: StageTable with one record per scenario and path group.
+    """
+    qor_table = StageTable(flow, stage, 'qor')
+    for record in scan_qor_report(qor_report):
+        qor_table.append(record)
+
+    return qor_table
 
+
+def scan_qor_report(qor_report):
     """
-    i = 0
-    qor_report_temp = []
-    
+        Single pass scanner for .qor reports. Every line is matched
+        once against QOR_LINE_RE, and a QorRecord is emitted each
+        time a scenario/path group section is complete.
+
+        inputs: qor_report: iterable of lines from a .qor file.
+        output: yields QorRecord, in report order.
+    """
+    scenario = ""
+    fields = None   # Metrics of the path group being read.
+
     for line in qor_report:
-        # Search for the scenario label for the clock path.
-	rtn = line.find('Scenario')
-        if rtn != -1:
-	    # Append the scenario of the data. 
-            qor_report_temp.append(line)
-	    # Append the clock path.
-            qor_report_temp.append(qor_report[i+1])
-	    # Get the data associated with the scenario.
-            rtn = line.find('func_slow')
-            if rtn != -1:
-                for k in range(2,12):
-                    rtn = qor_report[i+k].find(WNS_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(TOTAL_NEG_SLACK_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(NUM_VIO_PTH_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(HOLD_VIOLATION_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(TOTAL_HOLD_VIOLATION_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(NUM_HOLD_VIO_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-	    # The scenarios below save less data. Maybe this could be improved at a later time when needed. 
-            rtn = line.find('func_worst')
-            if rtn != -1:
-                for k in range(2,12):
-                    rtn = qor_report[i+k].find(WNS_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(TOTAL_NEG_SLACK_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(NUM_VIO_PTH_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-            rtn = line.find('func_best')
-            if rtn != -1:
-                for k in range(2,12):
-                    rtn = qor_report[i+k].find(HOLD_VIOLATION_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(TOTAL_HOLD_VIOLATION_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(NUM_HOLD_VIO_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-            rtn = line.find('test_worst')
-            if rtn != -1:
-                for k in range(2,12):
-                    rtn = qor_report[i+k].find(WNS_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(TOTAL_NEG_SLACK_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(NUM_VIO_PTH_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-            rtn = line.find('test_best')
-            if rtn != -1:
-                for k in range(2,12):
-                    rtn = qor_report[i+k].find(HOLD_VIOLATION_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(TOTAL_HOLD_VIOLATION_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-                    rtn = qor_report[i+k].find(NUM_HOLD_VIO_STR)
-                    if rtn != -1:
-                        qor_report_temp.append(qor_report[i+k])
-
-
-
-        i += 1	# Keeps track of where we are in list. 
-
-    qor_report = qor_report_temp
-
-    return qor_report	
+        match = QOR_LINE_RE.search(line)
+        if match is None:
+            continue
+        key = match.group(1)
+        value = match.group(2)
+
+        if key == "Scenario":
+            if fields is not None:
+                yield QorRecord(**fields)
+                fields = None
+            scenario = value
+        elif key == "Timing Path Group":
+            if fields is not None:
+                yield QorRecord(**fields)
+            fields = dict.fromkeys(QorRecord._fields, "")
+            fields['scenario'] = scenario
+            fields['path_group'] = value
+        elif fields is not None:
+            fields[QOR_LINE_FIELDS[key]] = value
+
+    if fields is not None:
+        yield QorRecord(**fields)
 
 
 def parse_clock_qor(qor_report, stage):
     """
         Function to parse clock_qor file taken from 
-	/apr/folder.
+        /apr/folder. The report is read in one pass: a corner
+        section opens at its 'Summary Reporting for Corner' line
+        and closes at 'All Clocks', and the last '###' line of the
+        section sets the mode and scenario of the clocks after it.
+        Both lines are kept as they are to be written back.
 
         input: qor_report: list containing report.
         input: stage: current stage 
+        output: StageTable with one record per clock.
     """
-    i = 0
-    clock_qor = []
-    # Prepending data indicating which stage in APR flow.
-    clock_qor.append([['STAGE:', stage]])
+    clock_table = StageTable('apr', stage, 'clock_qor')
+    corner = None   # Corner of the open section, None between sections.
+    mode = ""
+    scenario = ""
+    header = ["", ""]   # Corner and scenario lines of the report.
     for line in qor_report:
-	# Searching for the specific corner.
-        rtn = line.find("Summary Reporting for Corner")
-        if rtn != -1:
-            k = 0
-	    # Append the corner being saved
-            clock_qor.append([[line]])
-	    # Append the lables for the clock paths.
-            clock_qor.append([['Clock Group', 'Attrs','Sinks','Levels','Clock Repeater Count',
-                    'Clock Repeater Area', 'Clock Stdcell Area', 'Max Latency',
-                    'Global Skew', 'Trans DRC Count', 'Cap DRC Count']])
-	    # Search until the string 'All Clocks' found.
-            while qor_report[i + k].find('All Clocks') == -1:
-		# Append the mode and scenario.
-                if qor_report[i + k].find('###') != -1:
-                    clock_qor.append([qor_report[i+k]])
-		# Append the clock path data. 
-                if qor_report[i + k].find('CLK') != -1:
-                    clock_qor.append([qor_report[i+k].split()])
-                if qor_report[i + k].find('clk') != -1:
-                    clock_qor.append([qor_report[i+k].split()])
-
-                k += 1	# used to select each line as while condition true.
-
-        i += 1
+        # A new corner also closes a truncated section.
+        if line.find("Summary Reporting for Corner") != -1:
+            match = CORNER_RE.search(line)
+            corner = match.group(1) if match is not None else ""
+            mode = ""
+            scenario = ""
+            header = [line.rstrip("\r\n"), ""]
+        elif corner is None:
+            continue
+        elif line.find('All Clocks') != -1:
+            corner = None
+        # Save the mode and scenario.
+        elif line.find('###') != -1:
+            match = MODE_SCENARIO_RE.search(line)
+            if match is not None:
+                mode, scenario = match.groups()
+            header[1] = line.rstrip("\r\n")
+        # Append the clock path data.
+        elif line.find('CLK') != -1 or line.find('clk') != -1:
+            append_clock_row(clock_table, corner, mode, scenario, header, line.split())
+
+    return clock_table
+
+
+def append_clock_row(clock_table, corner, mode, scenario, header, tokens):
+    """
+        Function adding one clock of a clock_qor report to a table.
+        Lines without a value for every column are skipped.
+
+        input: clock_table: StageTable of kind 'clock_qor'.
+        input: corner: corner of the summary table.
+        input: mode: mode of the clock.
+        input: scenario: scenario of the clock.
+        input: header: corner and scenario lines of the report.
+        input: tokens: split line of the clock. The Attrs column
+            may be empty.
+    """
+    if len(tokens) == len(COLUMN_LABELS_CLOCK_QOR) + 1:
+        tokens = [tokens[0], ""] + tokens[1:]
+    elif len(tokens) != len(COLUMN_LABELS_CLOCK_QOR) + 2:
+        return
+    clock_table.append([corner, mode, scenario] + header + tokens)
 
-    return clock_qor
 
+def report_rows(tables):
+    """
+        Generator of the output rows of a list of tables. Each
+        table starts with its flow and stage.
 
-def read_file_apr(file_name):
+        input: tables: list of StageTable of kind 'qor' or 'clock_qor'.
+        output: yields rows, each a list of strings.
+    """
+    for table in tables:
+        yield ["FLOW:", table.flow]
+        yield ["STAGE:", table.stage]
+        if table.kind == 'clock_qor':
+            rows = format_clock_qor(table)
+        elif table.flow == 'syn':
+            rows = format_qor_data_syn(table)
+        else:
+            rows = format_qor_data_apr(table)
+        for row in rows:
+            yield row
+
+
+def read_file_apr(file_name, folder_path=FOLDER_READ_PATH_APR):
     """
         Function to read file and return the whole file.
 
-        input: file_name - file name to read.
+        input: file_name - file name to read, without compression extension.
+        input: folder_path - folder containing the /apr reports.
         output: qor_report - file contents returned.
     """
-    file_path = FOLDER_READ_PATH_APR + file_name
-    try:
-        with open(file_path) as fp:
-            qor_report = fp.readlines()
-    except:
-        print("file {0} not found.".format(file_path))
+    file_path = report_io.find_report(folder_path + file_name)
+    if file_path is None:
+        print("file {0} not found.".format(folder_path + file_name))
         return ""
 
-    return qor_report
+    return report_io.read_lines(file_path)
 
 
-def read_file_syn(file_name):
+def read_file_syn(file_name, folder_path=FOLDER_READ_PATH_SYN):
     """
         Function to read file and return the whole file.
 
-        input: file_name - name of file to read.
+        input: file_name - name of file to read, without compression extension.
+        input: folder_path - folder containing the /syn reports.
         output: qor_report - file contents returned.
     """
-    file_path = FOLDER_READ_PATH_SYN + file_name
-    try:
-        with open(file_path) as fp:
-            qor_report = fp.readlines()
-    except:
-        print("file {0} not found.".format(file_path))
+    file_path = report_io.find_report(folder_path + file_name)
+    if file_path is None:
+        print("file {0} not found.".format(folder_path + file_name))
         return ""
 
-    return qor_report
+    return report_io.read_lines(file_path)
+
+
+def mapped_lines(mapped, anchor_re):
+    """
+        Generator of the lines of a memory mapped report that
+        hold an anchor. The report is searched in place and only
+        those lines are copied and decoded. It is searched one
+        window at a time and the pages of each searched window are
+        released, so the mapping does not stay resident.
+
+        input: mapped: mmap or bytes of the report.
+        input: anchor_re: compiled bytes pattern of the anchors.
+        output: yields each matching line once, newline included.
+    """
+    size = len(mapped)
+    line_end = -1
+    window_start = 0
+    while window_start < size:
+        # Windows end on a line boundary so no line is split.
+        window_end = mapped.find(b"\n", min(window_start + MAP_WINDOW_SIZE, size - 1))
+        window_end = size if window_end == -1 else window_end + 1
+        for match in anchor_re.finditer(mapped, window_start, window_end):
+            start = match.start()
+            if start <= line_end:
+                continue    # Another anchor of the line already yielded.
+            line_start = mapped.rfind(b"\n", 0, start) + 1
+            line_end = mapped.find(b"\n", start, window_end)
+            if line_end == -1:
+                line_end = window_end
+            yield mapped[line_start:line_end + 1].decode('utf-8', 'replace')
+        release_pages(mapped, window_start, window_end)
+        window_start = window_end
+
+
+def release_pages(mapped, start, end):
+    """
+        Function dropping the pages of a searched window of a
+        read-only mapping from the resident set. The pages stay in
+        the page cache and are mapped again if read later.
 
+        input: mapped: mmap of the report.
+        input: start: first byte of the window.
+        input: end: byte after the window.
+    """
+    if not hasattr(mapped, "madvise") or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    start -= start % mmap.PAGESIZE
+    end -= end % mmap.PAGESIZE
+    if end > start:
+        mapped.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+def read_file_mapped(file_name, folder_path, anchor_re):
+    """
+        Function to read the anchor lines of a report. Plain
+        reports are searched through a memory map instead of reading
+        every line; compressed reports are streamed and only their
+        anchor lines decoded.
+
+        input: file_name - name of file to read, without compression
+            extension.
+        input: folder_path - folder containing the report.
+        input: anchor_re - QOR_ANCHOR_RE or CLOCK_QOR_ANCHOR_RE.
+        output: qor_report - list of the anchor lines, "" if the
+            file was not found.
+    """
+    file_path = report_io.find_report(folder_path + file_name)
+    if file_path is None:
+        print("file {0} not found.".format(folder_path + file_name))
+        return ""
+
+    if report_io.detect_codec(file_path) is not None:
+        with report_io.open_binary(file_path) as fp:
+            return [line.decode('utf-8', 'replace') for line in fp if anchor_re.search(line)]
+
+    with open(file_path, 'rb') as fp:
+        # Empty files cannot be mapped.
+        if os.fstat(fp.fileno()).st_size == 0:
+            return []
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return list(mapped_lines(mapped, anchor_re))
+        finally:
+            mapped.close()
 
-def write_qor_to_csv(top_design, reports, file_type):
+
+def write_qor_to_csv(top_design, tables, file_type, folder_path=FOLDER_WRITE_PATH,
+                     mode='w'):
     """
         Function to write results from all
         stages to a CSV file.
 
         input: top_design: string containing design name.
-        input: reports: list containing data to be printed.
+        input: tables: list of StageTable to be printed.
         input: file_type: type of report being parsed.
-        input: syn_or_apr: string either containing "apr" or "syn" for 
-            the /apr and /syn reports folders.
+        input: folder_path: folder the CSV file is written to.
+        input: mode: 'w' to overwrite the file, 'a' to append to it.
     """
-    file_path = FOLDER_WRITE_PATH + top_design + '_' + file_type  \
+    file_path = folder_path + top_design + '_' + file_type  \
         + '_reports_parsed.csv'
-    with open(file_path, 'w') as csvfile:
-        qor_writer = csv.writer(csvfile)
-        for report in reports:
-            for row in report:
-                if type(row[0]) is list:
-                    qor_writer.writerow(row[0])
-                elif row is not None:
-                    qor_writer.writerow(row)
+    report_writer.write_csv(file_path, report_rows(tables), mode)
     print("CSV file generated at path: " + file_path)
 
 
-def write_data_to_text(top_design, reports, file_type):
+def write_data_to_text(top_design, tables, file_type, folder_path=FOLDER_WRITE_PATH,
+                       mode='w', fit_columns=False):
     """
         Function that writes all the report 
         summaries to a text file.
@@ -394,24 +470,32 @@ def write_data_to_text(top_design, reports, file_type):
         https://stackoverflow.com/questions/16796709/align-columns-in-a-text-file
 
         input: top_design: string indicating design name.
-        input: reports: list of lists containing report data.
+        input: tables: list of StageTable containing report data.
         input: file_type: type of report being parsed.(clock_qor,qor,etc).
-        input: syn_or_apr: string either containing "apr" or "syn" for 
-            the /apr and /syn reports folders.
+        input: folder_path: folder the text file is written to.
+        input: mode: 'w' to overwrite the file, 'a' to append to it.
+        input: fit_columns: size the columns to their values instead
+            of ALIGN_LENGTH. The rows are generated twice.
     """
-    file_path = FOLDER_WRITE_PATH + top_design + '_' + file_type \
+    file_path = folder_path + top_design + '_' + file_type \
         + '_report_text.txt'
-    with open(file_path, 'w') as txtfile:
-        for stage in reports:
-            for row in stage:
-                if row is not None:
-                    for val in row:
-                        if type(val) is str:
-                            txtfile.write(val.ljust(ALIGN_LENGTH))
-                        elif type(val) is list:
-                            for element in val:
-                                txtfile.write(element.ljust(ALIGN_LENGTH))
-                        else:
-                            txtfile.write(" ".ljust(ALIGN_LENGTH))
-                    txtfile.write('\n')
+    widths = report_writer.column_widths(report_rows(tables)) if fit_columns else None
+    report_writer.write_text(file_path, report_rows(tables), ALIGN_LENGTH, mode, widths)
     print("text file generated at path: " + file_path)
+
+
+def write_qor_to_columnar(top_design, tables, file_type, folder_path=FOLDER_WRITE_PATH,
+                          fmt=None, run=""):
+    """
+        Function to write results from all stages to a typed
+        columnar file, see qor_export.
+
+        input: top_design: string containing design name.
+        input: tables: list of StageTable of one kind.
+        input: file_type: type of report being parsed.
+        input: folder_path: folder the file is written to.
+        input: fmt: export format, None for the first available one.
+        input: run: name of the run the reports belong to.
+    """
+    file_stem = folder_path + top_design + '_' + file_type + '_reports_parsed'
+    return qor_export.write_tables(file_stem, tables, top_design, run, fmt)
@@ -0,0 +1,583 @@
+"""
+    Description:
+        Work queue on a shared filesystem, for parsing a sweep of
+        runs on many hosts that only share NFS. A coordinator writes
+        one task per design and run directory; any number of workers
+        on any host claim tasks, parse them with report_parser and
+        write the outputs and a partial result per task. The merge
+        step combines the partial results.
+
+        Layout of the queue folder:
+            queue.json              options of the queue (lease time).
+            tasks/<task>.json       task: tool, design, run_dir, outputs.
+            claims/<task>.lock      claim of a running task.
+            results/<task>.json     partial result of a finished task.
+            workers/<worker>        heartbeat of each worker.
+
+        A task is claimed by hard linking a file holding the worker
+        name to its lock; link() is atomic on NFS, unlike O_EXCL on
+        older clients. Tasks are created the same way, so submitters
+        sharing a queue never overwrite each other's tasks. The worker touches the lock while it parses.
+        A lock not touched for the lease time is stale: its worker
+        died, and the lock is broken so another worker claims the
+        task. Times are compared with the modification time of a
+        file just touched in the queue, so the clocks of the hosts
+        do not need to agree.
+
+        A result is written to a temporary file and renamed, so a
+        task is either done or not. A task parsed twice, after a
+        lease expired on a worker that was only slow, writes the same
+        outputs and result again.
+
+        Usage:
+            python work_queue.py submit --queue /nfs/q --tool synopsys --design blk \\
+                --run-dir sweep/run_* --output-dir /nfs/outputs
+            python work_queue.py work --queue /nfs/q        (on every host)
+            python work_queue.py status --queue /nfs/q
+            python work_queue.py merge --queue /nfs/q --csv blk_sweep.csv
+            python work_queue.py run --queue /tmp/q --workers 4 --tool synopsys \\
+                --design blk --run-dir sweep/run_*          (all on this machine)
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import parse_cache
+import qor_aggregate
+import report_parser as rp
+
+QUEUE_VERSION = 1       # Increment when the layout of the queue changes.
+LEASE_SECONDS = 300     # Time without heartbeat after which a claim is stale.
+POLL_SECONDS = 5        # Wait of an idle worker before looking for tasks again.
+HEARTBEATS_PER_LEASE = 4    # Touches of the lock per lease time.
+QUEUE_FOLDERS = ["tasks", "claims", "results", "workers"]
+
+
+def queue_path(queue_dir, folder, name=""):
+    """
+        Function returning a path in the queue folder.
+
+        input: queue_dir: queue folder.
+        input: folder: one of QUEUE_FOLDERS.
+        input: name: file name, or "" for the folder.
+    """
+    return os.path.join(queue_dir, folder, name)
+
+
+def write_json(file_path, data):
+    """
+        Function writing a JSON file atomically: it is written to a
+        temporary file renamed to file_path.
+
+        input: file_path: path of the file.
+        input: data: object to write.
+    """
+    tmp_path = "{0}.{1}.{2}.tmp".format(file_path, socket.gethostname(), os.getpid())
+    with open(tmp_path, 'w') as fp:
+        json.dump(data, fp, indent=1)
+    os.replace(tmp_path, file_path)
+
+
+def create_json(file_path, data):
+    """
+        Function creating a JSON file that does not exist yet: it is
+        written to a temporary file hard linked to file_path.
+
+        input: file_path: path of the file.
+        input: data: object to write.
+        output: True when the file was created, False when it exists.
+    """
+    folder, name = os.path.split(file_path)
+    tmp_path = os.path.join(folder, ".{0}.{1}.tmp".format(name, worker_name()))
+    with open(tmp_path, 'w') as fp:
+        json.dump(data, fp, indent=1)
+    try:
+        os.link(tmp_path, file_path)
+        created = True
+    except FileExistsError:
+        created = False
+    except OSError:
+        # NFS may fail a link() that was done; the link count tells.
+        created = os.stat(tmp_path).st_nlink == 2
+    finally:
+        os.remove(tmp_path)
+    return created
+
+
+def read_json(file_path):
+    """
+        Function reading a JSON file, None when it does not exist.
+
+        input: file_path: path of the file.
+    """
+    try:
+        with open(file_path) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+
+def worker_name():
+    """
+        Function returning the name of this worker, unique across
+        the hosts.
+    """
+    return "{0}.{1}".format(socket.gethostname(), os.getpid())
+
+
+def task_name(index, design, run_dir):
+    """
+        Function returning the name of a task.
+
+        input: index: position of the task in the queue.
+        input: design: design name.
+        input: run_dir: run directory, or None.
+    """
+    run_name = os.path.basename(os.path.normpath(run_dir)) if run_dir else "default"
+    return re.sub(r"[^\w.-]", "_", "{0:05d}_{1}_{2}".format(index, design, run_name))
+
+
+def submit(queue_dir, tool_option, designs, run_dirs, write_path=rp.FOLDER_WRITE_PATH,
+           cache=None, lease=LEASE_SECONDS):
+    """
+        Function adding one task per design and run directory to a
+        queue, creating the queue if needed.
+
+        input: queue_dir: queue folder.
+        input: tool_option: one of report_parser.ASIC_TOOLS.
+        input: designs: list of design names.
+        input: run_dirs: list of run directories, or None.
+        input: write_path: folder the outputs are written to.
+        input: cache: parse cache options, see report_parser.get_folders().
+        input: lease: seconds without heartbeat after which a claim is stale.
+        output: list of task names added.
+    """
+    for folder in QUEUE_FOLDERS:
+        if not os.path.isdir(queue_path(queue_dir, folder)):
+            os.makedirs(queue_path(queue_dir, folder))
+    options = read_json(os.path.join(queue_dir, "queue.json"))
+    if options is None:
+        write_json(os.path.join(queue_dir, "queue.json"),
+                   {"version": QUEUE_VERSION, "lease": lease, "created": time.time()})
+
+    index = len(list_tasks(queue_dir))
+    names = []
+    for run_dir in run_dirs or [None]:
+        for design in designs:
+            # Paths are made absolute so workers started elsewhere find them.
+            task = {"tool": tool_option, "design": design,
+                    "run_dir": os.path.abspath(run_dir) if run_dir else None,
+                    "write_path": os.path.join(os.path.abspath(write_path), ""),
+                    "cache": cache, "submitted": time.time()}
+            # Another submitter may take the same index: try the next one.
+            while True:
+                task["name"] = task_name(index, design, run_dir)
+                index += 1
+                if create_json(queue_path(queue_dir, "tasks", task["name"] + ".json"), task):
+                    break
+            names.append(task["name"])
+    return names
+
+
+def list_tasks(queue_dir):
+    """
+        Function listing the task names of a queue, in order.
+
+        input: queue_dir: queue folder.
+    """
+    return sorted(name[:-len(".json")] for name in os.listdir(queue_path(queue_dir, "tasks"))
+                  if name.endswith(".json"))
+
+
+def is_done(queue_dir, name):
+    """
+        Function returning True when a task has its result.
+    """
+    return os.path.isfile(queue_path(queue_dir, "results", name + ".json"))
+
+
+def queue_time(queue_dir, worker):
+    """
+        Function returning the current time of the filesystem of
+        the queue, from the modification time of the heartbeat file
+        of the worker, touched now.
+
+        input: queue_dir: queue folder.
+        input: worker: name of the worker.
+    """
+    file_path = queue_path(queue_dir, "workers", worker)
+    with open(file_path, 'a'):
+        pass
+    os.utime(file_path, None)
+    return os.stat(file_path).st_mtime
+
+
+def try_claim(queue_dir, name, worker):
+    """
+        Function claiming a task.
+
+        input: queue_dir: queue folder.
+        input: name: task name.
+        input: worker: name of the worker.
+        output: True when this worker holds the task.
+    """
+    return create_json(queue_path(queue_dir, "claims", name + ".lock"),
+                       {"worker": worker, "claimed": time.time()})
+
+
+def break_stale_claim(queue_dir, name, worker, now, lease):
+    """
+        Function removing the claim of a task when its lease expired.
+
+        input: queue_dir: queue folder.
+        input: name: task name.
+        input: worker: name of the worker breaking the claim.
+        input: now: current time of the queue filesystem.
+        input: lease: lease time in seconds.
+        output: True when the task has no claim anymore.
+    """
+    lock_path = queue_path(queue_dir, "claims", name + ".lock")
+    try:
+        stale = os.stat(lock_path)
+    except FileNotFoundError:
+        return True
+    if now - stale.st_mtime <= lease:
+        return False
+
+    # Only one worker renames the lock away.
+    broken_path = "{0}.broken.{1}".format(lock_path, worker)
+    try:
+        os.rename(lock_path, broken_path)
+    except FileNotFoundError:
+        return False
+    moved = os.stat(broken_path)
+    if moved.st_ino != stale.st_ino or now - moved.st_mtime <= lease:
+        # Another worker broke the stale lock and claimed the task in
+        # the meantime: give its claim back.
+        try:
+            os.link(broken_path, lock_path)
+        except OSError:
+            pass
+        os.remove(broken_path)
+        return False
+    owner = read_json_lock(broken_path) or "unknown worker"
+    os.remove(broken_path)
+    print("Claim of task {0} by {1} expired.".format(name, owner))
+    return True
+
+
+def read_json_lock(file_path):
+    """
+        Function returning the worker named in a lock file, None
+        when it cannot be read.
+    """
+    data = read_json(file_path)
+    return data.get("worker") if isinstance(data, dict) else None
+
+
+def claim_next(queue_dir, worker, lease):
+    """
+        Function claiming the first task without result and without
+        a live claim.
+
+        input: queue_dir: queue folder.
+        input: worker: name of the worker.
+        input: lease: lease time in seconds.
+        output: (task name, number of tasks without result). The
+            name is None when no task could be claimed.
+    """
+    now = queue_time(queue_dir, worker)
+    pending = [name for name in list_tasks(queue_dir) if not is_done(queue_dir, name)]
+    for name in pending:
+        if not break_stale_claim(queue_dir, name, worker, now, lease):
+            continue
+        if not try_claim(queue_dir, name, worker):
+            continue
+        if is_done(queue_dir, name):
+            # Finished after the listing, before its claim was removed.
+            release(queue_dir, name)
+            continue
+        return name, len(pending)
+    return None, len(pending)
+
+
+def release(queue_dir, name):
+    """
+        Function removing the claim of a task.
+    """
+    try:
+        os.remove(queue_path(queue_dir, "claims", name + ".lock"))
+    except FileNotFoundError:
+        pass
+
+
+def heartbeat(lock_path, interval, stop):
+    """
+        Function touching the lock of a task until stop is set. Runs
+        in a thread of the worker while the task is parsed.
+
+        input: lock_path: path of the lock.
+        input: interval: seconds between touches.
+        input: stop: threading.Event.
+    """
+    while not stop.wait(interval):
+        try:
+            os.utime(lock_path, None)
+        except OSError:
+            print("Lost the claim {0}; the task may be parsed twice.".format(lock_path))
+            return
+
+
+def run_task(task):
+    """
+        Function parsing the design of a task and writing its outputs.
+
+        input: task: dict read from the task file.
+        output: partial result: dict with the stage "numbers" of the
+            run (list of [flow, stage, kind, metric, value], see
+            qor_aggregate.run_numbers()) and the bytes read.
+    """
+    folders = rp.get_folders(task["run_dir"], task["write_path"], cache=task.get("cache"))
+    if not os.path.isdir(folders["write"]):
+        os.makedirs(folders["write"])
+    tables, bytes_read = rp.collect_tables(task["tool"], task["design"], folders)
+    if not tables:
+        raise ValueError("no reports found")
+    rp.write_outputs(task["tool"], task["design"], folders, tables)
+    numbers = qor_aggregate.run_numbers(tables)
+    return {"numbers": [list(key) + [value] for key, value in sorted(numbers.items())],
+            "bytes": bytes_read}
+
+
+def work(queue_dir, max_tasks=None, poll=POLL_SECONDS, exit_when_idle=False):
+    """
+        Function running a worker: claims and parses tasks until
+        every task of the queue has its result.
+
+        input: queue_dir: queue folder.
+        input: max_tasks: tasks parsed before exiting, None for no limit.
+        input: poll: seconds waited when every pending task is claimed.
+        input: exit_when_idle: exit instead of waiting when every
+            pending task is claimed by another worker.
+        output: number of tasks parsed by this worker.
+    """
+    options = read_json(os.path.join(queue_dir, "queue.json"))
+    if options is None:
+        raise ValueError("{0} is not a work queue.".format(queue_dir))
+    lease = options["lease"]
+    worker = worker_name()
+    num_tasks = 0
+    print("Worker {0} started on queue {1}.".format(worker, queue_dir))
+    try:
+        while max_tasks is None or num_tasks < max_tasks:
+            name, num_pending = claim_next(queue_dir, worker, lease)
+            if name is None:
+                if num_pending == 0 or exit_when_idle:
+                    break
+                time.sleep(poll)
+                continue
+
+            stop = threading.Event()
+            beat = threading.Thread(target=heartbeat, args=(
+                queue_path(queue_dir, "claims", name + ".lock"),
+                float(lease) / HEARTBEATS_PER_LEASE, stop))
+            beat.daemon = True
+            beat.start()
+            start_time = time.time()
+            result = {"name": name, "design": "", "run_dir": None, "worker": worker}
+            try:
+                task = read_json(queue_path(queue_dir, "tasks", name + ".json"))
+                if task is None:
+                    raise ValueError("task file cannot be read")
+                result.update({"design": task["design"], "run_dir": task["run_dir"]})
+                result.update(run_task(task))
+                result["status"] = "done"
+            except Exception as err:
+                result.update({"status": "failed", "error": str(err)})
+            finally:
+                stop.set()
+                beat.join()
+            result["elapsed"] = time.time() - start_time
+            write_json(queue_path(queue_dir, "results", name + ".json"), result)
+            release(queue_dir, name)
+            num_tasks += 1
+            print("Worker {0}: task {1} {2} in {3:.1f} s.".format(
+                worker, name, result["status"], result["elapsed"]))
+    finally:
+        try:
+            os.remove(queue_path(queue_dir, "workers", worker))
+        except OSError:
+            pass
+    return num_tasks
+
+
+def queue_status(queue_dir):
+    """
+        Function counting the tasks of a queue by state.
+
+        input: queue_dir: queue folder.
+        output: dict with the number of "tasks", "done", "failed",
+            "running", "stale" and "waiting" tasks.
+    """
+    options = read_json(os.path.join(queue_dir, "queue.json")) or {"lease": LEASE_SECONDS}
+    now = queue_time(queue_dir, "status." + worker_name())
+    os.remove(queue_path(queue_dir, "workers", "status." + worker_name()))
+    status = dict.fromkeys(["tasks", "done", "failed", "running", "stale", "waiting"], 0)
+    for name in list_tasks(queue_dir):
+        status["tasks"] += 1
+        result = read_json(queue_path(queue_dir, "results", name + ".json"))
+        if result is not None:
+            status["done" if result.get("status") == "done" else "failed"] += 1
+            continue
+        try:
+            claim = os.stat(queue_path(queue_dir, "claims", name + ".lock"))
+        except FileNotFoundError:
+            status["waiting"] += 1
+            continue
+        status["stale" if now - claim.st_mtime > options["lease"] else "running"] += 1
+    return status
+
+
+def merge(queue_dir):
+    """
+        Function combining the partial results of a queue by design.
+
+        input: queue_dir: queue folder.
+        output: (dict of design to qor_aggregate partial aggregate,
+            list of task names without result).
+    """
+    totals = {}
+    missing = []
+    for name in list_tasks(queue_dir):
+        result = read_json(queue_path(queue_dir, "results", name + ".json"))
+        if result is None:
+            missing.append(name)
+            continue
+        total = totals.setdefault(result["design"], qor_aggregate.new_partial())
+        run_name = os.path.basename(os.path.normpath(result["run_dir"])) if result["run_dir"] \
+            else name
+        if result["status"] != "done":
+            total["failed"].append((run_name, result.get("error", "")))
+            continue
+        numbers = dict((tuple(row[:4]), row[4]) for row in result["numbers"])
+        qor_aggregate.add_run(total, run_name, numbers)
+        total["bytes"] += result["bytes"]
+    return totals, missing
+
+
+def print_merge(totals, missing, csv_path=None):
+    """
+        Function printing the merged results and writing them to CSV.
+
+        input: totals: dict from merge().
+        input: missing: list of task names without result.
+        input: csv_path: path of the CSV file, or None.
+        output: number of failed and missing tasks.
+    """
+    num_failed = len(missing)
+    csv_rows = []
+    for design in sorted(totals):
+        total = totals[design]
+        rows = qor_aggregate.stage_statistics(total)
+        print("Design {0}: {1} runs, {2} failed.".format(design, len(total["runs"]),
+                                                         len(total["failed"])))
+        qor_aggregate.print_statistics(rows)
+        for run_name, err in total["failed"]:
+            print("Failed to parse run {0}: {1}".format(run_name, err))
+        num_failed += len(total["failed"])
+        csv_rows.extend([design] + row for row in rows)
+    for name in missing:
+        print("Task {0} has no result.".format(name))
+
+    if csv_path:
+        with open(csv_path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["design"] + qor_aggregate.STAT_COLUMNS)
+            writer.writerows(csv_rows)
+        print("CSV file generated at path: " + csv_path)
+    return num_failed
+
+
+def start_local_workers(queue_dir, num_workers, poll=POLL_SECONDS):
+    """
+        Function starting worker processes on this machine.
+
+        input: queue_dir: queue folder.
+        input: num_workers: number of workers.
+        input: poll: seconds an idle worker waits.
+        output: list of subprocess.Popen.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "work", "--queue", queue_dir,
+               "--poll", str(poll)]
+    return [subprocess.Popen(command) for _ in range(num_workers)]
+
+
+def main(argv):
+    """
+        Command line entry point of the coordinator and workers.
+
+        input: argv: list of command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Parse runs with workers sharing a folder.")
+    parser.add_argument("command", choices=["submit", "work", "status", "merge", "run"])
+    parser.add_argument("--queue", required=True, help="queue folder, on the shared filesystem")
+    parser.add_argument("--tool", choices=rp.ASIC_TOOLS, help="tool that generated the reports")
+    parser.add_argument("--design", nargs="+", help="design names")
+    parser.add_argument("--run-dir", nargs="+", default=None,
+                        help="run directories containing syn/ and apr/")
+    parser.add_argument("--output-dir", default=rp.FOLDER_WRITE_PATH,
+                        help="folder the outputs are written to")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse parsed reports stored in this folder")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                        help="seconds without heartbeat after which a task is claimed again")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS,
+                        help="seconds an idle worker waits before looking for tasks")
+    parser.add_argument("--max-tasks", type=int, default=None,
+                        help="tasks parsed by the worker before it exits")
+    parser.add_argument("--exit-when-idle", action="store_true",
+                        help="exit when every pending task is claimed by another worker")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="local worker processes of the run command")
+    parser.add_argument("--csv", default=None, help="write the merged statistics to this file")
+    args = parser.parse_args(argv)
+
+    if args.command in ("submit", "run"):
+        if not args.tool or not args.design:
+            parser.error("{0} needs --tool and --design.".format(args.command))
+        cache = None
+        if args.cache_dir:
+            cache = {"cache_dir": os.path.abspath(args.cache_dir), "verify_hash": False,
+                     "max_bytes": parse_cache.CACHE_MAX_BYTES}
+        names = submit(args.queue, args.tool, args.design, args.run_dir, args.output_dir,
+                       cache, args.lease)
+        print("Submitted {0} tasks to queue {1}.".format(len(names), args.queue))
+        if args.command == "submit":
+            return 0
+        start_time = time.time()
+        for process in start_local_workers(args.queue, args.workers, args.poll):
+            process.wait()
+        print("Workers finished in {0:.1f} s.".format(time.time() - start_time))
+        args.command = "merge"
+
+    if args.command == "work":
+        work(args.queue, args.max_tasks, args.poll, args.exit_when_idle)
+        return 0
+    if args.command == "status":
+        print("{tasks} tasks: {done} done, {failed} failed, {running} running, "
+              "{stale} with an expired lease, {waiting} waiting.".format(**queue_status(args.queue)))
+        return 0
+
+    totals, missing = merge(args.queue)
+    return 1 if print_merge(totals, missing, args.csv) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))